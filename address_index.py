@@ -0,0 +1,191 @@
+import argparse
+import csv
+import os
+from glob import glob
+
+import numpy as np
+
+DEFAULT_INDEX_PATH = './data/address_index.npy'
+
+# ID returned by lookup for addresses that are not in the index
+MISSING = -1
+
+
+def encode_addresses(addresses):
+    # Fixed-width ASCII bytes, the key type of the index; valid BTC addresses are always ASCII
+    if isinstance(addresses, np.ndarray) and addresses.dtype.kind == 'S':
+        return addresses
+    return np.asarray(addresses, dtype=object).astype(np.bytes_)
+
+
+class AddressIndex:
+    """
+    Persistent address dictionary mapping every address to a stable integer ID.
+
+    IDs are assigned in first-seen order and never change, so stages can exchange numpy ID
+    arrays instead of address strings, and joins between collection holders, SRC-20
+    holdings and snapshots become integer array operations (np.isin, np.intersect1d).
+
+    The index is one .npy file of fixed-width address bytes in ID order, with the ID
+    permutation that sorts them alongside. It is opened memory-mapped, and lookups are a
+    vectorized binary search, so loading it costs no parsing and no per-address objects.
+    Only one process should add to a given index file at a time.
+
+    Parameters:
+    - path: Index file. Created on the first save if it does not exist.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self.dirty = False
+        if os.path.exists(path):
+            table = np.load(path, mmap_mode='r')
+            self.keys, self.order = table['address'], table['order']
+        else:
+            self.keys = np.empty(0, dtype='S1')
+            self.order = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        # Keep new IDs only when the stage that assigned them finished
+        if exc_type is None:
+            self.save()
+
+    def lookup(self, addresses):
+        """
+        Returns the IDs of a batch of addresses as an int64 array, MISSING for unknown ones.
+        """
+        queries = encode_addresses(addresses)
+        if not len(self.keys) or not len(queries):
+            return np.full(len(queries), MISSING, dtype=np.int64)
+        # Never compare truncated keys: a query wider than every key cannot be in the index, and
+        # narrower ones are padded, which keeps the byte order of the sorted keys
+        fits = np.char.str_len(queries) <= self.keys.dtype.itemsize \
+            if queries.dtype.itemsize > self.keys.dtype.itemsize else np.ones(len(queries), dtype=bool)
+        positions = np.searchsorted(self.keys, queries[fits].astype(self.keys.dtype), sorter=self.order)
+        ids = np.full(len(queries), MISSING, dtype=np.int64)
+        found = np.asarray(self.order)[np.minimum(positions, len(self.keys) - 1)]
+        ids[fits] = np.where(self.keys[found] == queries[fits], found, MISSING)
+        return ids
+
+    def add(self, addresses):
+        """
+        Returns the IDs of a batch of addresses, assigning new IDs to unknown addresses in
+        first-seen order. New IDs are kept in memory until save().
+        """
+        queries = encode_addresses(addresses)
+        ids = self.lookup(queries)
+        missing = ids == MISSING
+        if not missing.any():
+            return ids
+        new_keys, first, inverse = np.unique(queries[missing], return_index=True, return_inverse=True)
+        first_seen = np.argsort(first, kind='stable')
+        new_ids = np.empty(len(new_keys), dtype=np.int64)
+        new_ids[first_seen] = np.arange(len(self.keys), len(self.keys) + len(new_keys))
+        ids[missing] = new_ids[inverse.ravel()]
+        if new_keys.dtype.itemsize > self.keys.dtype.itemsize:
+            # Widen the index before searching: a truncated 'abc' would sort as 'ab' and break the order
+            self.keys = self.keys.astype(new_keys.dtype)
+        # new_keys is sorted, so inserting its IDs at their search positions keeps the order sorted
+        positions = np.searchsorted(self.keys, new_keys.astype(self.keys.dtype), sorter=self.order) \
+            if len(self.keys) else np.zeros(len(new_keys), dtype=np.int64)
+        self.order = np.insert(np.asarray(self.order), positions, new_ids)
+        self.keys = np.concatenate([self.keys, new_keys[first_seen]])
+        self.dirty = True
+        return ids
+
+    def addresses(self, ids):
+        """
+        Returns the address strings of an array of IDs, as a list.
+        """
+        return self.keys[np.asarray(ids, dtype=np.int64)].astype(np.str_).tolist()
+
+    def save(self):
+        """
+        Writes the index if IDs were added, atomically replacing the file, and reopens it memory-mapped.
+        """
+        if not self.dirty:
+            return
+        table = np.empty(len(self.keys), dtype=[('address', self.keys.dtype), ('order', np.int64)])
+        table['address'] = self.keys
+        table['order'] = self.order
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'wb') as index_file:
+            np.save(index_file, table)
+        os.replace(temp_path, self.path)
+        table = np.load(self.path, mmap_mode='r')
+        self.keys, self.order = table['address'], table['order']
+        self.dirty = False
+
+
+def csv_column(file_path, column='address'):
+    # One column of a CSV file as a list of stripped strings; headerless files are read as a single column
+    with open(file_path, 'r', newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, None)
+        if header is None:
+            return []
+        if column in header:
+            position = header.index(column)
+            return [row[position].strip() for row in reader if len(row) > position]
+        return [header[0].strip()] + [row[0].strip() for row in reader if row]
+
+
+def ids_from_csv(index, file_path, column='address', add=True):
+    """
+    Converts the address column of a CSV file into an ID array.
+
+    Parameters:
+    - index: AddressIndex to resolve against.
+    - file_path: CSV with an address column, or a plain one-address-per-line file.
+    - column: Name of the address column.
+    - add: Assign IDs to unknown addresses; otherwise they come back as MISSING.
+
+    Returns:
+    An int64 array with one ID per row, in file order.
+    """
+    addresses = csv_column(file_path, column)
+    return index.add(addresses) if add else index.lookup(addresses)
+
+
+def ids_file_path(file_path):
+    # ID array stored next to the address file it encodes, e.g. col-MERGED.txt -> col-MERGED.ids.npy
+    return f'{os.path.splitext(file_path)[0]}.ids.npy'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build or query the persistent address index.')
+    parser.add_argument('--index', default=DEFAULT_INDEX_PATH, help='Index file.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help='Add the addresses of holder files to the index.')
+    build_parser.add_argument('files', nargs='*', help='Files to index (default: collections and SRC20 holder files).')
+    build_parser.add_argument('--column', default='address', help='Address column name.')
+    build_parser.add_argument('--ids', action='store_true', help='Also write an .ids.npy array next to each file.')
+    lookup_parser = subparsers.add_parser('lookup', help='Print the IDs of addresses.')
+    lookup_parser.add_argument('addresses', nargs='+')
+    args = parser.parse_args(argv)
+
+    with AddressIndex(args.index) as index:
+        if args.command == 'build':
+            files = args.files or sorted(glob('./collections/col-*') + glob('./collections/src-*')
+                                         + glob('./data/src20_holders/staging-*.csv'))
+            for file_path in files:
+                ids = ids_from_csv(index, file_path, args.column)
+                if args.ids:
+                    np.save(ids_file_path(file_path), ids)
+                print(f"{file_path}: {len(ids)} rows, index now {len(index)} addresses")
+        else:
+            for address, address_id in zip(args.addresses, index.lookup(args.addresses).tolist()):
+                print(f"{address}\t{address_id if address_id != MISSING else 'missing'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+# SRC-20 ticks that count towards the airdrop, shared by the snapshot and holder fetchers
+SRC20_WHITELIST = ['$viva', 'bos', 'kevin', 'spad', 'stamp', 'stmap', 'utxo']
+
+# Allocation rule file read by allocation_engine and the allocate commands
+ALLOCATION_RULES_PATH = './rules/allocation_rules.json'
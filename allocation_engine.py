@@ -0,0 +1,172 @@
+import csv
+import json
+
+import numpy as np
+
+import airdrop_config
+import btc_address
+
+DEFAULT_RULES_PATH = airdrop_config.ALLOCATION_RULES_PATH
+
+
+def load_rules(rules_path=DEFAULT_RULES_PATH):
+    with open(rules_path) as file:
+        return json.load(file)
+
+
+def rule_inputs(rules):
+    """
+    Returns the input columns the rules read, in first-use order.
+    """
+    columns = []
+    for rule in rules['rules']:
+        if rule['type'] == 'per_asset':
+            columns.extend(rule['assets'])
+        elif rule['type'] == 'holder_bonus':
+            columns.append(rule['asset'])
+        elif rule['type'] in ('tiers', 'per_unit'):
+            columns.append(rule['source'])
+    return list(dict.fromkeys(columns))
+
+
+def load_holdings(file_path, columns):
+    """
+    Loads the merged holdings once as an address array and a float64 matrix.
+
+    Parameters:
+    - file_path: Merged holdings CSV with an address column.
+    - columns: Numeric columns to load. Columns missing from the file are all zero.
+
+    Returns:
+    (addresses, matrix, column_index) where column_index maps column name -> matrix column.
+    """
+    import pandas as pd
+
+    header = pd.read_csv(file_path, nrows=0).columns
+    present = [column for column in columns if column in header]
+    frame = pd.read_csv(file_path, usecols=['address'] + present, dtype={column: 'float64' for column in present},
+                        keep_default_na=True)
+    matrix = np.zeros((len(frame), len(columns)), dtype=np.float64)
+    column_index = {column: position for position, column in enumerate(columns)}
+    for column in present:
+        matrix[:, column_index[column]] = frame[column].to_numpy(na_value=0.0)
+    return frame['address'].to_numpy(dtype=object), matrix, column_index
+
+
+def load_holdings_from_store(store_dir, columns):
+    """
+    Loads the SRC20 holdings of the columnar holder store in the same shape as load_holdings.
+
+    Balances are summed per address and tick as in the SRC20 merge, ticks are the matrix
+    columns, and addresses failing validation are dropped. Rows follow the store's scan order.
+
+    Parameters:
+    - store_dir: Root directory of the holder store.
+    - columns: Tick columns to load. Ticks missing from the store are all zero.
+
+    Returns:
+    (addresses, matrix, column_index) where column_index maps column name -> matrix column.
+    """
+    import pyarrow.compute as pc
+
+    import holder_store
+
+    holdings = holder_store.src20_holdings(store_dir)
+    encoded = holdings.column('address').combine_chunks().dictionary_encode()
+    codes = encoded.indices.to_numpy()
+    addresses = np.array(encoded.dictionary.to_pylist(), dtype=object)
+    sources = np.array(holdings.column('source').to_pylist(), dtype=object)
+    balances = pc.fill_null(holdings.column('balance_sum'), 0.0).to_numpy()
+
+    matrix = np.zeros((len(addresses), len(columns)), dtype=np.float64)
+    column_index = {column: position for position, column in enumerate(columns)}
+    for column, position in column_index.items():
+        rows = sources == column
+        matrix[codes[rows], position] = balances[rows]
+    valid = np.array([verdict is not None for verdict in btc_address.classify_many(addresses.tolist())], dtype=bool)
+    return addresses[valid], matrix[valid], column_index
+
+
+def apply_rules(matrix, column_index, rules):
+    """
+    Evaluates the allocation rules over the holdings matrix with array operations.
+
+    Rule types:
+    - per_asset: amount for each asset with a positive balance, optionally capped at max_assets.
+      count_output receives the number of assets held.
+    - holder_bonus: amount when the asset balance is positive. flag_output receives the mask.
+    - tiers: [[minimum, amount], ...] on a source column; the highest tier reached applies.
+      source_output receives the source value.
+    - per_unit: amount per unit of a source column, optionally capped at max_units.
+    - total: sum of earlier output columns.
+    Rules that name the same output add up.
+
+    Returns:
+    A dict of output column -> numpy array.
+    """
+    rows = matrix.shape[0]
+    outputs = {}
+
+    def add(column, values):
+        outputs[column] = outputs.get(column, np.zeros(rows, dtype=np.int64)) + values
+
+    for rule in rules['rules']:
+        kind = rule['type']
+        if kind == 'per_asset':
+            held = (matrix[:, [column_index[asset] for asset in rule['assets']]] > 0).sum(axis=1)
+            if rule.get('count_output'):
+                outputs[rule['count_output']] = held
+            if rule.get('max_assets') is not None:
+                held = np.minimum(held, rule['max_assets'])
+            add(rule['output'], held * rule['amount'])
+        elif kind == 'holder_bonus':
+            mask = matrix[:, column_index[rule['asset']]] > 0
+            if rule.get('flag_output'):
+                outputs[rule['flag_output']] = mask
+            add(rule['output'], np.where(mask, rule['amount'], 0))
+        elif kind == 'tiers':
+            source = matrix[:, column_index[rule['source']]]
+            if rule.get('source_output'):
+                outputs[rule['source_output']] = source.astype(np.int64)
+            minimums = np.array([minimum for minimum, _ in rule['tiers']], dtype=np.float64)
+            amounts = np.array([0] + [amount for _, amount in rule['tiers']], dtype=np.int64)
+            add(rule['output'], amounts[np.searchsorted(minimums, source, side='right')])
+        elif kind == 'per_unit':
+            units = matrix[:, column_index[rule['source']]].astype(np.int64)
+            if rule.get('source_output'):
+                outputs[rule['source_output']] = units
+            if rule.get('max_units') is not None:
+                units = np.minimum(units, rule['max_units'])
+            add(rule['output'], units * rule['amount'])
+        elif kind == 'total':
+            add(rule['output'], sum(outputs[column] for column in rule['columns']))
+        else:
+            raise ValueError(f"Unknown allocation rule type: {kind}")
+    return outputs
+
+
+def allocate(file_path, output_file_path, rules_path=DEFAULT_RULES_PATH, store_dir=None):
+    """
+    Computes allocations for every address in a merged holdings CSV and writes them out.
+
+    Parameters:
+    - file_path: Merged holdings CSV. Ignored when store_dir is given.
+    - output_file_path: Allocation CSV to write.
+    - rules_path: Declarative rule file.
+    - store_dir: Optional columnar holder store to read the SRC20 holdings from instead.
+
+    Returns:
+    The number of addresses written.
+    """
+    rules = load_rules(rules_path)
+    if store_dir is not None:
+        addresses, matrix, column_index = load_holdings_from_store(store_dir, rule_inputs(rules))
+    else:
+        addresses, matrix, column_index = load_holdings(file_path, rule_inputs(rules))
+    outputs = apply_rules(matrix, column_index, rules)
+    outputs['address'] = addresses
+    with open(output_file_path, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(rules['output_columns'])
+        writer.writerows(zip(*(outputs[column].tolist() for column in rules['output_columns'])))
+    return len(addresses)
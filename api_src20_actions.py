@@ -1,50 +1,92 @@
-import requests
+import argparse
 import json
+import os
 import random
 import string
+import requests
+import run_metrics
+from json_stream import write_ndjson
+from paginator import paginate
 
-def download_data(api_url, data_key, max_pages=None, debug=False):
-    page_number = 1
-    more_pages = True
-    data = []
-
-    while more_pages:
-        if debug and max_pages is not None and page_number > max_pages:
-            print("Debug mode: Reached max_pages limit.")
-            break
-
-        # Adjust for existing query parameters in api_url
-        separator = '&' if '?' in api_url else '?'
-        print(f"Fetching page {page_number}...")
-        response = requests.get(f"{api_url}{separator}page={page_number}")
+# Paginated SRC-20 event feed of one tick
+TICK_URL = 'https://stampchain.io/api/v2/src20/tick/{tick}?limit={limit}'
 
-        if response.status_code == 200:
-            page_data = response.json()
+def download_pages(api_url, data_key, max_pages=None, debug=False, max_workers=4, rate=None):
+    # Adjust for existing query parameters in api_url
+    separator = '&' if '?' in api_url else '?'
+    if not debug:
+        max_pages = None
+    elif max_pages is not None:
+        print(f"Debug mode: fetching at most {max_pages} pages.")
+    pages = paginate(lambda page_number: f"{api_url}{separator}page={page_number}",
+                     lambda page_data: page_data['totalPages'], max_workers=max_workers, max_pages=max_pages,
+                     rate=rate)
+    try:
+        for page_number, page_data in pages:
             if data_key not in page_data:
                 print(f"Invalid data_key '{data_key}'.")
                 break
-            data.extend(page_data[data_key])
-
-            more_pages = page_number < page_data['totalPages']
-            page_number += 1
-        else:
-            print(f"Request failed with status code {response.status_code}")
-            break
+            yield page_data[data_key]
+    except requests.exceptions.RequestException as err:
+        print(f"Request failed: {err}")
 
+def download_data(api_url, data_key, max_pages=None, debug=False, max_workers=4):
+    data = []
+    for records in download_pages(api_url, data_key, max_pages=max_pages, debug=debug, max_workers=max_workers):
+        data.extend(records)
     return data
 
 
-def save_data_to_file(data, filename):
+def random_filename(filename, extension='json'):
     # Generate a random string to append to the filename to prevent accidental overwrites
     random_str = ''.join(random.choices(string.ascii_letters + string.digits, k=2))
-    modified_filename = f"{filename}_{random_str}.json"
+    return f"{filename}_{random_str}.{extension}"
+
+def save_data_to_file(data, filename, ndjson=False):
+    modified_filename = random_filename(filename, 'ndjson' if ndjson else 'json')
     with open(modified_filename, 'w') as file:
-        json.dump(data, file)
+        if ndjson:
+            write_ndjson(data, file)
+        else:
+            json.dump(data, file)
     print(f"Data saved to {modified_filename}")
 
-data = download_data('https://stampchain.io/api/v2/src20/tick/STMAP?limit=5000', 'data', max_pages=2, debug=False)
+def stream_data_to_file(pages, filename, ndjson=False):
+    # Write records page by page as one JSON array, byte-identical to json.dump of the full list,
+    # or as JSON Lines (one record per line, .ndjson) that later stages can read line by line
+    modified_filename = random_filename(filename, 'ndjson' if ndjson else 'json')
+    count = 0
+    with open(modified_filename, 'w') as file:
+        if ndjson:
+            for records in pages:
+                with run_metrics.timed('disk'):
+                    count += write_ndjson(records, file)
+        else:
+            file.write('[')
+            for records in pages:
+                with run_metrics.timed('disk'):
+                    for record in records:
+                        if count:
+                            file.write(', ')
+                        json.dump(record, file)
+                        count += 1
+            file.write(']')
+    if not count:
+        os.remove(modified_filename)
+        return 0
+    print(f"Saved {count} records to {modified_filename}")
+    return count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Download SRC-20 tick events to a fetchSRC20_* dump.')
+    parser.add_argument('--ndjson', action='store_true', help='Write JSON Lines (.ndjson) instead of one JSON array.')
+    args = parser.parse_args(argv)
+
+    pages = download_pages(TICK_URL.format(tick='STMAP', limit=5000), 'data', max_pages=2, debug=False)
+
+    if not stream_data_to_file(pages, "fetchSRC20_STMAP", ndjson=args.ndjson):
+        print("No data received.")
+
 
-if data:
-    save_data_to_file(data, "fetchSRC20_STMAP")
-else:
-    print("No data received.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,56 @@
+import argparse
 import glob
-import json
 import csv
 import logging
-from tqdm import tqdm
+import os
 
-def scrape_addresses_and_save_to_csv():
-    # Set up logging to output to a file
-    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
-    log_file_handler = logging.FileHandler('scraping_log.log')
-    log_file_handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s'))
-    logging.getLogger().addHandler(log_file_handler)
+from json_stream import iter_json_records
 
-    # Pattern to match files starting with "fetchSRC20_" and ending with ".json"
-    file_pattern = 'fetchSRC20_*.json'
+# Pattern to match files starting with "fetchSRC20_" and ending with ".json" or ".ndjson"
+def scrape_addresses_and_save_to_csv(file_pattern='fetchSRC20_*.*json', output_dir='.'):
+    from tqdm import tqdm
 
     # Use tqdm to show progress
-    files = glob.glob(file_pattern)
+    files = sorted(glob.glob(file_pattern))
     for file_path in tqdm(files, desc="Processing JSON files"):
-        token_name = file_path.split('_')[1].split('.')[0]
-        csv_file_name = f'src-{token_name}_holders.csv'
+        token_name = os.path.basename(file_path).split('_')[1].split('.')[0]
+        csv_file_name = os.path.join(output_dir, f'src-{token_name}_holders.csv')
 
         addresses = set()
 
-        with open(file_path, 'r') as file:
-            data = json.load(file)
-            for entry in data:
-                creator = entry.get('creator')
-                destination = entry.get('destination')
-                if creator:
-                    addresses.add(creator)
-                if destination:
-                    addresses.add(destination)
+        # Stream the dump one event at a time instead of loading it whole
+        for entry in iter_json_records(file_path):
+            creator = entry.get('creator')
+            destination = entry.get('destination')
+            if creator:
+                addresses.add(creator)
+            if destination:
+                addresses.add(destination)
 
         with open(csv_file_name, 'w', newline='') as csvfile:
             fieldnames = ['address']
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             writer.writeheader()
-            for address in addresses:
+            # Sorted, so an unchanged dump gives an unchanged file
+            for address in sorted(addresses):
                 writer.writerow({'address': address})
 
         logging.info(f'Saved {len(addresses)} addresses to {csv_file_name}')
 
-# Don't forget to call the function
-scrape_addresses_and_save_to_csv()
\ No newline at end of file
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write the addresses of every fetchSRC20_* dump to src-<tick>_holders.csv.')
+    parser.add_argument('--pattern', default='fetchSRC20_*.*json', help='Glob of the event dumps.')
+    parser.add_argument('--output-dir', default='.', help='Folder for the src-<tick>_holders.csv files.')
+    args = parser.parse_args(argv)
+
+    # Set up logging to output to a file
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    log_file_handler = logging.FileHandler('scraping_log.log')
+    log_file_handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s'))
+    logging.getLogger().addHandler(log_file_handler)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    scrape_addresses_and_save_to_csv(args.pattern, args.output_dir)
+
+if __name__ == "__main__":
+    main()
@@ -1,101 +1,157 @@
+import argparse
 import requests
 import json
 import csv
 import logging
+import math
+import os
 from pprint import pprint
-from tqdm import tqdm
+import airdrop_config
+import run_metrics
+from paginator import paginate
 
 
 def get_token_info():
     # Manually input the collection name for each run
     return input("Please enter the SRC20 ticker: ")
 
-# Set up logging to output to a file
-logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
-log_file_handler = logging.FileHandler('nft_log.log')
-log_file_handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s'))
-logging.getLogger().addHandler(log_file_handler)
-
 # Provide the array of NFT IDs here
 # src20_ids = ['A1369210904326473420', 'A454092392577268841', 'A1087244158713077636', 'A995745323260604787', 'A1087244158713077636', 'A672631645343727476', 'A1233839408890899574', 'A1431903724482972971', 'A624016443443150761', 'A228700604904328280', 'A1122957051225484408', 'A212583391985849809', 'A582541865338232032', 'A1658502707259193937', 'A1111685225107137619', 'A1358429350926785447', 'A1204092088279684083', 'A212381486968599631', 'A499874687676276808', 'A133961632556144042', 'A1817302908167233539']
 
+HOLDERS_URL = 'https://openstamp.io/api/v1/explorer/src20/holdersByTick'
+HOLDER_FIELDS = ['address', 'balance', 'blockHeight']
+
+def iter_holder_pages(src20_id, max_workers=4, page_size=500, rate=None):
+    def page_url(page_number):
+        return f'{HOLDERS_URL}?tick={src20_id}&page={page_number}&pageSize={page_size}'
+
+    # Page 1 carries the total; the remaining pages are fetched concurrently and each is parsed once
+    for page_number, page in paginate(page_url, lambda page: math.ceil(page['data']['total'] / page_size),
+                                      max_workers=max_workers, rate=rate):
+        logging.debug('Fetched holders of SRC20 TOKEN %s (Page %d)', src20_id, page_number)
+        yield page['data']['list']
+
+def iter_holders(src20_id, max_workers=4, page_size=500, rate=None):
+    # Yield one CSV row per holder as pages arrive
+    for holders in iter_holder_pages(src20_id, max_workers=max_workers, page_size=page_size, rate=rate):
+        yield from extract_wallet_data(holders)
+
+def log_request_error(src20_id, error):
+    if isinstance(error, requests.exceptions.HTTPError):
+        logging.error(f'HTTP Error for SRC20 TOKEN {src20_id}: {error}')
+    elif isinstance(error, requests.exceptions.ConnectionError):
+        logging.error(f'Error Connecting for SRC20 TOKEN {src20_id}: {error}')
+    elif isinstance(error, requests.exceptions.Timeout):
+        logging.error(f'Timeout Error for SRC20 TOKEN {src20_id}: {error}')
+    else:
+        logging.error(f'Something went wrong for SRC20 TOKEN {src20_id}: {error}')
+
 # Define a function to fetch the holder data from the API endpoint
-def get_holder_data(src20_id):
-    page_size = 500
-    page_number = 1
+def get_holder_data(src20_id, max_workers=4, page_size=500, rate=None):
     data = []
-    total_items = 0
-    
-    url = f'https://openstamp.io/api/v1/explorer/src20/holdersByTick?tick={src20_id}&page={page_number}&pageSize={page_size}'
-    
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()['data']['list']
-        total_items = response.json()['data']['total']
-        
-        while (page_number - 1) * page_size < total_items:
-            url = f'https://openstamp.io/api/v1/explorer/src20/holdersByTick?tick={src20_id}&page={page_number}&pageSize={page_size}'
-            
-            logging.info(f'Fetching page {page_number}...')
-            response = requests.get(url)
-            response.raise_for_status()
-            
-            data.extend(response.json()['data']['list'])
-            
-            logging.info(f'Successfully fetched data for SRC20 TOKEN {src20_id} (Page {page_number})')
-            page_number += 1
-            
+        for holders in iter_holder_pages(src20_id, max_workers=max_workers, page_size=page_size, rate=rate):
+            data.extend(holders)
         return data
-    except requests.exceptions.HTTPError as errh:
-        logging.error(f'HTTP Error for SRC20 TOKEN {src20_id}: {errh}')
-    except requests.exceptions.ConnectionError as errc:
-        logging.error(f'Error Connecting for SRC20 TOKEN {src20_id}: {errc}')
-    except requests.exceptions.Timeout as errt:
-        logging.error(f'Timeout Error for SRC20 TOKEN {src20_id}: {errt}')
     except requests.exceptions.RequestException as err:
-        logging.error(f'Something went wrong for SRC20 TOKEN {src20_id}: {err}')
-    
+        log_request_error(src20_id, err)
     return []
 
-# Define a function to extract the wallet addresses from the holder data
+# Define a function to extract the wallet data from the holder data
 def extract_wallet_data(holder_data):
-    data_to_store = []
     for holder in holder_data:
-        data_entry = {
+        yield {
             'address': holder['address'],
             'balance': holder['balance'],
             'blockHeight': holder['blockHeight']
         }
-        data_to_store.append(data_entry)
-    return data_to_store
-# Define a function to write the wallet addresses to a CSV file
-def write_to_csv(data_to_store, src20_id):
-    with open(f'staging-{src20_id}_holders.csv', 'a', newline='') as csvfile:
-        fieldnames = ['address', 'balance', 'blockHeight']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        if csvfile.tell() == 0:
-            writer.writeheader()
-        for data_entry in data_to_store:
-            writer.writerow(data_entry)
 
-src20_id = get_token_info()
+def export_holders(src20_id, output_dir='.', max_workers=4, store_dir=None, page_size=500, rate=None):
+    """
+    Streams the holders of one SRC20 token into staging-<tick>_holders.csv.
+
+    Rows are written as pages arrive into a temporary file that replaces the staging
+    file only once every page was fetched, so a failed run never leaves a partial or
+    duplicated staging file behind.
+
+    Parameters:
+    - src20_id: SRC20 ticker.
+    - output_dir: Directory for the staging CSV.
+    - max_workers: Pages fetched in parallel.
+    - store_dir: Optional columnar holder store; each page is also appended to the tick's partition.
+    - page_size: Holders per page request.
+    - rate: Optional cap on page requests per second.
+
+    Returns:
+    The number of holders written, or None if the fetch failed.
+    """
+    csv_file_path = os.path.join(output_dir, f'staging-{src20_id}_holders.csv')
+    temp_file_path = f'{csv_file_path}.tmp'
+    count = 0
+    store_writer = None
+    if store_dir is not None:
+        import holder_store
+        store_writer = holder_store.HolderStoreWriter('src20', src20_id, store_dir)
+
+    def discard():
+        # Nothing of an unfinished fetch survives: no temp file, no store partition
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+        if store_writer is not None:
+            store_writer.abort()
+
+    try:
+        with open(temp_file_path, 'w', newline='') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=HOLDER_FIELDS)
+            writer.writeheader()
+            for holders in iter_holder_pages(src20_id, max_workers=max_workers, page_size=page_size, rate=rate):
+                rows = list(extract_wallet_data(holders))
+                with run_metrics.timed('disk'):
+                    writer.writerows(rows)
+                if store_writer is not None:
+                    store_writer.write([row['address'] for row in rows], [float(row['balance']) for row in rows],
+                                       [int(row['blockHeight']) for row in rows])
+                count += len(rows)
+    except requests.exceptions.RequestException as err:
+        log_request_error(src20_id, err)
+        discard()
+        return None
+    except BaseException:
+        # Bad page payloads, a full disk or Ctrl-C: clean up, then let the error through
+        discard()
+        raise
+    os.replace(temp_file_path, csv_file_path)
+    if store_writer is not None:
+        store_writer.close()
+    if count:
+        logging.info(f'Wrote {count} wallet data entries to {csv_file_path}')
+    else:
+        logging.warning(f'No holder data found for SRC20 TOKEN {src20_id}')
+    return count
 
-logging.info(f'Fetching holder data for SRC20 TOKEN {src20_id}...')
+def main(argv=None):
+    from tqdm import tqdm
 
-# Update the script to use the new functions
-holder_data = get_holder_data(src20_id)
-print(holder_data)
+    parser = argparse.ArgumentParser(description='Export SRC20 token holders to staging-<tick>_holders.csv files.')
+    parser.add_argument('tickers', nargs='*', help='SRC20 tickers to export.')
+    parser.add_argument('--all', action='store_true', help='Export every whitelisted tick.')
+    parser.add_argument('--output-dir', default='.', help='Directory for the staging CSV files.')
+    parser.add_argument('--workers', type=int, default=4, help='Pages fetched in parallel per tick.')
+    parser.add_argument('--store', default=None, help='Also append the holders to this columnar holder store.')
+    args = parser.parse_args(argv)
 
+    # Set up logging to output to a file
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    log_file_handler = logging.FileHandler('nft_log.log')
+    log_file_handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s'))
+    logging.getLogger().addHandler(log_file_handler)
 
-if holder_data:
-    # Save holder_data to a text file
-    with open(f'temp_holder_data_{src20_id}.txt', 'w') as file:
-        file.write(str(holder_data))
+    tickers = args.tickers + (airdrop_config.SRC20_WHITELIST if args.all else [])
+    if not tickers:
+        tickers = [get_token_info()]
+    for src20_id in tqdm(list(dict.fromkeys(tickers)), desc="Exporting SRC20 holders"):
+        logging.info(f'Fetching holder data for SRC20 TOKEN {src20_id}...')
+        export_holders(src20_id, output_dir=args.output_dir, max_workers=args.workers, store_dir=args.store)
 
-    logging.info(f'Extracting wallet data for token {src20_id}...')
-    data_to_store = extract_wallet_data(holder_data)
-    logging.info(f'Writing {len(data_to_store)} wallet data entries to CSV file for {src20_id}...')
-    write_to_csv(data_to_store, src20_id)
-else:
-    logging.warning(f'No holder data found for SRC20 TOKEN {src20_id}')
\ No newline at end of file
+if __name__ == "__main__":
+    main()
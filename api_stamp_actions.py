@@ -1,14 +1,12 @@
+import argparse
 import csv
 import logging
-import requests
+import http_cache
 import time
 import retrying
 
-# Set up logging
-logging.basicConfig(filename="stamp_data.log", level=logging.INFO)
-
 # List of asset IDs to retrieve data for
-asset_ids = ["A4515906628890571300", "A1449397849937177992", "A1714800323048321163"]
+ASSET_IDS = ["A4515906628890571300", "A1449397849937177992", "A1714800323048321163"]
 
 # Base URL for the API endpoint
 base_url = "https://stampchain.io/api/v2/stamps"
@@ -16,15 +14,12 @@ base_url = "https://stampchain.io/api/v2/stamps"
 # Delay between requests (in seconds)
 delay = 0.05
 
-# List to store data for retrieved assets
-assets = []
-
 # Function to make a request to the API endpoint for a single asset ID
 # @retrying.retry(stop_max_attempt_number=3, wait_fixed=1000)  # retry up to 5 times with a 1 second delay between retries
 def get_asset_data(asset_id):
-    logging.info(f"Fetching Asset: {asset_id}")
+    logging.debug("Fetching Asset: %s", asset_id)
     url = f"{base_url}/{asset_id}"
-    response = requests.get(url)
+    response = http_cache.get(url)
 
     # Check that the request was successful
     if response.status_code == 200:
@@ -54,22 +49,33 @@ def get_asset_data(asset_id):
             # Log a warning if the 'data' key is missing
             logging.warning(f"'data' key not found in response for asset {asset_id} (status code {response.status_code})")
 
-    # Add the stamp and holders data to the assets list
-    assets.append((stamp, holders))
+    # No stamp data for this asset
+    return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write the stamp and holders of each asset ID to a CSV file.')
+    parser.add_argument('asset_ids', nargs='*', default=ASSET_IDS)
+    parser.add_argument('--output', default='bosArt-stamp_data.csv', help='Output CSV file.')
+    args = parser.parse_args(argv)
+
+    # Set up logging
+    logging.basicConfig(filename="stamp_data.log", level=logging.INFO)
+
+    # Call the get_asset_data() function for each asset ID, keeping the assets that returned data
+    assets = [asset for asset in map(get_asset_data, args.asset_ids) if asset is not None]
 
-# Call the get_asset_data() function for each asset ID
-for asset_id in asset_ids:
-    get_asset_data(asset_id)
+    # Write the data to a CSV file
+    with open(args.output, "w", newline="") as csvfile:
+        fieldnames = ["stamp", "holders"]
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
 
-# Write the data to a CSV file
-with open("bosArt-stamp_data.csv", "w", newline="") as csvfile:
-    fieldnames = ["stamp", "holders"]
-    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        for asset in assets:
+            stamp, holders = asset
+            writer.writerow({"stamp": stamp, "holders": holders})
 
-    writer.writeheader()
-    for asset in assets:
-        stamp, holders = asset
-        writer.writerow({"stamp": stamp, "holders": holders})
+    # Log a message indicating that the script has completed
+    logging.info("Finished retrieving data and writing to CSV file")
 
-# Log a message indicating that the script has completed
-logging.info("Finished retrieving data and writing to CSV file")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,123 +1,392 @@
-import requests
+import argparse
+import glob
 import logging
-from tqdm import tqdm
-import pandas as pd
 import csv  # Add this import at the top of your file
-import concurrent.futures
 import os  # Import os to check file existence for appending CSV
-import fileinput
+import queue
 import time  # Add this import at the top of your file
 import threading
-import colorlog
+from urllib.parse import quote
+import airdrop_config
+import http_cache
+import run_metrics
+import snapshot_engine
+import snapshot_journal
+from json_stream import iter_json_records
+from paginator import paginate
 
 csv_lock = threading.Lock()
 
-# Set up colored logging
-logger = colorlog.getLogger()
-logger.setLevel(colorlog.INFO)
-handler = colorlog.StreamHandler()
-handler.setFormatter(colorlog.ColoredFormatter(
-    '%(log_color)s%(asctime)s [%(levelname)s] %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S',
-    log_colors={
-        'DEBUG': 'cyan',
-        'INFO': 'green',
-        'WARNING': 'yellow',
-        'ERROR': 'red',
-        'CRITICAL': 'red,bg_white',
-    }
-))
-logger.addHandler(handler)
-
-whitelist = ['$viva', 'bos', 'kevin', 'spad', 'stamp', 'stmap', 'utxo']
-
-def take_snapshot(wallet_addresses, checkpoint_interval=25):
-    all_snapshot_results = []  # Keep all snapshots for final save
-    temp_snapshot_results = []  # Temporary list for checkpoint saves
+logger = logging.getLogger(__name__)
+
+whitelist = airdrop_config.SRC20_WHITELIST
+
+SNAPSHOT_FIELDS = ['Address', 'Ticker', 'Amount', 'Block Time']
+CHANGELOG_FIELDS = ['Address', 'Ticker', 'Previous Amount', 'Amount', 'Delta', 'Block Time']
+
+TICK_ACTIVITY_URL = 'https://stampchain.io/api/v2/src20/tick/{tick}?limit=5000'
+
+def snapshot_key(data_item):
+    # Canonical identity of one balance row, hashed by the accumulator's set
+    return (data_item.get('address'), data_item.get('tick'), str(data_item.get('amt')), data_item.get('block_time'))
+
+def snapshot_row(data_item):
+    # Round the amount to 2 decimal places, matching the old DataFrame-based export
+    return [data_item['address'], data_item['tick'], str(round(float(data_item['amt']), 2)), data_item['block_time']]
+
+class SnapshotAccumulator:
+    """
+    Collects whitelisted balance rows from snapshot payloads, dropping duplicates in constant time.
+
+    Parameters:
+    - tick_whitelist: Ticks to keep. Defaults to the module whitelist.
+    """
+
+    def __init__(self, tick_whitelist=None):
+        self.tick_whitelist = set(tick_whitelist if tick_whitelist is not None else whitelist)
+        self.seen = set()
+        self.rows = []
+        self.duplicates = 0
+
+    def add(self, snapshot_data):
+        """
+        Adds one or more {'data': [...]} payloads and returns the rows that were not seen before.
+        """
+        new_rows = []
+        for item in snapshot_data:
+            if not isinstance(item, dict) or not isinstance(item.get('data'), list):
+                continue
+            for data_item in item['data']:
+                if not isinstance(data_item, dict) or data_item.get('tick') not in self.tick_whitelist:
+                    continue
+                key = snapshot_key(data_item)
+                if key in self.seen:
+                    self.duplicates += 1
+                    continue
+                self.seen.add(key)
+                new_rows.append(snapshot_row(data_item))
+        self.rows.extend(new_rows)
+        return new_rows
+
+class SnapshotCsvWriter(threading.Thread):
+    """
+    Background thread that appends snapshot rows to a CSV file in batches, so the
+    thread consuming API results never waits on disk.
+
+    Parameters:
+    - output_file_path: CSV file to append to. The header is written if the file is new.
+    - batch_size: Rows buffered before a write.
+    - flush_interval: Seconds after which a partial batch is written anyway.
+    """
+
+    def __init__(self, output_file_path, batch_size=500, flush_interval=5.0):
+        super().__init__(name='snapshot-csv-writer', daemon=True)
+        self.output_file_path = output_file_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = queue.Queue()
+        self.rows_written = 0
+        self.error = None
+
+    def submit(self, rows):
+        if rows:
+            self.pending.put(rows)
+
+    def close(self):
+        self.pending.put(None)
+        self.join()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def run(self):
+        batch = []
+        last_flush = time.monotonic()
+        try:
+            with open(self.output_file_path, 'a', newline='') as csvfile:
+                writer = csv.writer(csvfile, quoting=csv.QUOTE_ALL)
+                if csvfile.tell() == 0:
+                    writer.writerow(SNAPSHOT_FIELDS)
+                while True:
+                    try:
+                        rows = self.pending.get(timeout=self.flush_interval)
+                    except queue.Empty:
+                        rows = []
+                    if rows is None:
+                        break
+                    batch.extend(rows)
+                    if len(batch) >= self.batch_size or (batch and time.monotonic() - last_flush >= self.flush_interval):
+                        self.flush(writer, csvfile, batch)
+                        batch = []
+                        last_flush = time.monotonic()
+                self.flush(writer, csvfile, batch)
+        except Exception as e:
+            logger.error(f"Error saving to CSV: {e}")
+            self.error = e
+
+    def flush(self, writer, csvfile, batch):
+        if not batch:
+            return
+        with run_metrics.timed('disk'):
+            writer.writerows(batch)
+            csvfile.flush()
+        self.rows_written += len(batch)
+        logger.debug('Flushed %d snapshot rows to %s', len(batch), self.output_file_path)
+
+def take_snapshot(wallet_addresses, checkpoint_interval=500, output_file_path='balances_snapshot_src20-v3.csv',
+                  journal_path=None, run_id=None, tick_whitelist=None, **engine_options):
+    from tqdm import tqdm
+
     wallet_address_list = list(wallet_addresses)  # Convert the generator to a list
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        futures = {executor.submit(get_snapshot, wallet_address): wallet_address for wallet_address in wallet_address_list}
-        for future in tqdm(concurrent.futures.as_completed(futures), total=len(futures), desc="Taking snapshots"):
-            wallet_address = futures[future]
+    if journal_path is not None:
+        return take_journaled_snapshot(wallet_address_list, journal_path, run_id=run_id,
+                                       output_file_path=output_file_path, tick_whitelist=tick_whitelist,
+                                       **engine_options)
+    accumulator = SnapshotAccumulator(tick_whitelist)
+    # Results stream in from the async engine as each address completes
+    results = snapshot_engine.stream_snapshots(wallet_address_list, **engine_options)
+    with SnapshotCsvWriter(output_file_path, batch_size=checkpoint_interval) as writer:
+        for wallet_address, snapshot_data, error in tqdm(results, total=len(wallet_address_list), desc="Taking snapshots"):
+            if error is not None:
+                logger.error(f'Error fetching snapshot for {wallet_address}: {error}')
+                continue
             try:
-                snapshot_data = future.result()
+                snapshot_data = check_snapshot(wallet_address, snapshot_data)
                 if snapshot_data:
-                    # Remove duplicated data
-                    snapshot_data = [item for item in snapshot_data if item not in all_snapshot_results and item not in temp_snapshot_results]
-                    all_snapshot_results.extend(snapshot_data)
-                    temp_snapshot_results.extend(snapshot_data)
-                    logger.info(f'Successfully retrieved snapshot for wallet address {wallet_address}')
-                # Checkpoint: Save every X snapshots and clear temp_snapshot_results
-                if len(temp_snapshot_results) >= checkpoint_interval:
-                    save_snapshots_to_csv(temp_snapshot_results, 'balances_snapshot_src20-v3.csv')
-                    temp_snapshot_results.clear()  # Clear the temporary list after saving
+                    writer.submit(accumulator.add(snapshot_data))
+                    logger.debug('Successfully retrieved snapshot for wallet address %s', wallet_address)
             except Exception as exc:
                 logger.error(f'Error fetching snapshot for {wallet_address}: {exc}')
                 continue
-    # Final save for any remaining snapshots not saved at the last checkpoint
-    if temp_snapshot_results:
-        save_snapshots_to_csv(temp_snapshot_results, 'balances_snapshot_src20-v3.csv')
-    return all_snapshot_results
+    logger.info(f'Snapshot results saved to {output_file_path} ({writer.rows_written} rows, {accumulator.duplicates} duplicates dropped)')
+    return accumulator.rows
 
-def get_snapshot(wallet_address):
-    url = f'https://stampchain.io/api/v2/src20/balance/{wallet_address}'
-    try:
-        response = requests.get(url)
-        response.raise_for_status()  # Raises HTTPError for bad responses
-        snapshot_data = response.json()
-        if 'error' in snapshot_data:
-            logger.error(f'Error generating snapshot for wallet address {wallet_address}: {snapshot_data["error"]}')
-        return snapshot_data
-    except requests.exceptions.HTTPError as errh:
-        logger.error(f'HTTP Error for wallet address {wallet_address}: {errh}')
-    except requests.exceptions.ConnectionError as errc:
-        logger.error(f'Error Connecting for wallet address {wallet_address}: {errc}')
-    except requests.exceptions.Timeout as errt:
-        logger.error(f'Timeout Error for wallet address {wallet_address}: {errt}')
-    except requests.exceptions.RequestException as err:
-        logger.error(f'Something went wrong for wallet address {wallet_address}: {err}')
+def take_journaled_snapshot(wallet_addresses, journal_path, run_id=None,
+                            output_file_path='balances_snapshot_src20-v3.csv', tick_whitelist=None, **engine_options):
+    """
+    Resumable snapshot run. Every completed address is committed to a SQLite journal, an
+    interrupted run picks up only the missing or failed addresses, and the CSV is rebuilt
+    from the journal in input order so a resumed run writes exactly what an uninterrupted one would.
+
+    Parameters:
+    - wallet_addresses: List of wallet addresses.
+    - journal_path: SQLite journal file.
+    - run_id: Journal key for this run. Defaults to a hash of the address list.
+    - output_file_path: CSV file to (re)write.
+    - tick_whitelist: Ticks to keep. Defaults to the module whitelist.
+    - engine_options: Keyword arguments forwarded to snapshot_engine.fetch_snapshots.
+
+    Returns:
+    The list of snapshot rows written.
+    """
+    from tqdm import tqdm
+
+    run_id = run_id or snapshot_journal.default_run_id(wallet_addresses)
+    with snapshot_journal.SnapshotJournal(journal_path) as journal:
+        pending = journal.pending(run_id, wallet_addresses)
+        logger.info(f'Run {run_id}: {len(wallet_addresses) - len(pending)} addresses already journaled, fetching {len(pending)}')
+        results = snapshot_engine.stream_snapshots(pending, **engine_options)
+        for wallet_address, snapshot_data, error in tqdm(results, total=len(pending), desc="Taking snapshots"):
+            if error is None and snapshot_data and 'error' in snapshot_data:
+                # API-level errors are journaled as failures so the next resume retries them
+                check_snapshot(wallet_address, snapshot_data)
+                error = snapshot_data['error']
+            elif error is not None:
+                logger.error(f'Error fetching snapshot for {wallet_address}: {error}')
+            journal.record(run_id, wallet_address, snapshot_data, error)
+        payloads = journal.payloads(run_id)
+        summary = journal.summary(run_id)
+
+    accumulator = SnapshotAccumulator(tick_whitelist)
+    for wallet_address in wallet_addresses:
+        if wallet_address in payloads:
+            accumulator.add([payloads[wallet_address]])
+    write_snapshot_csv(accumulator.rows, output_file_path)
+    logger.info(f'Run {run_id}: {summary.get("ok", 0)} ok, {summary.get("error", 0)} failed; '
+                f'{len(accumulator.rows)} rows written to {output_file_path}')
+    return accumulator.rows
+
+def fetch_tick_activity(ticks=None, url_template=TICK_ACTIVITY_URL, max_workers=4, rate=None):
+    # SRC-20 events of every whitelisted tick from the same paginated tick feed api_src20_actions downloads.
+    # Unlike download_pages, request errors propagate: a partial feed would silently skip changed wallets.
+    # Every page is revalidated, since a cached feed would hide exactly the events this is for.
+    for tick in ticks or whitelist:
+        url = url_template.format(tick=quote(tick, safe=''))
+        separator = '&' if '?' in url else '?'
+        pages = paginate(lambda page_number: f'{url}{separator}page={page_number}',
+                         lambda page_data: page_data['totalPages'], max_workers=max_workers, rate=rate,
+                         revalidate=True)
+        for _, page_data in pages:
+            yield from page_data['data']
+
+def load_tick_activity(pattern):
+    # SRC-20 events from fetchSRC20_* JSON array or NDJSON dumps already written by api_src20_actions
+    for file_path in sorted(glob.glob(pattern)):
+        yield from iter_json_records(file_path)
+
+def latest_activity(events):
+    """
+    Returns a dict of address -> highest block_index of any event that sent to or from it.
+    """
+    latest = {}
+    for event in events:
+        block_index = event.get('block_index')
+        if block_index is None:
+            continue
+        for key in ('creator', 'destination'):
+            address = event.get(key)
+            if address and block_index > latest.get(address, -1):
+                latest[address] = block_index
+    return latest
+
+def tick_amounts(payload, tick_whitelist=None):
+    # Whitelisted balance per tick in one balance payload
+    ticks = set(tick_whitelist) if tick_whitelist is not None else whitelist
+    amounts = {}
+    for data_item in (payload or {}).get('data') or []:
+        if data_item.get('tick') in ticks:
+            amounts[data_item['tick']] = amounts.get(data_item['tick'], 0.0) + float(data_item['amt'])
+    return amounts
+
+def snapshot_deltas(wallet_address, previous_payload, payload, tick_whitelist=None):
+    # Change-log rows for the ticks whose rounded amount moved; new and emptied ticks count from/to 0
+    before, after = tick_amounts(previous_payload, tick_whitelist), tick_amounts(payload, tick_whitelist)
+    block_time = snapshot_journal.payload_block_time(payload)
+    rows = []
+    for tick in sorted(set(before) | set(after)):
+        previous_amount, amount = round(before.get(tick, 0.0), 2), round(after.get(tick, 0.0), 2)
+        if previous_amount != amount:
+            rows.append([wallet_address, tick, str(previous_amount), str(amount),
+                         str(round(amount - previous_amount, 2)), block_time])
+    return rows
+
+def take_incremental_snapshot(wallet_addresses, baseline_path, events,
+                              output_file_path='balances_snapshot_src20-v3.csv', changelog_path=None,
+                              tick_whitelist=None, **engine_options):
+    """
+    Re-snapshots only the wallets whose on-chain state may have changed since the baseline.
+
+    An address is refetched when it is not in the baseline yet, or when the SRC-20 activity
+    feed has an event for it at a block newer than the last_block it was fetched at.
+    Everything else is carried forward from the baseline, which is updated with every
+    refetched payload. The first run against an empty baseline is a full snapshot.
+
+    Parameters:
+    - wallet_addresses: List of wallet addresses.
+    - baseline_path: SQLite baseline file, see snapshot_journal.SnapshotBaseline.
+    - events: Iterable of SRC-20 tick events (fetch_tick_activity or load_tick_activity).
+    - output_file_path: Full snapshot CSV to (re)write.
+    - changelog_path: Optional CSV of per-tick deltas of the refetched addresses.
+    - tick_whitelist: Ticks to keep. Defaults to the module whitelist.
+    - engine_options: Keyword arguments forwarded to snapshot_engine.fetch_snapshots. The refetched
+      addresses are revalidated against the server even when their cached balance is fresh.
+
+    Returns:
+    The list of snapshot rows written.
+    """
+    from tqdm import tqdm
+
+    wallet_addresses = list(wallet_addresses)
+    # The refetch set changed on-chain, so a fresh cache entry is exactly the stale answer to avoid
+    engine_options.setdefault('revalidate', True)
+    activity = latest_activity(events)
+    with snapshot_journal.SnapshotBaseline(baseline_path) as baseline:
+        last_blocks = baseline.last_blocks()
+        refetch = [address for address in wallet_addresses
+                   if address not in last_blocks
+                   or (address in activity and (last_blocks[address] is None or activity[address] > last_blocks[address]))]
+        new_addresses = sum(1 for address in refetch if address not in last_blocks)
+        logger.info(f'Baseline block {baseline.block()}: refetching {len(refetch)} of {len(wallet_addresses)} addresses '
+                    f'({new_addresses} new, {len(refetch) - new_addresses} with newer activity)')
+        previous_payloads = baseline.payloads(refetch)
+        changes = {}
+        failed = 0
+        results = snapshot_engine.stream_snapshots(refetch, **engine_options)
+        for wallet_address, snapshot_data, error in tqdm(results, total=len(refetch), desc="Refreshing snapshots"):
+            if error is None and snapshot_data and 'error' in snapshot_data:
+                check_snapshot(wallet_address, snapshot_data)
+                error = snapshot_data['error']
+            if error is not None:
+                # The baseline keeps the previous payload, so the address is retried next run
+                logger.error(f'Error fetching snapshot for {wallet_address}: {error}')
+                failed += 1
+                continue
+            changes[wallet_address] = snapshot_deltas(wallet_address, previous_payloads.get(wallet_address), snapshot_data,
+                                                      tick_whitelist)
+            baseline.record(wallet_address, snapshot_data)
+        payloads = baseline.payloads(wallet_addresses)
+
+    accumulator = SnapshotAccumulator(tick_whitelist)
+    for wallet_address in wallet_addresses:
+        if wallet_address in payloads:
+            accumulator.add([payloads[wallet_address]])
+    write_snapshot_csv(accumulator.rows, output_file_path)
+    change_rows = [row for wallet_address in wallet_addresses for row in changes.get(wallet_address, [])]
+    if changelog_path is not None:
+        write_changelog_csv(change_rows, changelog_path)
+    logger.info(f'{len(refetch) - failed} addresses refreshed ({failed} failed), '
+                f'{len(wallet_addresses) - len(refetch)} carried forward; {len(change_rows)} balance changes, '
+                f'{len(accumulator.rows)} rows written to {output_file_path}')
+    return accumulator.rows
+
+def write_changelog_csv(rows, changelog_path):
+    temp_file_path = f'{changelog_path}.tmp'
+    with open(temp_file_path, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile, quoting=csv.QUOTE_ALL)
+        writer.writerow(CHANGELOG_FIELDS)
+        writer.writerows(rows)
+    os.replace(temp_file_path, changelog_path)
+
+def write_snapshot_csv(rows, output_file_path):
+    # Write to a temporary file and rename, so a crash never leaves a half-written CSV behind
+    temp_file_path = f'{output_file_path}.tmp'
+    with open(temp_file_path, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile, quoting=csv.QUOTE_ALL)
+        writer.writerow(SNAPSHOT_FIELDS)
+        writer.writerows(rows)
+    os.replace(temp_file_path, output_file_path)
+
+def check_snapshot(wallet_address, snapshot_data):
+    if snapshot_data and 'error' in snapshot_data:
+        logger.error(f'Error generating snapshot for wallet address {wallet_address}: {snapshot_data["error"]}')
+    # The balance endpoint answers with one {'data': [...]} payload; the accumulator takes a list of them
+    if isinstance(snapshot_data, dict):
+        snapshot_data = [snapshot_data]
+    return snapshot_data
+
+def get_snapshot(wallet_address, **engine_options):
+    # Single-address lookup through the same pooled, rate-limited engine used by take_snapshot
+    for _, snapshot_data, error in snapshot_engine.stream_snapshots([wallet_address], **engine_options):
+        if error is not None:
+            logger.error(f'Something went wrong for wallet address {wallet_address}: {error}')
+            return None
+        return check_snapshot(wallet_address, snapshot_data)
     return None
 
 def save_snapshots_to_csv(snapshot_results, output_file_path):
-    # Filter snapshot_results to include only those with a tick in the whitelist
-    filtered_snapshot_results = [
-        item for item in snapshot_results 
-        if isinstance(item, dict) and 'data' in item 
-        and isinstance(item['data'], list) 
-        for data_item in item['data'] 
-        if isinstance(data_item, dict) and data_item.get('tick') in whitelist
-    ]
-    # Convert the filtered list of dictionaries to a DataFrame
-    df_nested = pd.json_normalize(filtered_snapshot_results, record_path=['data'], sep='_')
-
+    # Keep only whitelisted ticks and drop duplicate rows
+    rows = SnapshotAccumulator().add(snapshot_results)
+    with run_metrics.timed('lock'):
+        csv_lock.acquire()
     try:
-        # Adjust these column names based on the actual, verified structure
-        df_final = df_nested[['address', 'tick', 'amt', 'block_time']]
-        df_final.columns = ['Address', 'Ticker', 'Amount', 'Block Time']
-        
-        # Convert 'Amount' to float and round to 2 decimal places, then convert back to string if needed
-        df_final.loc[:, 'Amount'] = df_final['Amount'].astype(float).round(2).astype(str)
-        
-        # Log a sample of the DataFrame
-        logger.info(f"Sample of data being saved:\n{df_final.head()}")
-
-    except KeyError as e:
-        logger.error(f"Column not found: {e}")
-        return  # Add a return statement to exit the function in case of an error
+        # Check if the file exists to determine whether to write headers
+        file_exists = os.path.exists(output_file_path)
+        with run_metrics.timed('disk'), open(output_file_path, 'a' if file_exists else 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile, quoting=csv.QUOTE_ALL)
+            if not file_exists:
+                writer.writerow(SNAPSHOT_FIELDS)
+            writer.writerows(rows)
+        logger.debug('Snapshot results saved to %s', output_file_path)
     except Exception as e:
-        logger.error(f"Error processing DataFrame: {e}")
-        return  # Add a return statement to exit the function in case of an error
-
-    with csv_lock:
-        try:
-            # Check if the file exists to determine whether to write headers
-            file_exists = os.path.exists(output_file_path)
-            df_final.to_csv(output_file_path, mode='a' if file_exists else 'w', header=not file_exists, index=False, quoting=csv.QUOTE_ALL)
-            logger.info(f'Snapshot results saved to {output_file_path}')
-
-            time.sleep(2.5)
-        except Exception as e:
-            logger.error(f"Error saving to CSV: {e}")
+        logger.error(f"Error saving to CSV: {e}")
+    finally:
+        csv_lock.release()
 
 def process_wallet_addresses(addresses_file):
     """Process wallet addresses from a file """
@@ -125,7 +394,59 @@ def process_wallet_addresses(addresses_file):
         wallet_addresses = [line.strip() for line in file if line.strip()]
     return wallet_addresses
 
+def setup_logging():
+    # Set up colored logging on the root logger
+    import colorlog
+    root_logger = colorlog.getLogger()
+    root_logger.setLevel(colorlog.INFO)
+    handler = colorlog.StreamHandler()
+    handler.setFormatter(colorlog.ColoredFormatter(
+        '%(log_color)s%(asctime)s [%(levelname)s] %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S',
+        log_colors={
+            'DEBUG': 'cyan',
+            'INFO': 'green',
+            'WARNING': 'yellow',
+            'ERROR': 'red',
+            'CRITICAL': 'red,bg_white',
+        }
+    ))
+    root_logger.addHandler(handler)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Take an SRC20 balance snapshot for every wallet address.')
+    parser.add_argument('--addresses', default='./combined_btc_addresses.txt', help='File with one wallet address per line.')
+    parser.add_argument('--concurrency', type=int, default=8, help='Requests in flight at start (adapts on 429/5xx).')
+    parser.add_argument('--max-concurrency', type=int, default=32, help='Upper bound for adaptive concurrency.')
+    parser.add_argument('--rate', type=float, default=snapshot_engine.DEFAULT_RATE, help='Requests per second per host.')
+    parser.add_argument('--output', default='balances_snapshot_src20-v3.csv', help='Snapshot CSV file.')
+    parser.add_argument('--journal', default=None, help='SQLite progress journal; makes the run resumable.')
+    parser.add_argument('--run-id', default=None, help='Journal run id. Defaults to a hash of the address list.')
+    parser.add_argument('--url-template', default=snapshot_engine.BALANCE_URL, help='Balance URL with an {address} placeholder.')
+    parser.add_argument('--baseline', default=None,
+                        help='SQLite snapshot baseline; refetches only addresses with SRC-20 activity since their last fetch.')
+    parser.add_argument('--activity', default=None,
+                        help='Glob of fetchSRC20_* .json/.ndjson event dumps for --baseline. Defaults to fetching the tick feed.')
+    parser.add_argument('--activity-url', default=TICK_ACTIVITY_URL, help='Tick feed URL with a {tick} placeholder.')
+    parser.add_argument('--changelog', default=None, help='Change-log CSV for --baseline runs (default: <output>.changes.csv).')
+    parser.add_argument('--cache-only', action='store_true', help='Serve balances from the HTTP cache only (offline).')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the HTTP response cache.')
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    if args.cache_only or args.no_cache:
+        http_cache.configure(enabled=not args.no_cache, cache_only=args.cache_only)
+    wallet_addresses = process_wallet_addresses(args.addresses)
+    if args.baseline:
+        events = load_tick_activity(args.activity) if args.activity else fetch_tick_activity(url_template=args.activity_url)
+        changelog_path = args.changelog or f'{os.path.splitext(args.output)[0]}.changes.csv'
+        take_incremental_snapshot(wallet_addresses, args.baseline, events, output_file_path=args.output,
+                                  changelog_path=changelog_path, url_template=args.url_template,
+                                  concurrency=args.concurrency, max_concurrency=args.max_concurrency, rate=args.rate)
+    else:
+        take_snapshot(wallet_addresses, output_file_path=args.output, journal_path=args.journal, run_id=args.run_id,
+                      url_template=args.url_template, concurrency=args.concurrency,
+                      max_concurrency=args.max_concurrency, rate=args.rate)
+
 if __name__ == "__main__":
-    wallet_addresses = process_wallet_addresses('./combined_btc_addresses.txt')
-    snapshots = take_snapshot(wallet_addresses)
-    save_snapshots_to_csv(snapshots, 'balances_snapshot_src20-v3.csv')
+    main()
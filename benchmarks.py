@@ -0,0 +1,1434 @@
+import argparse
+import csv
+import hashlib
+import inspect
+import json
+import random
+import shutil
+import socket
+import filecmp
+import glob
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import airdrop_config
+import api_src20_actions
+import balance_snapshot
+import btc_address
+import collection_scraper
+import http_cache
+import run_metrics
+import snapshot_engine
+from stub_server import run_stub_server, stub_address, stub_balance, stub_stamp, stub_tick_event
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def synthetic_addresses(count, prefix='bc1qbench'):
+    # Stable, address-shaped strings; the stub server does not validate them
+    return [f'{prefix}{hashlib.sha256(str(i).encode()).hexdigest()[:32]}' for i in range(count)]
+
+
+def synthetic_btc_addresses(count, seed=0):
+    # Checksum-valid mainnet addresses cycling through P2PKH, P2SH, P2WPKH, P2WSH and P2TR
+    rng = random.Random(seed)
+    encoders = [
+        lambda: btc_address.encode_base58check(0x00, rng.randbytes(20)),
+        lambda: btc_address.encode_base58check(0x05, rng.randbytes(20)),
+        lambda: btc_address.encode_segwit(0, rng.randbytes(20)),
+        lambda: btc_address.encode_segwit(0, rng.randbytes(32)),
+        lambda: btc_address.encode_segwit(1, rng.randbytes(32)),
+    ]
+    return [encoders[i % len(encoders)]() for i in range(count)]
+
+
+def write_synthetic_staging(folder, ticks, rows_per_tick, address_pool, seed=0):
+    # staging-<tick>_holders.csv files drawing holders from a shared address pool
+    rng = random.Random(seed)
+    addresses = synthetic_btc_addresses(address_pool, seed)
+    paths = []
+    for tick in ticks:
+        path = os.path.join(folder, f'staging-{tick}_holders.csv')
+        with open(path, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['address', 'balance', 'blockHeight'])
+            for _ in range(rows_per_tick):
+                writer.writerow([rng.choice(addresses), f'{rng.uniform(1, 1e6):.4f}', rng.randint(819000, 840000)])
+        paths.append(path)
+    return paths
+
+
+def scaled_address(address, copy, kind):
+    # Copy 0 is the address itself; later copies are checksum-valid addresses of the same type,
+    # and invalid addresses stay invalid
+    if copy == 0:
+        return address
+    payload = hashlib.sha256(f'{copy}:{address}'.encode()).digest()
+    if kind == btc_address.P2PKH:
+        return btc_address.encode_base58check(0x00, payload[:20])
+    if kind == btc_address.P2SH:
+        return btc_address.encode_base58check(0x05, payload[:20])
+    if kind == btc_address.P2WPKH:
+        return btc_address.encode_segwit(0, payload[:20])
+    if kind == btc_address.P2WSH:
+        return btc_address.encode_segwit(0, payload)
+    if kind == btc_address.P2TR:
+        return btc_address.encode_segwit(1, payload)
+    return f'{address}x{copy}'
+
+
+def write_scaled(path, header, rows, scale, kinds):
+    # Writes every row once per copy with the copy's variant of its address (first column); the same
+    # address maps to the same variant in every file, so overlaps between files survive the scaling
+    with open(path, 'w', newline='') as output:
+        writer = csv.writer(output)
+        if header:
+            writer.writerow(header)
+        for copy in range(scale):
+            variants = {}
+            for row in rows:
+                variant = variants.get(row[0])
+                if variant is None:
+                    variant = variants[row[0]] = scaled_address(row[0], copy, kinds.get(row[0]))
+                writer.writerow([variant, *row[1:]])
+    return len(rows) * scale
+
+
+def read_rows(path):
+    # Header and non-empty rows of a CSV file
+    with open(path, newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, None)
+        return header, [row for row in reader if row and row[0].strip()]
+
+
+def generate_dataset(folder, scale, staging_rows=5000, source_dir=REPO_DIR, seed=0):
+    """
+    Writes a copy of the repo's inputs scaled by a whole factor, laid out like the repo.
+
+    combined_btc_addresses.txt, the col-*_holders.csv collection files and the src-*_holders.csv
+    collector files are taken from source_dir. The repo holds no staging-*.csv files, so one per
+    whitelisted tick is drawn from the combined addresses. Every row appears scale times, once
+    with its own address and once per extra copy with a generated address of the same type.
+
+    Parameters:
+    - folder: Dataset folder; receives combined_btc_addresses.txt, data/ and rules/.
+    - scale: Row multiplier, e.g. 1, 10 or 100.
+    - staging_rows: Rows per staging file before scaling.
+    - source_dir: Repo checkout to read the real inputs from.
+    - seed: Seed for the staging balances and block heights.
+
+    Returns:
+    A dict of row counts per input kind.
+    """
+    for subfolder in ('data/collections', 'data/src20_holders', 'data/final', 'data/logs', 'rules'):
+        os.makedirs(os.path.join(folder, subfolder), exist_ok=True)
+    with open(os.path.join(source_dir, 'combined_btc_addresses.txt')) as address_file:
+        addresses = [[line.strip()] for line in address_file if line.strip()]
+    holder_files = {os.path.basename(path): read_rows(path)
+                    for path in sorted(glob.glob(os.path.join(source_dir, 'data', 'collections', 'col-*_holders.csv')) +
+                                       glob.glob(os.path.join(source_dir, 'data', 'collectors_src20', 'src-*_holders.csv')))}
+    rng = random.Random(seed)
+    staging_files = {}
+    for tick in airdrop_config.SRC20_WHITELIST:
+        rows = [[rng.choice(addresses)[0], f'{rng.uniform(1, 1e6):.4f}', str(rng.randint(819000, 840000))]
+                for _ in range(staging_rows)]
+        staging_files[f"staging-{tick.upper().lstrip('$')}_holders.csv"] = (['address', 'balance', 'blockHeight'], rows)
+
+    distinct = {row[0] for row in addresses}
+    distinct.update(row[0] for _, rows in holder_files.values() for row in rows)
+    distinct = sorted(distinct)
+    kinds = dict(zip(distinct, btc_address.classify_many(distinct)))
+
+    counts = {'addresses': write_scaled(os.path.join(folder, 'combined_btc_addresses.txt'), None, addresses, scale, kinds)}
+    counts['holder_rows'] = sum(write_scaled(os.path.join(folder, 'data', 'collections', name), header, rows, scale, kinds)
+                                for name, (header, rows) in holder_files.items())
+    counts['staging_rows'] = sum(write_scaled(os.path.join(folder, 'data', 'src20_holders', name), header, rows, scale, kinds)
+                                 for name, (header, rows) in staging_files.items())
+    shutil.copyfile(os.path.join(source_dir, 'rules', 'allocation_rules.json'),
+                    os.path.join(folder, 'rules', 'allocation_rules.json'))
+    return counts
+
+
+def run_script(script, *script_args, cwd):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(REPO_DIR, script), *script_args], cwd=cwd, check=True,
+                   stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+# Runs a Python script or -c source and records the process's own peak RSS (VmHWM, KiB) on exit.
+# ru_maxrss from wait4 is not used: Linux carries it across exec, so it reports the parent's peak.
+MEASURE_WRAPPER = """
+import atexit, os, runpy, sys
+def report():
+    with open('/proc/self/status') as status:
+        peak = next(line for line in status if line.startswith('VmHWM')).split()[1]
+    with open(os.environ['BENCH_PEAK_RSS_FILE'], 'w') as out:
+        out.write(peak)
+atexit.register(report)
+arguments = sys.argv[1:]
+if arguments[0] == '-c':
+    sys.argv = ['-c'] + arguments[2:]
+    exec(compile(arguments[1], '<string>', 'exec'), {'__name__': '__main__'})
+else:
+    sys.argv = arguments
+    sys.path.insert(0, os.path.dirname(os.path.abspath(arguments[0])))
+    runpy.run_path(arguments[0], run_name='__main__')
+"""
+
+
+def run_measured(command, cwd, stderr=None):
+    # Wall time and peak RSS (KiB) of a [sys.executable, script-or--c, ...] command in a child process
+    with tempfile.NamedTemporaryFile('r') as peak_file:
+        env = dict(os.environ, BENCH_PEAK_RSS_FILE=peak_file.name)
+        start = time.perf_counter()
+        subprocess.run([command[0], '-c', MEASURE_WRAPPER, *command[1:]], cwd=cwd, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=stderr)
+        elapsed = time.perf_counter() - start
+        return elapsed, int(peak_file.read())
+
+
+def legacy_src20_merge(file_pattern, output_file_path):
+    # The nested-defaultdict merge data_src20_holders used before interned address IDs
+    import csv
+    import os
+    from collections import defaultdict
+    from glob import glob
+
+    address_data = defaultdict(lambda: defaultdict(lambda: {'balance': 0, 'low_block': float('inf'), 'high_block': 0}))
+    all_src20s = set()
+    for filename in glob(file_pattern):
+        src20_name = os.path.basename(filename).split('_holders.csv')[0][8:]
+        all_src20s.add(src20_name)
+        with open(filename, 'r') as infile:
+            for row in csv.DictReader(infile):
+                address = row['address'].strip()
+                balance = float(row['balance'])
+                block_height = int(row['blockHeight'])
+                address_data[address][src20_name]['balance'] += balance
+                address_data[address][src20_name]['low_block'] = min(address_data[address][src20_name]['low_block'], block_height)
+                address_data[address][src20_name]['high_block'] = max(address_data[address][src20_name]['high_block'], block_height)
+    with open(output_file_path, 'w', newline='') as outfile:
+        fieldnames = ['address'] + sorted(all_src20s) + ['lowest_blockHeight', 'highest_blockHeight']
+        writer = csv.DictWriter(outfile, fieldnames=fieldnames)
+        writer.writeheader()
+        for address, data in address_data.items():
+            row = {'address': address}
+            lowest_block = float('inf')
+            highest_block = 0
+            for name, details in data.items():
+                row[name] = details['balance']
+                lowest_block = min(lowest_block, details['low_block'])
+                highest_block = max(highest_block, details['high_block'])
+            row['lowest_blockHeight'] = lowest_block if lowest_block != float('inf') else 0
+            row['highest_blockHeight'] = highest_block
+            writer.writerow(row)
+
+
+def bench_addresses(args):
+    # Checksum validator versus the per-cell regex on address-shaped cells with repeats
+    import re
+
+    rng = random.Random(0)
+    valid = synthetic_btc_addresses(args.unique)
+    # Cells the regex accepts but whose checksum is wrong, plus header and junk cells
+    corrupted = [address[:-1] + ('q' if address[-1] != 'q' else 'p') for address in valid[:args.unique // 100]]
+    pool = valid + corrupted + ['address', '', 'bc1qbench1234']
+    cells = [rng.choice(pool) for _ in range(args.cells)]
+
+    start = time.perf_counter()
+    regex_verdicts = [re.match(r'^(bc1|[13])[a-zA-HJ-NP-Z0-9]{25,39}$', cell) is not None for cell in cells]
+    regex_elapsed = time.perf_counter() - start
+    regex_hits = sum(regex_verdicts)
+    btc_address.clear_cache()
+    start = time.perf_counter()
+    verdicts = btc_address.classify_many(cells)
+    cold_elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    btc_address.classify_many(cells)
+    warm_elapsed = time.perf_counter() - start
+    checksum_hits = sum(verdict is not None for verdict in verdicts)
+
+    print(f"addresses: {args.cells} cells over {len(pool)} distinct values")
+    print(f"  regex:             {regex_elapsed:.2f}s ({args.cells / regex_elapsed:,.0f} cells/s), {regex_hits} accepted")
+    print(f"  checksum (cold):   {cold_elapsed:.2f}s ({args.cells / cold_elapsed:,.0f} cells/s), {checksum_hits} accepted")
+    print(f"  checksum (cached): {warm_elapsed:.2f}s ({args.cells / warm_elapsed:,.0f} cells/s)")
+    regex_only = {cell for cell, by_regex, verdict in zip(cells, regex_verdicts, verdicts) if by_regex and verdict is None}
+    checksum_only = {cell for cell, by_regex, verdict in zip(cells, regex_verdicts, verdicts) if not by_regex and verdict}
+    print(f"  distinct values accepted only by the regex: {len(regex_only)}, only by the checksum: {len(checksum_only)}")
+
+
+def bench_wallets(args):
+    # data_merge_wallets: single-process set scan versus sharded process-pool merge at growing file volumes
+    import data_merge_wallets
+
+    for scale in args.scales:
+        files = args.files * scale
+        pool = synthetic_btc_addresses(args.addresses * scale, seed=scale)
+        rng = random.Random(scale)
+        with tempfile.TemporaryDirectory() as tmp:
+            for index in range(files):
+                prefix = 'col' if index % 4 else 'src'
+                with open(os.path.join(tmp, f'{prefix}-bench{index}_holders.csv'), 'w', newline='') as csvfile:
+                    writer = csv.writer(csvfile)
+                    writer.writerow(['address'])
+                    writer.writerows([rng.choice(pool)] for _ in range(args.rows))
+
+            btc_address.clear_cache()
+            start = time.perf_counter()
+            expected = data_merge_wallets.extract_valid_btc_addresses(tmp)
+            set_elapsed = time.perf_counter() - start
+            timings = {}
+            outputs = []
+            for workers in (1, args.workers, args.workers):
+                btc_address.clear_cache()
+                output_path = os.path.join(tmp, f'merged-{len(outputs)}.txt')
+                start = time.perf_counter()
+                data_merge_wallets.merge_wallet_files(tmp, output_path, workers=workers)
+                timings[workers] = time.perf_counter() - start
+                with open(output_path) as merged:
+                    outputs.append(merged.read())
+        rows = files * args.rows
+        expected_text = ''.join(address + '\n' for address in expected)
+        print(f"wallets x{scale}: {files} files, {rows} rows, {len(expected)} unique addresses")
+        print(f"  set scan:            {set_elapsed:.2f}s ({rows / set_elapsed:.0f} rows/s)")
+        print(f"  shards, 1 worker:    {timings[1]:.2f}s ({rows / timings[1]:.0f} rows/s)")
+        print(f"  shards, {args.workers} workers:   {timings[args.workers]:.2f}s ({rows / timings[args.workers]:.0f} rows/s)")
+        print(f"  deterministic: {len(set(outputs)) == 1}, matches set scan: {outputs[0] == expected_text}")
+
+
+def legacy_jsons_to_csv(json_files, csv_file):
+    # The json.load + DataFrame-per-file + pd.concat path data_transform_simple used before streaming
+    import json
+    import pandas as pd
+
+    dfs = []
+    for json_file in json_files:
+        with open(json_file) as f:
+            data = json.load(f)
+            for item in data:
+                item.pop('stamp_base64', None)
+            dfs.append(pd.DataFrame(data))
+    pd.concat(dfs, ignore_index=True).to_csv(csv_file, index=False, escapechar="\\")
+
+
+# Numbers, strings and nesting with separators at every offset, for the chunk-boundary check
+CHUNK_CHECK_ARRAY = '[1.5, 2,-30e2 ,"a,]b", {"k": [10, 2.25E-3]},true ,null, 4\n, [] ,7]'
+
+
+def check_chunk_boundaries(json_stream):
+    # Chunk sizes at which iter_json_array does not decode CHUNK_CHECK_ARRAY as json.loads does
+    expected = json.loads(CHUNK_CHECK_ARRAY)
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        json_file = os.path.join(tmp, 'chunks.json')
+        with open(json_file, 'w') as file:
+            file.write(CHUNK_CHECK_ARRAY)
+        for chunk_size in range(1, len(CHUNK_CHECK_ARRAY) + 1):
+            try:
+                decoded = list(json_stream.iter_json_array(json_file, chunk_size=chunk_size))
+            except ValueError:
+                decoded = None
+            if decoded != expected:
+                failures.append(chunk_size)
+    return failures
+
+
+def bench_json_stream(args):
+    # Peak RSS and rows/s of streaming JSON array ingestion versus json.load + pandas, per process
+    import json_stream
+
+    failures = check_chunk_boundaries(json_stream)
+    print(f"json-stream: chunk sizes 1-{len(CHUNK_CHECK_ARRAY)} decode like json.loads: {not failures}")
+    if failures:
+        print(f"  differs at chunk sizes {failures}")
+        sys.exit(1)
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        json_files = []
+        for file_index in range(args.files):
+            json_file = os.path.join(tmp, f'fetchAllStamps_{file_index}.json')
+            with open(json_file, 'w') as file:
+                file.write('[')
+                for index in range(args.records):
+                    if index:
+                        file.write(', ')
+                    stamp = file_index * args.records + index
+                    json.dump({'stamp': stamp, 'cpid': f'A{stamp}', 'creator': stub_address(stamp % 5000),
+                               'stamp_base64': 'iVBORw0KGgo' * rng.randint(100, 2000), 'supply': 1,
+                               'block_index': 780000 + stamp // 50, 'ident': 'STAMP'}, file)
+                file.write(']')
+            json_files.append(json_file)
+        size = sum(os.path.getsize(json_file) for json_file in json_files)
+        rows = args.files * args.records
+
+        legacy_source = inspect.getsource(legacy_jsons_to_csv)
+        legacy_call = f"{legacy_source}\nlegacy_jsons_to_csv({json_files!r}, {os.path.join(tmp, 'legacy.csv')!r})\n"
+        legacy_elapsed, legacy_rss = run_measured([sys.executable, '-c', legacy_call], cwd=tmp)
+        stream_call = (f"import sys; sys.path.insert(0, {REPO_DIR!r}); import json_stream; "
+                       f"json_stream.json_records_to_csv({json_files!r}, {os.path.join(tmp, 'stream.csv')!r}, "
+                       f"drop_fields=('stamp_base64',))")
+        elapsed, rss = run_measured([sys.executable, '-c', stream_call], cwd=tmp)
+    print(f"json-stream: {args.files} dumps, {rows} records, {size / 1024 ** 2:.0f} MiB")
+    print(f"  json.load + pandas: {legacy_elapsed:.2f}s ({rows / legacy_elapsed:.0f} rows/s), peak RSS {legacy_rss / 1024:.0f} MiB")
+    print(f"  streaming:          {elapsed:.2f}s ({rows / elapsed:.0f} rows/s), peak RSS {rss / 1024:.0f} MiB")
+
+
+def legacy_chunked_json_to_csv(json_file, csv_file, chunksize):
+    # The chunked data_transform.json_to_csv path: JSON Lines chunks collected and concatenated
+    import pandas as pd
+
+    df_list = []
+    with open(json_file) as f:
+        for chunk in pd.read_json(f, lines=True, chunksize=chunksize):
+            df_list.append(chunk)
+    pd.concat(df_list).to_csv(csv_file, index=False)
+
+
+def bench_convert(args):
+    # data_transform.json_to_csv: array and NDJSON inputs, CSV and Parquet outputs, versus the chunked pandas path
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        records = ({'id': f'{index}_kevin', 'tx_hash': hashlib.sha256(str(index).encode()).hexdigest(),
+                    'block_index': 819000 + index // 10, 'op': rng.choice(['MINT', 'TRANSFER']), 'tick': 'kevin',
+                    'creator': stub_address(index % 5000), 'destination': stub_address(rng.randint(0, 4999)),
+                    'amt': str(rng.randint(1, 10_000)), 'block_time': '2024-01-01T00:00:00.000Z'}
+                   for index in range(args.records))
+        ndjson_file = os.path.join(tmp, 'fetchSRC20_KEVIN_ab.ndjson')
+        with open(ndjson_file, 'w') as file:
+            api_src20_actions.write_ndjson(records, file)
+        array_file = os.path.join(tmp, 'fetchSRC20_KEVIN_ab.json')
+        with open(array_file, 'w') as file, open(ndjson_file) as lines:
+            # Same records as a JSON array, written without holding them all in memory
+            file.write('[')
+            for index, line in enumerate(lines):
+                file.write((', ' if index else '') + line.rstrip('\n'))
+            file.write(']')
+
+        legacy_source = inspect.getsource(legacy_chunked_json_to_csv)
+        legacy_call = (f"{legacy_source}\nlegacy_chunked_json_to_csv({ndjson_file!r}, "
+                       f"{os.path.join(tmp, 'legacy.csv')!r}, {args.chunksize})\n")
+        runs = [('pandas chunks + concat, NDJSON', [sys.executable, '-c', legacy_call])]
+        for label, source, output in (('streaming, NDJSON -> CSV', ndjson_file, 'ndjson.csv'),
+                                      ('streaming, array -> CSV', array_file, 'array.csv'),
+                                      ('streaming, array -> Parquet', array_file, 'array.parquet')):
+            call = (f"import sys; sys.path.insert(0, {REPO_DIR!r}); from json_stream import *; "
+                    f"{'json_records_to_parquet' if output.endswith('.parquet') else 'json_records_to_csv'}"
+                    f"([{source!r}], {os.path.join(tmp, output)!r}, batch_size={args.chunksize})")
+            runs.append((label, [sys.executable, '-c', call]))
+        print(f"convert: {args.records} records, chunks of {args.chunksize}")
+        for label, command in runs:
+            elapsed, rss = run_measured(command, cwd=tmp)
+            print(f"  {label:32s} {elapsed:.2f}s ({args.records / elapsed:.0f} rows/s), peak RSS {rss / 1024:.0f} MiB")
+        with open(os.path.join(tmp, 'ndjson.csv')) as ndjson_csv, open(os.path.join(tmp, 'array.csv')) as array_csv:
+            print(f"  NDJSON and array CSVs identical: {ndjson_csv.read() == array_csv.read()}")
+
+
+def legacy_column_chain(csv_file, output_csv_file):
+    # The chained data_utils calls before the column-op pipeline: one full pandas read and write per op
+    import pandas as pd
+
+    df = pd.read_csv(csv_file)
+    df.drop(columns=['Source'], inplace=True, errors='ignore')
+    df.to_csv(output_csv_file, index=False)
+    df = pd.read_csv(output_csv_file)
+    df['Block Time'] = df['Block Time'].apply(lambda x: x.split('T')[0] if isinstance(x, str) else x)
+    df.to_csv(output_csv_file, index=False)
+    df = pd.read_csv(output_csv_file)
+    df['Amount'] = df['Amount'].astype(int)
+    df.to_csv(output_csv_file, index=False)
+
+
+def bench_columns(args):
+    # data_utils.transform_csv in one streaming pass versus the chained full-file calls
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = os.path.join(tmp, 'final_balances_snapshot_src20.csv')
+        with open(snapshot, 'w', newline='') as csvfile:
+            # Same layout and quoting as the balance snapshot, plus a column to drop
+            writer = csv.writer(csvfile, quoting=csv.QUOTE_ALL)
+            writer.writerow(['Address', 'Ticker', 'Amount', 'Block Time', 'Source'])
+            for index in range(args.rows):
+                writer.writerow([stub_address(index % args.addresses), rng.choice(airdrop_config.SRC20_WHITELIST),
+                                 f'{rng.randint(1, 10 ** 9) / 100:.2f}',
+                                 f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T12:34:56.000Z', 'api'])
+        legacy = os.path.join(tmp, 'legacy.csv')
+        piped = os.path.join(tmp, 'pipeline.csv')
+
+        legacy_call = f"{inspect.getsource(legacy_column_chain)}\nlegacy_column_chain({snapshot!r}, {legacy!r})\n"
+        legacy_elapsed, legacy_rss = run_measured([sys.executable, '-c', legacy_call], cwd=tmp)
+        call = (f"import sys; sys.path.insert(0, {REPO_DIR!r}); from data_utils import *; "
+                f"transform_csv({snapshot!r}, [drop_columns(['Source']), strip_time('Block Time'), to_int('Amount')], "
+                f"{piped!r}, chunksize={args.chunksize})")
+        elapsed, rss = run_measured([sys.executable, '-c', call], cwd=tmp)
+        identical = filecmp.cmp(legacy, piped, shallow=False)
+    print(f"columns: {args.rows} rows, drop + strip_time + to_int")
+    print(f"  chained calls: {legacy_elapsed:.2f}s ({args.rows / legacy_elapsed:.0f} rows/s), peak RSS {legacy_rss / 1024:.0f} MiB")
+    print(f"  one pass:      {elapsed:.2f}s ({args.rows / elapsed:.0f} rows/s), peak RSS {rss / 1024:.0f} MiB")
+    print(f"  identical output: {identical}")
+
+
+def legacy_string_join(left_file, right_file, output_file):
+    # Per-stage string sets, as the scripts kept them before the address index
+    with open(left_file) as left, open(right_file) as right:
+        common = {line.strip() for line in left} & {line.strip() for line in right}
+    with open(output_file, 'w') as output:
+        output.write(str(len(common)))
+
+
+def check_index_widths(AddressIndex):
+    # Problems with keys that are prefixes of later, wider keys, across a save and reopen
+    problems = []
+    with tempfile.TemporaryDirectory() as tmp:
+        index = AddressIndex(os.path.join(tmp, 'widths.npy'))
+        assigned = {}
+        for batch in (['ab', 'b'], ['abc'], ['a', 'abcdef', 'ab']):
+            for address, address_id in zip(batch, index.add(batch).tolist()):
+                assigned.setdefault(address, address_id)
+            index.save()
+            index = AddressIndex(index.path)
+            ordered = index.keys[index.order].tolist()
+            if ordered != sorted(ordered):
+                problems.append(f'keys out of order after {batch}: {ordered}')
+            ids = dict(zip(assigned, index.lookup(list(assigned)).tolist()))
+            if ids != assigned or index.add(list(assigned)).tolist() != list(assigned.values()):
+                problems.append(f'IDs changed after {batch}: {ids} != {assigned}')
+        if len(index) != len(assigned) or index.lookup(['abcd', 'abcdefg']).tolist() != [-1, -1]:
+            problems.append(f'{len(index)} keys for {len(assigned)} addresses or unknown keys found')
+    return problems
+
+
+def bench_index(args):
+    # Joins over address index ID arrays versus string sets, and index lookups versus a dict
+    import numpy as np
+    from address_index import AddressIndex
+
+    problems = check_index_widths(AddressIndex)
+    print(f"index: prefix keys and key width growth keep stable IDs: {not problems}")
+    if problems:
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    rng = random.Random(0)
+    addresses = synthetic_btc_addresses(args.addresses)
+    with tempfile.TemporaryDirectory() as tmp:
+        # Collection holders and SRC-20 holders overlapping on part of the address pool
+        files, indexed = [], []
+        for name in ('col-holders.txt', 'src-holders.txt'):
+            path = os.path.join(tmp, name)
+            holders = rng.sample(addresses, args.addresses // 2)
+            with open(path, 'w') as output:
+                output.writelines(address + '\n' for address in holders)
+            files.append(path)
+            indexed.extend(holders)
+        index_path = os.path.join(tmp, 'address_index.npy')
+        build_call = (f"import sys; sys.path.insert(0, {REPO_DIR!r}); import numpy as np; from address_index import *\n"
+                      f"with AddressIndex({index_path!r}) as index:\n"
+                      + ''.join(f"    np.save(ids_file_path({path!r}), ids_from_csv(index, {path!r}))\n" for path in files))
+        build_elapsed, build_rss = run_measured([sys.executable, '-c', build_call], cwd=tmp)
+
+        legacy_call = (f"{inspect.getsource(legacy_string_join)}\n"
+                       f"legacy_string_join({files[0]!r}, {files[1]!r}, {os.path.join(tmp, 'legacy.txt')!r})\n")
+        legacy_elapsed, legacy_rss = run_measured([sys.executable, '-c', legacy_call], cwd=tmp)
+        join_call = (f"import sys; sys.path.insert(0, {REPO_DIR!r}); import numpy as np; from address_index import *\n"
+                     f"common = np.intersect1d(np.load(ids_file_path({files[0]!r})), np.load(ids_file_path({files[1]!r})))\n"
+                     f"open({os.path.join(tmp, 'ids.txt')!r}, 'w').write(str(len(common)))\n")
+        elapsed, rss = run_measured([sys.executable, '-c', join_call], cwd=tmp)
+        with open(os.path.join(tmp, 'legacy.txt')) as legacy, open(os.path.join(tmp, 'ids.txt')) as ids:
+            legacy_common, common = legacy.read(), ids.read()
+
+        queries = [rng.choice(indexed) for _ in range(args.lookups)]
+        address_ids = {address: address_id for address_id, address in enumerate(addresses)}
+        start = time.perf_counter()
+        [address_ids[address] for address in queries]
+        dict_elapsed = time.perf_counter() - start
+        index = AddressIndex(index_path)
+        start = time.perf_counter()
+        found = index.lookup(queries)
+        lookup_elapsed = time.perf_counter() - start
+        index_size = os.path.getsize(index_path)
+    print(f"index: {args.addresses} addresses, two holder lists of {args.addresses // 2}")
+    print(f"  build + ID arrays: {build_elapsed:.2f}s, peak RSS {build_rss / 1024:.0f} MiB, index file {index_size / 1024 ** 2:.0f} MiB")
+    print(f"  string sets join:  {legacy_elapsed:.2f}s, peak RSS {legacy_rss / 1024:.0f} MiB")
+    print(f"  ID array join:     {elapsed:.2f}s, peak RSS {rss / 1024:.0f} MiB")
+    print(f"  same overlap: {legacy_common == common} ({common} addresses)")
+    print(f"  {args.lookups} lookups: dict {args.lookups / dict_elapsed:.0f}/s, "
+          f"memory-mapped index {args.lookups / lookup_elapsed:.0f}/s, all found: {bool((found >= 0).all())}")
+
+
+def legacy_collection_matrix(file_paths, output_file_path, repo_dir):
+    # Per-address count dicts with per-row validation as in data_bosnft_holders, then the row-dict
+    # count_unique pass of data_utils.add_count_unique_column
+    import csv
+    import os
+    import sys
+    from collections import defaultdict
+
+    sys.path.insert(0, repo_dir)
+    import btc_address
+
+    names = [os.path.basename(file_path)[len('col-'):-len('_holders.csv')] for file_path in file_paths]
+    address_counts = defaultdict(lambda: defaultdict(int))
+    for name, file_path in zip(names, file_paths):
+        with open(file_path, 'r') as infile:
+            reader = csv.reader(infile)
+            next(reader)
+            for row in reader:
+                address = row[0].strip()
+                if btc_address.is_valid(address):
+                    address_counts[address][name] += 1
+    fieldnames = ['address'] + [f'count_{name}' for name in sorted(names)] + ['count__total']
+    with open(output_file_path, 'w', newline='') as outfile:
+        writer = csv.DictWriter(outfile, fieldnames=fieldnames)
+        writer.writeheader()
+        for address, held in address_counts.items():
+            row = {'address': address, 'count__total': sum(held.values())}
+            row.update({f'count_{name}': held.get(name, 0) for name in names})
+            writer.writerow(row)
+
+    with open(output_file_path, mode='r', newline='') as file:
+        reader = csv.DictReader(file)
+        data = list(reader)
+        fieldnames = reader.fieldnames + ['count_unique']
+    for row in data:
+        row['count_unique'] = sum(1 for key, value in row.items()
+                                  if key.startswith('count_') and key != 'count__total' and int(value) > 0)
+    with open(output_file_path, mode='w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(data)
+
+
+def bench_holdings(args):
+    # collection_holdings matrix versus per-address dicts plus the row-dict count_unique pass
+    import pandas as pd
+
+    rng = random.Random(0)
+    addresses = synthetic_btc_addresses(args.addresses)
+    # Holder rows skewed towards a few big collections, like bos_nft and vivalastamps_nft
+    weights = [1 / (rank + 1) for rank in range(args.collections)]
+    sizes = [int(args.rows * weight / sum(weights)) for weight in weights]
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = os.path.join(tmp, 'collections')
+        os.makedirs(folder)
+        os.makedirs(os.path.join(tmp, 'data', 'logs'))
+        for index, size in enumerate(sizes):
+            with open(os.path.join(folder, f'col-collection{index:02d}_holders.csv'), 'w') as output:
+                output.write('address\n')
+                output.writelines(rng.choice(addresses) + '\n' for _ in range(size))
+        file_paths = sorted(os.path.join(folder, name) for name in os.listdir(folder))
+        legacy = os.path.join(tmp, 'legacy.csv')
+        matrix = os.path.join(tmp, 'collections.csv')
+
+        legacy_call = f"{inspect.getsource(legacy_collection_matrix)}\nlegacy_collection_matrix({file_paths!r}, {legacy!r}, {REPO_DIR!r})\n"
+        legacy_elapsed, legacy_rss = run_measured([sys.executable, '-c', legacy_call], cwd=tmp)
+        elapsed, rss = run_measured([sys.executable, os.path.join(REPO_DIR, 'collection_holdings.py'),
+                                     '--folder', folder, '--output', matrix], cwd=tmp)
+        legacy_frame, frame = pd.read_csv(legacy), pd.read_csv(matrix)
+        identical = legacy_frame.equals(frame)
+    rows = sum(sizes)
+    print(f"holdings: {rows} holder rows, {args.collections} collections, {len(frame)} addresses")
+    print(f"  dicts + row pass: {legacy_elapsed:.2f}s ({rows / legacy_elapsed:.0f} rows/s), peak RSS {legacy_rss / 1024:.0f} MiB")
+    print(f"  vectorized:       {elapsed:.2f}s ({rows / elapsed:.0f} rows/s), peak RSS {rss / 1024:.0f} MiB")
+    print(f"  identical matrix: {identical}")
+
+
+def legacy_clean_csv_file(file_path, repo_dir):
+    # The row-dict data_utils_fack.clean_csv_file: tuple keys, per-row classification, in-place rewrite
+    import csv
+    import sys
+
+    sys.path.insert(0, repo_dir)
+    import btc_address
+
+    cleaned_data = []
+    seen = set()
+    with open(file_path, 'r', newline='') as csvfile:
+        reader = csv.DictReader(csvfile)
+        original_fieldnames = reader.fieldnames
+        fieldnames = original_fieldnames + ['eligible'] if 'eligible' not in original_fieldnames else original_fieldnames
+        for row in reader:
+            address_type = btc_address.classify(row['address'])
+            row['eligible'] = 'No' if address_type is None or address_type == btc_address.P2WSH else 'Yes'
+            for key in row.keys():
+                if key not in ['address', 'blockHeight', 'eligible']:
+                    row[key] = row[key] or '0'
+            unique_key = tuple([row['address']] + [row[key] for key in row.keys() if key not in ['address', 'blockHeight', 'eligible']])
+            if unique_key not in seen:
+                seen.add(unique_key)
+                cleaned_data.append(row)
+    with open(file_path, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(cleaned_data)
+
+
+def bench_clean(args):
+    # Vectorized clean_csv_file versus the row-dict version on a merged holders file with duplicates
+    rng = random.Random(0)
+    addresses = synthetic_btc_addresses(args.addresses) + [f'notanaddress{index}' for index in range(args.addresses // 100)]
+    ticks = [f'tick{index}' for index in range(7)]
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, 'data', 'src20_holders'))
+        os.makedirs(os.path.join(tmp, 'data', 'logs'))
+        merged = os.path.join(tmp, 'data', 'src20_holders', 'all_holders.merged.csv')
+        report_path = os.path.join(tmp, 'data', 'logs', 'src20_holders.clean_report.json')
+        with open(merged, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['address'] + ticks + ['lowest_blockHeight', 'highest_blockHeight'])
+            rows = []
+            for _ in range(args.rows):
+                if rows and rng.random() < args.duplicates:
+                    row = rng.choice(rows)
+                else:
+                    row = ([rng.choice(addresses)] + [f'{rng.uniform(1, 1e6):.4f}' if rng.random() < 0.3 else '' for _ in ticks]
+                           + [rng.randint(819000, 830000), rng.randint(830000, 840000)])
+                    rows.append(row)
+                writer.writerow(row)
+            del rows
+        legacy = os.path.join(tmp, 'legacy.csv')
+        shutil.copyfile(merged, legacy)
+
+        legacy_call = f"{inspect.getsource(legacy_clean_csv_file)}\nlegacy_clean_csv_file({legacy!r}, {REPO_DIR!r})\n"
+        legacy_elapsed, legacy_rss = run_measured([sys.executable, '-c', legacy_call], cwd=tmp)
+        # data_utils_fack cleans ./data/src20_holders/all_holders.merged.csv in place
+        elapsed, rss = run_measured([sys.executable, os.path.join(REPO_DIR, 'data_utils_fack.py'),
+                                     '--eligibility', 'p2wsh'], cwd=tmp)
+        identical = filecmp.cmp(legacy, merged, shallow=False)
+        with open(report_path) as report_file:
+            report = json.load(report_file)
+    print(f"clean: {args.rows} rows, {args.duplicates:.0%} duplicated")
+    print(f"  row dicts:  {legacy_elapsed:.2f}s ({args.rows / legacy_elapsed:.0f} rows/s), peak RSS {legacy_rss / 1024:.0f} MiB")
+    print(f"  vectorized: {elapsed:.2f}s ({args.rows / elapsed:.0f} rows/s), peak RSS {rss / 1024:.0f} MiB")
+    print(f"  identical output: {identical}; report: {report['duplicates']} duplicates removed, "
+          f"{report['ineligible']} of {report['written']} ineligible ({report['invalid']} invalid, {report['p2wsh']} P2WSH)")
+
+
+def bench_pipeline(args):
+    # Offline pipeline runs on synthetic holders: cold, unchanged, one rule changed, one staging file changed
+    import pipeline
+
+    ticks = [tick.upper().lstrip('$') for tick in airdrop_config.SRC20_WHITELIST]
+    with tempfile.TemporaryDirectory() as tmp:
+        for folder in ('data/src20_holders', 'data/collections', 'data/final', 'data/logs', 'rules'):
+            os.makedirs(os.path.join(tmp, folder))
+        write_synthetic_staging(os.path.join(tmp, 'data', 'src20_holders'), ticks, args.rows, args.addresses)
+        rng = random.Random(0)
+        addresses = synthetic_btc_addresses(args.addresses, seed=1)
+        for name in ('bos_nft', 'vivalastamps_nft', 'stampshroomz'):
+            with open(os.path.join(tmp, 'data', 'collections', f'col-{name}_holders.csv'), 'w') as output:
+                output.write('address\n')
+                output.writelines(rng.choice(addresses) + '\n' for _ in range(args.rows))
+        # One fetched SRC-20 event dump, whose addresses reach col-MERGED.txt through src20-addresses
+        events = [dict(stub_tick_event(ticks[0], index), creator=rng.choice(addresses), destination=rng.choice(addresses))
+                  for index in range(args.rows // 10)]
+        with open(os.path.join(tmp, f'fetchSRC20_{ticks[0]}_bench.json'), 'w') as dump:
+            json.dump(events, dump)
+        rules_path = os.path.join(tmp, 'rules', 'allocation_rules.json')
+        shutil.copyfile(os.path.join(REPO_DIR, 'rules', 'allocation_rules.json'), rules_path)
+
+        # Everything downstream of the fetched holder files and event dumps
+        targets = ['allocate', 'collection-matrix', 'merge-wallets']
+
+        def run(label):
+            start = time.perf_counter()
+            results = pipeline.Pipeline(pipeline.AIRDROP_STAGES, workdir=tmp, jobs=args.jobs).run(targets, offline=True)
+            elapsed = time.perf_counter() - start
+            ran = [name for name, result in results.items() if result['status'] == 'ran']
+            failed = [name for name, result in results.items() if result['status'] in ('failed', 'blocked')]
+            print(f"  {label:24s} {elapsed:6.2f}s  ran: {', '.join(ran) or '-'}"
+                  f"{'  FAILED: ' + ', '.join(failed) if failed else ''}")
+
+        print(f"pipeline: {len(ticks)} staging files and 3 collections of {args.rows} rows, {args.jobs} jobs")
+        run('cold')
+        with open(os.path.join(tmp, 'data', 'collections', 'col-MERGED.txt')) as merged:
+            merged_addresses = set(merged.read().split())
+        print(f"  event addresses in col-MERGED.txt: "
+              f"{all(event['creator'] in merged_addresses for event in events)}")
+        run('unchanged')
+        with open(rules_path) as rules_file:
+            rules = json.load(rules_file)
+        rules['rules'][0]['amount'] += 1
+        with open(rules_path, 'w') as rules_file:
+            json.dump(rules, rules_file)
+        run('allocation rule changed')
+        with open(os.path.join(tmp, 'data', 'src20_holders', f'staging-{ticks[0]}_holders.csv'), 'a') as staging:
+            staging.write(f'{addresses[0]},1.0,840001\n')
+        run('staging file changed')
+
+
+def bench_merge_state(args):
+    # Interned-ID typed-array merge versus the nested-dict merge, each in its own process
+    ticks = [f'tick{i}' for i in range(args.ticks)]
+    with tempfile.TemporaryDirectory() as tmp:
+        staging_dir = os.path.join(tmp, 'data', 'src20_holders')
+        os.makedirs(staging_dir)
+        os.makedirs(os.path.join(tmp, 'data', 'logs'))
+        write_synthetic_staging(staging_dir, ticks, args.rows, args.addresses)
+        rows = args.rows * args.ticks
+        merged = os.path.join(staging_dir, 'all_holders.merged.csv')
+        legacy = os.path.join(tmp, 'legacy.merged.csv')
+
+        legacy_source = inspect.getsource(legacy_src20_merge)
+        legacy_call = f"{legacy_source}\nlegacy_src20_merge({os.path.join(staging_dir, 'staging-*.csv')!r}, {legacy!r})\n"
+        legacy_elapsed, legacy_rss = run_measured([sys.executable, '-c', legacy_call], cwd=tmp)
+        elapsed, rss = run_measured([sys.executable, os.path.join(REPO_DIR, 'data_src20_holders.py')], cwd=tmp)
+        identical = filecmp.cmp(merged, legacy, shallow=False)
+        index_elapsed, index_rss = run_measured([sys.executable, os.path.join(REPO_DIR, 'data_src20_holders.py'),
+                                                 '--index', os.path.join(tmp, 'address_index.npy')], cwd=tmp)
+        index_identical = filecmp.cmp(merged, legacy, shallow=False)
+    print(f"merge-state: {rows} staging rows, {args.addresses} address pool")
+    print(f"  nested dicts:  {legacy_elapsed:.2f}s ({rows / legacy_elapsed:.0f} rows/s), peak RSS {legacy_rss / 1024:.0f} MiB")
+    print(f"  typed arrays:  {elapsed:.2f}s ({rows / elapsed:.0f} rows/s), peak RSS {rss / 1024:.0f} MiB")
+    print(f"  + address index: {index_elapsed:.2f}s ({rows / index_elapsed:.0f} rows/s), peak RSS {index_rss / 1024:.0f} MiB")
+    print(f"  identical output: {identical}, with index: {index_identical}")
+
+
+def bench_merge(args):
+    # End-to-end data_src20_holders merge from staging CSVs versus from the columnar holder store
+    import holder_store
+
+    ticks = [f'tick{i}' for i in range(args.ticks)]
+    with tempfile.TemporaryDirectory() as tmp:
+        staging_dir = os.path.join(tmp, 'data', 'src20_holders')
+        os.makedirs(staging_dir)
+        os.makedirs(os.path.join(tmp, 'data', 'logs'))
+        write_synthetic_staging(staging_dir, ticks, args.rows, args.addresses)
+        rows = args.rows * args.ticks
+
+        csv_elapsed = run_script('data_src20_holders.py', cwd=tmp)
+        start = time.perf_counter()
+        store_dir = os.path.join(tmp, 'store')
+        holder_store.import_csv_dir(staging_dir, store_dir)
+        import_elapsed = time.perf_counter() - start
+        store_elapsed = run_script('data_src20_holders.py', '--store', store_dir, cwd=tmp)
+    print(f"merge: {rows} staging rows, CSV {csv_elapsed:.2f}s ({rows / csv_elapsed:.0f} rows/s), "
+          f"store {store_elapsed:.2f}s ({rows / store_elapsed:.0f} rows/s), one-off CSV import {import_elapsed:.2f}s")
+
+
+def legacy_allocations(file_path, output_file_path):
+    # The row-by-row DictReader loop calculate_allocations_src20 used before the allocation engine
+    assets = ['STAMP', 'KEVIN', 'UTXO', 'STMAP', 'VIVA', 'SATO']
+    allocations = []
+    with open(file_path, 'r', newline='') as csvfile:
+        for row in csv.DictReader(csvfile):
+            allocation_amount = 0
+            for asset in assets:
+                if asset in row and float(row[asset]) > 0:
+                    allocation_amount += 3000
+            if 'SPAD' in row and float(row['SPAD']) > 0:
+                allocation_amount += 9000
+            allocations.append({'address': row['address'], 'allocation': allocation_amount})
+    with open(output_file_path, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=['address', 'allocation'])
+        writer.writeheader()
+        writer.writerows(allocations)
+
+
+def bench_allocate(args):
+    import allocation_engine
+
+    columns = ['STAMP', 'KEVIN', 'UTXO', 'STMAP', 'VIVA', 'SATO', 'SPAD', 'BOS']
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        merged = os.path.join(tmp, 'all_holders.merged.csv')
+        with open(merged, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['address'] + columns + ['lowest_blockHeight', 'highest_blockHeight'])
+            for address in synthetic_addresses(args.addresses):
+                writer.writerow([address] + [rng.choice((0, 0, 0, rng.randint(1, 10 ** 6))) for _ in columns]
+                                + [819000, 840000])
+
+        start = time.perf_counter()
+        allocation_engine.allocate(merged, os.path.join(tmp, 'engine.csv'))
+        engine_elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        legacy_allocations(merged, os.path.join(tmp, 'legacy.csv'))
+        legacy_elapsed = time.perf_counter() - start
+        identical = filecmp.cmp(os.path.join(tmp, 'engine.csv'), os.path.join(tmp, 'legacy.csv'), shallow=False)
+    print(f"allocate: {args.addresses} addresses, engine {engine_elapsed:.2f}s, row loop {legacy_elapsed:.2f}s "
+          f"({legacy_elapsed / engine_elapsed:.1f}x); identical output: {identical}")
+
+
+def bench_snapshot(args):
+    addresses = synthetic_addresses(args.addresses)
+    with run_stub_server(latency=args.latency, error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+                         malformed_rate=args.malformed_rate) as server:
+        url_template = server.base_url + '/api/v2/src20/balance/{address}'
+        run_metrics.reset()
+        start = time.perf_counter()
+        stats = yield_from_stream(snapshot_engine.stream_snapshots(
+            addresses, url_template=url_template, concurrency=args.concurrency,
+            max_concurrency=args.max_concurrency, rate=args.rate, backoff_base=0.05, cache=False))
+        elapsed = time.perf_counter() - start
+        completed = stats['addresses']
+    print(f"snapshot: {completed} addresses in {elapsed:.2f}s "
+          f"({completed / elapsed:.1f} addresses/s), requests={stats['requests']} "
+          f"retries={stats['retries']} throttled={stats['throttled']} errors={stats['errors']}")
+    for name, record in run_metrics.endpoints().items():
+        print(f"  {name}: p50={record['p50_ms']:.1f}ms p95={record['p95_ms']:.1f}ms p99={record['p99_ms']:.1f}ms "
+              f"statuses={record['statuses']}")
+    print('  seconds across workers: ' + ' '.join(f'{phase}={seconds:.2f}' for phase, seconds in run_metrics.timings().items()))
+    if completed != len(addresses):
+        # Malformed bodies, errors and throttling must fail single addresses, never the run
+        print(f"  FAILED: {len(addresses) - completed} addresses never completed")
+        sys.exit(1)
+
+
+def bench_incremental(args):
+    # Full re-snapshot versus an incremental one driven by the tick activity feed
+    http_cache.configure(enabled=False)
+    addresses = [stub_address(index) for index in range(args.addresses)]
+    with tempfile.TemporaryDirectory() as tmp, run_stub_server(latency=args.latency, tick_events=args.events) as server:
+        url_template = server.base_url + '/api/v2/src20/balance/{address}'
+        activity_url = server.base_url + '/api/v2/src20/tick/{tick}?limit=1000'
+        options = dict(url_template=url_template, concurrency=args.concurrency, max_concurrency=args.concurrency,
+                       rate=args.rate, cache=False)
+        baseline_path = os.path.join(tmp, 'baseline.sqlite')
+        output_path = os.path.join(tmp, 'snapshot.csv')
+        changelog_path = os.path.join(tmp, 'snapshot.changes.csv')
+
+        # Baseline taken at block 819400; the stub feed has events up to block 819000 + events / 10
+        server.last_block = 819400
+        start = time.perf_counter()
+        balance_snapshot.take_incremental_snapshot(addresses, baseline_path, [], output_path, **options)
+        full_elapsed = time.perf_counter() - start
+        full_requests = server.requests
+
+        # New blocks: every balance on the server changes, and the feed shows which wallets were touched
+        server.balance_epoch = 1
+        server.last_block = 819000 + args.events // 10
+        server.requests = 0
+        start = time.perf_counter()
+        events = list(balance_snapshot.fetch_tick_activity(url_template=activity_url))
+        feed_elapsed = time.perf_counter() - start
+        feed_requests = server.requests
+        start = time.perf_counter()
+        rows = balance_snapshot.take_incremental_snapshot(addresses, baseline_path, events, output_path,
+                                                          changelog_path, **options)
+        incremental_elapsed = time.perf_counter() - start
+        balance_requests = server.requests - feed_requests
+        with open(changelog_path) as changelog:
+            changes = sum(1 for _ in changelog) - 1
+
+        # Refetched wallets must match the new chain state and the rest the baseline
+        touched = balance_snapshot.latest_activity(events)
+        expected = balance_snapshot.SnapshotAccumulator()
+        for address in addresses:
+            epoch = 1 if touched.get(address, 0) > 819400 else 0
+            expected.add([stub_balance(address, epoch)])
+    print(f"incremental: {args.addresses} wallets, {len(events)} feed events")
+    print(f"  full snapshot:        {full_elapsed:.2f}s, {full_requests} balance requests")
+    print(f"  incremental refresh:  {incremental_elapsed:.2f}s, {balance_requests} balance requests "
+          f"(+ {feed_requests} feed pages in {feed_elapsed:.2f}s), {changes} change-log rows")
+    print(f"  rows match expected state: {rows == expected.rows}")
+
+
+def bench_ledger(args):
+    # Multi-height snapshots replayed locally from fetchSRC20_*.json dumps
+    import src20_ledger
+
+    ticks = airdrop_config.SRC20_WHITELIST
+    with tempfile.TemporaryDirectory() as tmp:
+        for tick in ticks:
+            with open(os.path.join(tmp, f'fetchSRC20_{tick}_ab.json'), 'w') as file:
+                json.dump([stub_tick_event(tick, index) for index in range(args.events)], file)
+        # A second dump of the same tick, as repeated api_src20_actions runs leave behind
+        with open(os.path.join(tmp, f'fetchSRC20_{ticks[0]}_cd.json'), 'w') as file:
+            json.dump([stub_tick_event(ticks[0], index) for index in range(args.events)], file)
+
+        start = time.perf_counter()
+        events = src20_ledger.load_events(os.path.join(tmp, 'fetchSRC20_*.json'))
+        load_elapsed = time.perf_counter() - start
+    last_block = events[-1]['block_index']
+    heights = [events[0]['block_index'] + (last_block - events[0]['block_index']) * step // args.heights
+               for step in range(1, args.heights + 1)]
+
+    start = time.perf_counter()
+    snapshots = src20_ledger.replay(events, heights)
+    one_pass_elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    separate = {height: src20_ledger.replay(events, [height])[height] for height in heights}
+    separate_elapsed = time.perf_counter() - start
+
+    ledger = src20_ledger.Ledger()
+    for event in events:
+        ledger.apply(event)
+    conserved = all(sum(ledger.balances[tick].values()) == ledger.minted[tick] for tick in ledger.ticks)
+    holders = len({row[0] for row in snapshots[heights[-1]]})
+    print(f"ledger: {len(events)} events over {len(ticks)} ticks (loaded and deduplicated in {load_elapsed:.2f}s)")
+    print(f"  {len(heights)} heights in one pass: {one_pass_elapsed:.2f}s; one replay per height: {separate_elapsed:.2f}s")
+    print(f"  {holders} holders at block {heights[-1]} with 0 balance requests; {ledger.skipped} events skipped")
+    print(f"  one pass matches separate replays: {snapshots == separate}, supply conserved: {conserved}")
+
+
+def bench_accumulate(args):
+    for wallets in args.wallets:
+        payloads = [stub_balance(address) for address in synthetic_addresses(wallets)]
+        # Every wallet is reported twice, as happens when addresses repeat across input files
+        payloads = payloads + payloads
+        with tempfile.TemporaryDirectory() as tmp:
+            output_file_path = os.path.join(tmp, 'snapshot.csv')
+            accumulator = balance_snapshot.SnapshotAccumulator()
+            start = time.perf_counter()
+            with balance_snapshot.SnapshotCsvWriter(output_file_path, batch_size=args.batch_size) as writer:
+                for payload in payloads:
+                    writer.submit(accumulator.add([payload]))
+            elapsed = time.perf_counter() - start
+        print(f"accumulate: {wallets} wallets, {len(accumulator.rows)} rows kept, "
+              f"{accumulator.duplicates} duplicates dropped in {elapsed:.2f}s "
+              f"({len(payloads) / elapsed:.0f} payloads/s, {elapsed / wallets * 1e6:.2f} us/wallet)")
+
+
+def bench_resume(args):
+    # Kill a journaled snapshot run partway, resume it, and compare with an uninterrupted run
+    addresses = synthetic_addresses(args.addresses)
+    script = os.path.join(REPO_DIR, 'balance_snapshot.py')
+    with tempfile.TemporaryDirectory() as tmp, run_stub_server(latency=args.latency, error_rate=args.error_rate) as server:
+        addresses_file = os.path.join(tmp, 'addresses.txt')
+        with open(addresses_file, 'w') as file:
+            file.write('\n'.join(addresses) + '\n')
+
+        def snapshot_command(name):
+            return [sys.executable, script, '--addresses', addresses_file,
+                    '--journal', os.path.join(tmp, f'{name}.sqlite'), '--output', os.path.join(tmp, f'{name}.csv'),
+                    '--url-template', server.base_url + '/api/v2/src20/balance/{address}',
+                    '--concurrency', '4', '--max-concurrency', '8', '--rate', '1000']
+
+        # Both runs must hit the stub, not a response cache
+        env = dict(os.environ, HTTP_CACHE_DISABLE='1')
+        process = subprocess.Popen(snapshot_command('resumed'), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        time.sleep(args.kill_after)
+        process.kill()
+        process.wait()
+        killed_requests = server.requests
+
+        start = time.perf_counter()
+        subprocess.run(snapshot_command('resumed'), env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        resume_elapsed = time.perf_counter() - start
+        resumed_requests = server.requests - killed_requests
+
+        subprocess.run(snapshot_command('uninterrupted'), env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        identical = filecmp.cmp(os.path.join(tmp, 'resumed.csv'), os.path.join(tmp, 'uninterrupted.csv'), shallow=False)
+
+    print(f"resume: killed after {killed_requests} requests, resumed with {resumed_requests} requests "
+          f"in {resume_elapsed:.2f}s; output identical to uninterrupted run: {identical}")
+    if not identical:
+        sys.exit(1)
+
+
+def bench_pages(args):
+    # Sequential (one worker) versus concurrent pagination of one tick, streamed to disk
+    http_cache.configure(enabled=False)
+    with tempfile.TemporaryDirectory() as tmp, run_stub_server(latency=args.latency, tick_events=args.events) as server:
+        api_url = f'{server.base_url}/api/v2/src20/tick/STMAP?limit={args.limit}'
+        for workers in sorted({1, args.workers}):
+            start = time.perf_counter()
+            pages = api_src20_actions.download_pages(api_url, 'data', max_workers=workers)
+            count = api_src20_actions.stream_data_to_file(pages, os.path.join(tmp, f'fetchSRC20_STMAP_{workers}'))
+            elapsed = time.perf_counter() - start
+            print(f"pages: {count} events, {-(-args.events // args.limit)} pages, {workers} workers "
+                  f"in {elapsed:.2f}s ({count / elapsed:.0f} events/s)")
+
+
+def bench_collections(args):
+    # Scrape the real collection definitions against the stub server
+    http_cache.configure(enabled=False)
+    collections = collection_scraper.load_collections(args.collections)
+    with tempfile.TemporaryDirectory() as tmp, run_stub_server(latency=args.latency) as server:
+        start = time.perf_counter()
+        stats = collection_scraper.scrape_collections(
+            collections, output_dir=tmp, max_workers=args.workers,
+            url_template=server.base_url + '/api/v2/stamps/{stamp_id}')
+        elapsed = time.perf_counter() - start
+        # Holders must come out in stamp-list order, as a sequential scrape writes them
+        in_order = True
+        for name, stamp_ids in collections.items():
+            expected = ['address'] + [holder['address'] for stamp_id in stamp_ids
+                                      for holder in stub_stamp(stamp_id)['data']['holders']]
+            with open(os.path.join(tmp, f'col-{name}_holders.csv')) as output:
+                in_order = in_order and output.read().splitlines() == expected
+    stamps = sum(collection['stamps'] for collection in stats.values())
+    print(f"collections: {len(collections)} collections, {stamps} stamps in {elapsed:.2f}s "
+          f"({stamps / elapsed:.1f} stamps/s) with {args.workers} workers")
+    print(f"  holders in stamp order: {in_order}")
+    if not in_order:
+        sys.exit(1)
+
+
+# Imported in a fresh interpreter per module; prints a JSON line with the import time and what the import left behind
+IMPORT_PROBE = """
+import json, logging, sys, time
+sys.path.insert(0, {repo_dir!r})
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'heavy': [name for name in {heavy!r} if name in sys.modules],
+                  'handlers': len(logging.getLogger().handlers)}}))
+"""
+
+# Dependencies no module may load at import time, except where a module is built on one
+HEAVY_DEPENDENCIES = ['pandas', 'tqdm', 'colorlog', 'aiohttp', 'pyarrow']
+EAGER_DEPENDENCIES = {'holder_store': ['pyarrow']}
+
+
+def probe_import(module, repo_dir, cwd):
+    # One cold import of a module: (result dict, stray stdout lines, files created in cwd, error)
+    before = {os.path.join(root, name) for root, _, names in os.walk(cwd) for name in names}
+    source = IMPORT_PROBE.format(repo_dir=repo_dir, module=module, heavy=HEAVY_DEPENDENCIES)
+    try:
+        completed = subprocess.run([sys.executable, '-c', source], cwd=cwd, stdin=subprocess.DEVNULL,
+                                   capture_output=True, text=True, timeout=60)
+    except subprocess.TimeoutExpired:
+        return None, [], [], 'timed out'
+    after = {os.path.join(root, name) for root, _, names in os.walk(cwd) for name in names}
+    created = sorted(os.path.relpath(path, cwd) for path in after - before)
+    lines = completed.stdout.splitlines()
+    if completed.returncode != 0 or not lines:
+        error = (completed.stderr.strip().splitlines() or ['no output'])[-1]
+        return None, lines, created, error
+    return json.loads(lines[-1]), lines[:-1], created, None
+
+
+def bench_import(args):
+    # Cold import time of every module, failing on import-time work: output, files, logging handlers, heavy imports
+    modules = args.modules or sorted(os.path.splitext(name)[0] for name in os.listdir(args.repo)
+                                     if name.endswith('.py'))
+    failures = 0
+    print(f"import: {len(modules)} modules, best of {args.repeat}, budget {args.budget_ms:.0f} ms")
+    for module in modules:
+        with tempfile.TemporaryDirectory() as tmp:
+            runs = [probe_import(module, args.repo, tmp) for _ in range(args.repeat)]
+        result, output, created, error = runs[0]
+        problems = []
+        if error:
+            problems.append(f"import failed: {error}")
+        else:
+            seconds = min(run[0]['seconds'] for run in runs if run[0] is not None)
+            heavy = [name for name in result['heavy'] if name not in EAGER_DEPENDENCIES.get(module, [])]
+            if seconds * 1000 > args.budget_ms:
+                problems.append("over budget")
+            if heavy:
+                problems.append(f"loads {', '.join(heavy)}")
+            if result['handlers']:
+                problems.append(f"adds {result['handlers']} logging handler(s)")
+        if output:
+            problems.append(f"prints {len(output)} line(s)")
+        if created:
+            problems.append(f"creates {', '.join(created)}")
+        failures += bool(problems)
+        timing = f"{seconds * 1000:7.1f} ms" if not error else "      - ms"
+        print(f"  {module:30s} {timing}  {'; '.join(problems) or 'ok'}")
+    print(f"  {len(modules) - failures} of {len(modules)} modules import cleanly")
+    if failures:
+        sys.exit(1)
+
+
+# Offline stages of the suite in pipeline order, as bosdrop arguments run inside the scaled dataset folder
+SUITE_STAGES = [
+    ('merge wallets', ['merge', 'wallets']),
+    ('merge collections', ['merge', 'collections']),
+    ('merge src20', ['merge', 'src20']),
+    ('merge clean', ['merge', 'clean']),
+    ('allocate', ['allocate']),
+]
+
+# Runs bosdrop with the holder and event fetchers pointed at the stub server given as the first argument
+STUB_BOSDROP = """
+import sys
+sys.path.insert(0, {repo_dir!r})
+import api_src20_actions, api_src20_holders_v2, bosdrop
+base_url = sys.argv[1]
+api_src20_holders_v2.HOLDERS_URL = base_url + '/api/v1/explorer/src20/holdersByTick'
+api_src20_actions.TICK_URL = base_url + '/api/v2/src20/tick/{{tick}}?limit={{limit}}'
+bosdrop.main(sys.argv[2:])
+"""
+
+
+def measure_stage(name, command, cwd):
+    # One bosdrop stage in a child process: its rows and wall time from the run's metrics file, peak RSS from VmHWM
+    slug = name.replace(' ', '-')
+    metrics_path = os.path.join(cwd, 'data', 'logs', f'bench-{slug}.json')
+    log_path = os.path.join(cwd, 'data', 'logs', f'bench-{slug}.log')
+    with open(log_path, 'w') as log_file:
+        try:
+            elapsed, peak_kib = run_measured([*command[:-1], '--log-level', 'WARNING', '--metrics', metrics_path,
+                                              *command[-1]], cwd, stderr=log_file)
+        except subprocess.CalledProcessError:
+            print(f"  {name} failed, see {log_path}")
+            raise
+    with open(metrics_path) as metrics_file:
+        metrics = json.load(metrics_file)
+    return {
+        'rows': metrics['rows'],
+        'seconds': metrics['wall_seconds'],
+        'process_seconds': round(elapsed, 3),
+        'rows_per_second': round(metrics['rows'] / metrics['wall_seconds'], 1) if metrics['wall_seconds'] else 0.0,
+        'peak_rss_mib': round(peak_kib / 1024, 1),
+    }
+
+
+def suite_stages(args, folder, scale, base_url):
+    # (name, command) pairs of one scale: the offline stages, then the stub-backed network stages
+    bosdrop = [sys.executable, os.path.join(REPO_DIR, 'bosdrop.py')]
+    stages = [(name, [*bosdrop, stage_args]) for name, stage_args in SUITE_STAGES]
+    if args.no_network:
+        return stages
+    sample_path = os.path.join(folder, 'snapshot_addresses.txt')
+    with open(os.path.join(folder, 'combined_btc_addresses.txt')) as addresses, open(sample_path, 'w') as sample:
+        for _, line in zip(range(args.snapshot_addresses * scale), addresses):
+            sample.write(line)
+    stub_bosdrop = [sys.executable, '-c', STUB_BOSDROP.format(repo_dir=REPO_DIR), base_url]
+    network = ['--no-cache', '--rate', str(args.rate)]
+    return stages + [
+        ('snapshot', [*bosdrop, ['snapshot', '--addresses', sample_path, '--output', './data/final/snapshot.csv',
+                                 '--url-template', base_url + '/api/v2/src20/balance/{address}', *network]]),
+        ('fetch holders', [*stub_bosdrop, ['fetch', 'holders', 'BOS', '--output-dir', './data/fetched', *network]]),
+        ('fetch events', [*stub_bosdrop, ['fetch', 'events', 'BOS', *network]]),
+    ]
+
+
+def compare_to_baseline(results, baseline, tolerance, min_seconds):
+    # Prints each stage's throughput and peak memory against the baseline and returns the regressed stages;
+    # stages faster than min_seconds in both runs are too noisy to judge on throughput
+    regressions = []
+    print(f"  {'stage':26s} {'rows/s':>10s} {'baseline':>10s} {'change':>7s}   {'peak MiB':>8s} {'baseline':>8s} {'change':>7s}")
+    for key, result in results.items():
+        expected = baseline.get(key)
+        if expected is None:
+            print(f"  {key:26s} {result['rows_per_second']:10.0f} {'-':>10s}")
+            continue
+        speed = result['rows_per_second'] / expected['rows_per_second'] - 1 if expected['rows_per_second'] else 0.0
+        memory = result['peak_rss_mib'] / expected['peak_rss_mib'] - 1 if expected['peak_rss_mib'] else 0.0
+        timed = max(result['seconds'], expected['seconds']) >= min_seconds
+        problems = (['slower'] if timed and speed < -tolerance else []) + (['more memory'] if memory > tolerance else [])
+        if problems:
+            regressions.append(key)
+        print(f"  {key:26s} {result['rows_per_second']:10.0f} {expected['rows_per_second']:10.0f} {speed:+7.0%}   "
+              f"{result['peak_rss_mib']:8.0f} {expected['peak_rss_mib']:8.0f} {memory:+7.0%}"
+              f"{'  REGRESSION: ' + ', '.join(problems) if problems else ''}")
+    return regressions
+
+
+def default_baseline_path():
+    # Baselines only compare on the machine that recorded them, so each host keeps its own (gitignored)
+    return os.path.join(REPO_DIR, 'data', 'logs', f'bench_baseline-{socket.gethostname()}-{os.cpu_count()}cpu.json')
+
+
+def bench_suite(args):
+    # Every pipeline stage at each scale of the real inputs, offline, compared against a stored baseline
+    results = {}
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            folder = os.path.join(args.keep, f'x{scale}') if args.keep else tmp
+            start = time.perf_counter()
+            counts = generate_dataset(folder, scale, staging_rows=args.staging_rows)
+            print(f"x{scale}: {counts['addresses']} addresses, {counts['holder_rows']} collection holder rows, "
+                  f"{counts['staging_rows']} staging rows generated in {time.perf_counter() - start:.1f}s")
+            with run_stub_server(latency=args.latency, tick_events=args.network_rows * scale,
+                                 holders=args.network_rows * scale) as server:
+                for name, command in suite_stages(args, folder, scale, server.base_url):
+                    result = measure_stage(name, command, folder)
+                    results[f'x{scale} {name}'] = result
+                    print(f"  {name:20s} {result['rows']:10d} rows {result['seconds']:8.2f}s "
+                          f"{result['rows_per_second']:10.0f} rows/s {result['peak_rss_mib']:7.0f} MiB peak")
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+    baseline_path = args.baseline or default_baseline_path()
+    environment = {'host': socket.gethostname(), 'python': sys.version.split()[0], 'cpus': os.cpu_count()}
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(baseline_path)), exist_ok=True)
+        with open(baseline_path, 'w') as baseline_file:
+            json.dump({**environment, 'results': results}, baseline_file, indent=2)
+        print(f"Baseline saved to {baseline_path}")
+        return
+    if not os.path.exists(baseline_path):
+        print(f"No baseline at {baseline_path}; run with --save-baseline to store one.")
+        return
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)
+    mismatched = [key for key in ('python', 'cpus') if baseline.get(key) != environment[key]]
+    if mismatched:
+        # Timings from another interpreter or CPU count say nothing about this change
+        print(f"Not comparing: baseline {baseline_path} was recorded with "
+              + ', '.join(f"{key} {baseline.get(key)} (this run: {environment[key]})" for key in mismatched)
+              + "; run with --save-baseline to record one here.")
+        return
+    print(f"baseline {baseline_path} ({baseline.get('host', 'unknown host')}, python {baseline['python']}, "
+          f"{baseline['cpus']} CPUs), tolerance {args.tolerance:.0%}")
+    regressions = compare_to_baseline(results, baseline['results'], args.tolerance, args.min_seconds)
+    if regressions:
+        print(f"  {len(regressions)} stage(s) regressed")
+        sys.exit(1)
+
+
+def yield_from_stream(stream):
+    # Drains a generator and hands back its return value
+    while True:
+        try:
+            next(stream)
+        except StopIteration as stop:
+            return stop.value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Offline benchmarks against a local stampchain stub server.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    snapshot_parser = subparsers.add_parser('snapshot', help='Balance snapshot engine throughput.')
+    snapshot_parser.add_argument('--addresses', type=int, default=2000)
+    snapshot_parser.add_argument('--latency', type=float, default=0.05, help='Stub latency per request in seconds.')
+    snapshot_parser.add_argument('--error-rate', type=float, default=0.0)
+    snapshot_parser.add_argument('--throttle-rate', type=float, default=None)
+    snapshot_parser.add_argument('--malformed-rate', type=float, default=0.0,
+                                 help='Share of responses answered 200 with an HTML body.')
+    snapshot_parser.add_argument('--concurrency', type=int, default=8)
+    snapshot_parser.add_argument('--max-concurrency', type=int, default=64)
+    snapshot_parser.add_argument('--rate', type=float, default=1000.0)
+    snapshot_parser.set_defaults(func=bench_snapshot)
+
+    incremental_parser = subparsers.add_parser('incremental', help='Incremental re-snapshot from the tick activity feed.')
+    incremental_parser.add_argument('--addresses', type=int, default=10_000)
+    incremental_parser.add_argument('--events', type=int, default=5000, help='Feed events per whitelisted tick.')
+    incremental_parser.add_argument('--latency', type=float, default=0.02)
+    incremental_parser.add_argument('--concurrency', type=int, default=32)
+    incremental_parser.add_argument('--rate', type=float, default=1000.0)
+    incremental_parser.set_defaults(func=bench_incremental)
+
+    ledger_parser = subparsers.add_parser('ledger', help='Block-height snapshots replayed from event dumps.')
+    ledger_parser.add_argument('--events', type=int, default=50_000, help='Events per whitelisted tick.')
+    ledger_parser.add_argument('--heights', type=int, default=4, help='Snapshot heights cut in one pass.')
+    ledger_parser.set_defaults(func=bench_ledger)
+
+    accumulate_parser = subparsers.add_parser('accumulate', help='Snapshot dedup and CSV writer scaling.')
+    accumulate_parser.add_argument('--wallets', type=int, nargs='+', default=[30_000, 300_000])
+    accumulate_parser.add_argument('--batch-size', type=int, default=500)
+    accumulate_parser.set_defaults(func=bench_accumulate)
+
+    resume_parser = subparsers.add_parser('resume', help='Kill-and-resume check for journaled snapshot runs.')
+    resume_parser.add_argument('--addresses', type=int, default=600)
+    resume_parser.add_argument('--latency', type=float, default=0.02)
+    resume_parser.add_argument('--error-rate', type=float, default=0.0)
+    resume_parser.add_argument('--kill-after', type=float, default=2.0, help='Seconds before the first run is killed.')
+    resume_parser.set_defaults(func=bench_resume)
+
+    pages_parser = subparsers.add_parser('pages', help='SRC-20 tick pagination throughput.')
+    pages_parser.add_argument('--events', type=int, default=20_000)
+    pages_parser.add_argument('--limit', type=int, default=1000)
+    pages_parser.add_argument('--latency', type=float, default=0.2)
+    pages_parser.add_argument('--workers', type=int, default=8)
+    pages_parser.set_defaults(func=bench_pages)
+
+    collections_parser = subparsers.add_parser('collections', help='Collection holder scrape throughput.')
+    collections_parser.add_argument('--collections', default='./data/collections/json/collection_*.json')
+    collections_parser.add_argument('--latency', type=float, default=0.1)
+    collections_parser.add_argument('--workers', type=int, default=16)
+    collections_parser.set_defaults(func=bench_collections)
+
+    merge_parser = subparsers.add_parser('merge', help='SRC20 holder merge from CSV versus the holder store.')
+    merge_parser.add_argument('--ticks', type=int, default=7)
+    merge_parser.add_argument('--rows', type=int, default=200_000, help='Rows per staging file.')
+    merge_parser.add_argument('--addresses', type=int, default=100_000, help='Distinct holder addresses.')
+    merge_parser.set_defaults(func=bench_merge)
+
+    addresses_parser = subparsers.add_parser('addresses', help='Checksum address validator versus the regex.')
+    addresses_parser.add_argument('--cells', type=int, default=5_000_000)
+    addresses_parser.add_argument('--unique', type=int, default=200_000, help='Distinct valid addresses.')
+    addresses_parser.set_defaults(func=bench_addresses)
+
+    wallets_parser = subparsers.add_parser('wallets', help='Sharded wallet merge at 1x/10x/100x file volume.')
+    wallets_parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    wallets_parser.add_argument('--files', type=int, default=20, help='Holder files at 1x, like data/collections today.')
+    wallets_parser.add_argument('--rows', type=int, default=500, help='Rows per holder file.')
+    wallets_parser.add_argument('--addresses', type=int, default=5000, help='Distinct addresses at 1x.')
+    wallets_parser.add_argument('--workers', type=int, default=os.cpu_count())
+    wallets_parser.set_defaults(func=bench_wallets)
+
+    json_stream_parser = subparsers.add_parser('json-stream', help='Streaming JSON dump ingestion versus json.load.')
+    json_stream_parser.add_argument('--files', type=int, default=4)
+    json_stream_parser.add_argument('--records', type=int, default=20_000, help='Records per dump.')
+    json_stream_parser.set_defaults(func=bench_json_stream)
+
+    convert_parser = subparsers.add_parser('convert', help='Out-of-core JSON/NDJSON to CSV/Parquet conversion.')
+    convert_parser.add_argument('--records', type=int, default=1_000_000)
+    convert_parser.add_argument('--chunksize', type=int, default=10_000)
+    convert_parser.set_defaults(func=bench_convert)
+
+    index_parser = subparsers.add_parser('index', help='Address index ID joins versus string sets.')
+    index_parser.add_argument('--addresses', type=int, default=1_000_000)
+    index_parser.add_argument('--lookups', type=int, default=1_000_000)
+    index_parser.set_defaults(func=bench_index)
+
+    holdings_parser = subparsers.add_parser('holdings', help='Collection holdings matrix versus per-address dicts.')
+    holdings_parser.add_argument('--rows', type=int, default=2_000_000, help='Holder rows across all collections.')
+    holdings_parser.add_argument('--collections', type=int, default=13)
+    holdings_parser.add_argument('--addresses', type=int, default=300_000)
+    holdings_parser.set_defaults(func=bench_holdings)
+
+    clean_parser = subparsers.add_parser('clean', help='Vectorized clean_csv_file versus the row-dict version.')
+    clean_parser.add_argument('--rows', type=int, default=1_000_000)
+    clean_parser.add_argument('--addresses', type=int, default=300_000)
+    clean_parser.add_argument('--duplicates', type=float, default=0.1, help='Share of rows repeating an earlier row.')
+    clean_parser.set_defaults(func=bench_clean)
+
+    pipeline_parser = subparsers.add_parser('pipeline', help='Offline pipeline runs with content-hash stage skipping.')
+    pipeline_parser.add_argument('--rows', type=int, default=200_000, help='Rows per staging and collection file.')
+    pipeline_parser.add_argument('--addresses', type=int, default=100_000)
+    pipeline_parser.add_argument('--jobs', type=int, default=4)
+    pipeline_parser.set_defaults(func=bench_pipeline)
+
+    import_parser = subparsers.add_parser('import-time', help='Cold import time and import side effects of every module.')
+    import_parser.add_argument('modules', nargs='*', help='Modules to check (default: every module in --repo).')
+    import_parser.add_argument('--repo', default=REPO_DIR, help='Folder holding the modules.')
+    import_parser.add_argument('--repeat', type=int, default=3, help='Cold imports per module; the fastest counts.')
+    import_parser.add_argument('--budget-ms', type=float, default=150.0, help='Import time allowed per module.')
+    import_parser.set_defaults(func=bench_import)
+
+    columns_parser = subparsers.add_parser('columns', help='Streaming data_utils column ops versus chained calls.')
+    columns_parser.add_argument('--rows', type=int, default=1_000_000)
+    columns_parser.add_argument('--addresses', type=int, default=200_000)
+    columns_parser.add_argument('--chunksize', type=int, default=100_000)
+    columns_parser.set_defaults(func=bench_columns)
+
+    merge_state_parser = subparsers.add_parser('merge-state',
+                                               help='SRC20 holder merge state: typed arrays versus nested dicts.')
+    merge_state_parser.add_argument('--ticks', type=int, default=7)
+    merge_state_parser.add_argument('--rows', type=int, default=200_000, help='Rows per staging file.')
+    merge_state_parser.add_argument('--addresses', type=int, default=100_000, help='Distinct holder addresses.')
+    merge_state_parser.set_defaults(func=bench_merge_state)
+
+    allocate_parser = subparsers.add_parser('allocate', help='Vectorized allocation engine versus the row loop.')
+    allocate_parser.add_argument('--addresses', type=int, default=1_000_000)
+    allocate_parser.set_defaults(func=bench_allocate)
+
+    suite_parser = subparsers.add_parser('suite', help='Every pipeline stage on 1x/10x/100x copies of the real inputs.')
+    suite_parser.add_argument('--scales', type=int, nargs='+', default=[1, 10], help='Row multipliers to run.')
+    suite_parser.add_argument('--staging-rows', type=int, default=5000, help='Rows per generated staging file at 1x.')
+    suite_parser.add_argument('--snapshot-addresses', type=int, default=500, help='Snapshot sample at 1x.')
+    suite_parser.add_argument('--network-rows', type=int, default=1000, help='Stub holders and tick events at 1x.')
+    suite_parser.add_argument('--latency', type=float, default=0.005, help='Stub latency per request in seconds.')
+    suite_parser.add_argument('--rate', type=float, default=1000.0, help='Request rate cap of the network stages.')
+    suite_parser.add_argument('--no-network', action='store_true', help='Only run the offline stages.')
+    suite_parser.add_argument('--baseline', default=None,
+                              help='Baseline results to compare against (default: data/logs/bench_baseline-<host>-<cpus>cpu.json).')
+    suite_parser.add_argument('--save-baseline', action='store_true', help='Store this run as the baseline.')
+    suite_parser.add_argument('--tolerance', type=float, default=0.25,
+                              help='Allowed throughput drop and memory growth before a stage counts as regressed.')
+    suite_parser.add_argument('--min-seconds', type=float, default=0.25,
+                              help='Stages shorter than this are not judged on throughput.')
+    suite_parser.add_argument('--output', default=None, help='Also write this run\'s results to a JSON file.')
+    suite_parser.add_argument('--keep', default=None, help='Generate the datasets under this folder and keep them.')
+    suite_parser.set_defaults(func=bench_suite)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+import argparse
+import logging
+import os
+from urllib.parse import quote
+
+import airdrop_config
+import http_cache
+import run_metrics
+import snapshot_engine
+
+
+def add_network_options(parser, concurrency, batch_size=None, batch_help=None, rate=None):
+    # Parallelism, rate and cache knobs shared by every command that talks to the APIs;
+    # --batch-size only where the command has a batch to size
+    group = parser.add_argument_group('network options')
+    group.add_argument('--concurrency', type=int, default=concurrency, help=f'Requests in flight (default: {concurrency}).')
+    group.add_argument('--rate', type=float, default=rate,
+                       help=f'Requests per second cap (default: {rate if rate else "unlimited"}).')
+    if batch_size is not None:
+        group.add_argument('--batch-size', type=int, default=batch_size, help=f'{batch_help} (default: {batch_size}).')
+    group.add_argument('--cache-path', default=None, help=f'HTTP response cache (default: {http_cache.DEFAULT_CACHE_PATH}).')
+    group.add_argument('--cache-only', action='store_true', help='Serve responses from the HTTP cache only (offline).')
+    group.add_argument('--no-cache', action='store_true', help='Bypass the HTTP response cache.')
+
+
+def configure_cache(args):
+    # Explicit cache options replace the shared cache; otherwise the HTTP_CACHE_* environment defaults apply
+    if args.cache_path or args.cache_only or args.no_cache:
+        http_cache.configure(enabled=not args.no_cache, path=args.cache_path or http_cache.DEFAULT_CACHE_PATH,
+                             cache_only=args.cache_only)
+
+
+def fetch_collections(args, metrics):
+    from collection_scraper import load_collections, scrape_collections
+
+    configure_cache(args)
+    stats = scrape_collections(load_collections(args.collections), output_dir=args.output_dir,
+                               max_workers=args.concurrency, store_dir=args.store, rate=args.rate)
+    metrics.set(rows=sum(collection['holders'] for collection in stats.values()),
+                stamps=sum(collection['stamps'] for collection in stats.values()),
+                failed=sum(collection['failed'] for collection in stats.values()))
+    metrics.add_output(*(os.path.join(args.output_dir, f'col-{name}_holders.csv') for name in stats))
+
+
+def fetch_holders(args, metrics):
+    from api_src20_holders_v2 import export_holders
+
+    configure_cache(args)
+    os.makedirs(args.output_dir, exist_ok=True)
+    rows = 0
+    failed = []
+    for tick in dict.fromkeys(args.ticks or airdrop_config.SRC20_WHITELIST):
+        logging.info(f'Fetching holder data for SRC20 TOKEN {tick}...')
+        count = export_holders(tick, output_dir=args.output_dir, max_workers=args.concurrency, store_dir=args.store,
+                               page_size=args.batch_size, rate=args.rate)
+        if count is None:
+            failed.append(tick)
+            continue
+        rows += count
+        metrics.add_output(os.path.join(args.output_dir, f'staging-{tick}_holders.csv'))
+    metrics.set(rows=rows, failed=failed)
+
+
+def fetch_events(args, metrics):
+    from api_src20_actions import TICK_URL, download_pages, stream_data_to_file
+
+    configure_cache(args)
+    rows = 0
+    for tick in dict.fromkeys(args.ticks or airdrop_config.SRC20_WHITELIST):
+        pages = download_pages(TICK_URL.format(tick=quote(tick, safe=''), limit=args.batch_size), 'data',
+                               max_workers=args.concurrency, rate=args.rate)
+        rows += stream_data_to_file(pages, f'fetchSRC20_{tick}', ndjson=args.ndjson)
+    metrics.set(rows=rows)
+
+
+def snapshot(args, metrics):
+    import balance_snapshot
+
+    configure_cache(args)
+    wallet_addresses = balance_snapshot.process_wallet_addresses(args.addresses)
+    ticks = args.ticks or airdrop_config.SRC20_WHITELIST
+    engine_options = dict(url_template=args.url_template, concurrency=args.concurrency,
+                          max_concurrency=max(args.max_concurrency, args.concurrency),
+                          rate=args.rate)
+    if args.baseline:
+        events = (balance_snapshot.load_tick_activity(args.activity) if args.activity
+                  else balance_snapshot.fetch_tick_activity(ticks, rate=args.rate))
+        changelog_path = args.changelog or f'{os.path.splitext(args.output)[0]}.changes.csv'
+        rows = balance_snapshot.take_incremental_snapshot(wallet_addresses, args.baseline, events,
+                                                          output_file_path=args.output, changelog_path=changelog_path,
+                                                          tick_whitelist=ticks, **engine_options)
+        metrics.add_output(changelog_path)
+    else:
+        rows = balance_snapshot.take_snapshot(wallet_addresses, checkpoint_interval=args.batch_size,
+                                              output_file_path=args.output, journal_path=args.journal,
+                                              run_id=args.run_id, tick_whitelist=ticks, **engine_options)
+    metrics.set(rows=len(rows), addresses=len(wallet_addresses))
+    metrics.add_output(args.output)
+
+
+def merge_wallets(args, metrics):
+    import data_merge_wallets
+
+    index = None
+    if args.index:
+        from address_index import AddressIndex
+        index = AddressIndex(args.index)
+    include_ids = None
+    if args.include_ids:
+        import numpy as np
+        include_ids = np.load(args.include_ids)
+    if args.store:
+        rows = data_merge_wallets.merge_store_addresses(args.store, args.output, index=index, include_ids=include_ids)
+    else:
+        rows = data_merge_wallets.merge_wallet_files(args.folder, args.output, workers=args.workers, index=index,
+                                                     include_ids=include_ids)
+    metrics.set(rows=rows)
+    metrics.add_output(args.output)
+
+
+def merge_src20(args, metrics):
+    import data_src20_holders
+
+    index = None
+    if args.index:
+        from address_index import AddressIndex
+        index = AddressIndex(args.index)
+    if args.store:
+        merge = data_src20_holders.load_from_store(args.store, index)
+    else:
+        merge = data_src20_holders.load_from_staging(args.pattern, index)
+    merge.write_csv(args.output)
+    if index is not None:
+        import numpy as np
+        from address_index import ids_file_path
+        np.save(ids_file_path(args.output), merge.global_ids())
+        index.save()
+    metrics.set(rows=len(merge.addresses), ticks=len(merge.ticks))
+    metrics.add_output(args.output)
+
+
+def merge_collections(args, metrics):
+    from collection_holdings import collection_files, holdings_matrix
+
+    with open(args.invalid_log, 'w') as invalid_log:
+        matrix = holdings_matrix(collection_files(args.folder), invalid_log)
+    matrix.to_csv(args.output, index=False)
+    metrics.set(rows=len(matrix), collections=len(matrix.columns) - 3)
+    metrics.add_output(args.output)
+
+
+def merge_clean(args, metrics):
+    from data_utils_fack import clean_csv_file
+
+    report = clean_csv_file(args.file_path, report_path=args.report, rule=args.eligibility)
+    metrics.set(rows=report['rows'], written=report['written'], duplicates=report['duplicates'],
+                ineligible=report['ineligible'], verdict_changes=report['verdict_changes'])
+    metrics.add_output(args.file_path)
+
+
+def allocate(args, metrics):
+    import allocation_engine
+
+    output = args.output or args.input.replace('.csv', '_allocations.csv')
+    metrics.set(rows=allocation_engine.allocate(args.input, output, args.rules, store_dir=args.store))
+    metrics.add_output(output)
+
+
+def report(args):
+    reports = run_metrics.load_reports(args.files or [os.path.join(run_metrics.DEFAULT_METRICS_DIR, '*.json')])
+    if args.last:
+        reports = reports[-args.last:]
+    if not reports:
+        print("No metrics files found.")
+        return
+    run_metrics.print_reports(reports, details=args.details)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='bosdrop', description='BOS DAO airdrop: fetch, snapshot, merge, allocate.')
+    parser.add_argument('--metrics', default=None,
+                        help=f'Metrics JSON file of this run (default: {run_metrics.DEFAULT_METRICS_DIR}/<command>-<time>.json).')
+    parser.add_argument('--sample-interval', type=float, default=None,
+                        help='Seconds between live metrics samples, logged and appended to <metrics>.samples.ndjson.')
+    parser.add_argument('--log-level', default='INFO', help='Logging level.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    fetch_parser = commands.add_parser('fetch', help='Download collection holders, SRC-20 holders or SRC-20 events.')
+    fetch_targets = fetch_parser.add_subparsers(dest='target', required=True)
+    collections_parser = fetch_targets.add_parser('collections', help='Stamp holders of every collection file.')
+    collections_parser.add_argument('--collections', default='./data/collections/json/collection_*.json',
+                                    help='Glob of stampchain collection JSON files.')
+    collections_parser.add_argument('--output-dir', default='./data/collections', help='Folder for the col-*_holders.csv files.')
+    collections_parser.add_argument('--store', default=None, help='Also write the holders to this columnar holder store.')
+    add_network_options(collections_parser, 8)
+    collections_parser.set_defaults(func=fetch_collections)
+    holders_parser = fetch_targets.add_parser('holders', help='SRC-20 holders per tick (holdersByTick).')
+    holders_parser.add_argument('ticks', nargs='*', help='SRC20 ticks (default: the airdrop whitelist).')
+    holders_parser.add_argument('--output-dir', default='./data/src20_holders', help='Folder for the staging CSV files.')
+    holders_parser.add_argument('--store', default=None, help='Also append the holders to this columnar holder store.')
+    add_network_options(holders_parser, 4, 500, 'Holders per page request')
+    holders_parser.set_defaults(func=fetch_holders)
+    events_parser = fetch_targets.add_parser('events', help='SRC-20 tick events to fetchSRC20_* dumps.')
+    events_parser.add_argument('ticks', nargs='*', help='SRC20 ticks (default: the airdrop whitelist).')
+    events_parser.add_argument('--ndjson', action='store_true', help='Write JSON Lines (.ndjson) instead of one JSON array.')
+    add_network_options(events_parser, 4, 5000, 'Events per page request')
+    events_parser.set_defaults(func=fetch_events)
+
+    snapshot_parser = commands.add_parser('snapshot', help='SRC-20 balance snapshot of every wallet address.')
+    snapshot_parser.add_argument('--addresses', default='./combined_btc_addresses.txt', help='File with one wallet address per line.')
+    snapshot_parser.add_argument('--output', default='balances_snapshot_src20-v3.csv', help='Snapshot CSV file.')
+    snapshot_parser.add_argument('--ticks', nargs='+', default=None, help='Ticks to keep (default: the airdrop whitelist).')
+    snapshot_parser.add_argument('--max-concurrency', type=int, default=32, help='Upper bound for adaptive concurrency.')
+    snapshot_parser.add_argument('--url-template', default=snapshot_engine.BALANCE_URL,
+                                 help='Balance URL with an {address} placeholder.')
+    snapshot_parser.add_argument('--journal', default=None, help='SQLite progress journal; makes the run resumable.')
+    snapshot_parser.add_argument('--run-id', default=None, help='Journal run id. Defaults to a hash of the address list.')
+    snapshot_parser.add_argument('--baseline', default=None,
+                                 help='SQLite snapshot baseline; refetches only addresses with SRC-20 activity since their last fetch.')
+    snapshot_parser.add_argument('--activity', default=None,
+                                 help='Glob of fetchSRC20_* event dumps for --baseline. Defaults to fetching the tick feed.')
+    snapshot_parser.add_argument('--changelog', default=None, help='Change-log CSV for --baseline runs.')
+    add_network_options(snapshot_parser, 8, 500, 'Snapshot rows per CSV write', rate=snapshot_engine.DEFAULT_RATE)
+    snapshot_parser.set_defaults(func=snapshot)
+
+    merge_parser = commands.add_parser('merge', help='Merge holder files into the airdrop inputs.')
+    merge_targets = merge_parser.add_subparsers(dest='target', required=True)
+    wallets_parser = merge_targets.add_parser('wallets', help='Unique valid addresses of all col-*/src-* files.')
+    wallets_parser.add_argument('--folder', default='./data/collections/', help='Folder with the col-*/src-* files.')
+    wallets_parser.add_argument('--output', default='./data/collections/col-MERGED.txt', help='Merged address file.')
+    wallets_parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count).')
+    wallets_parser.add_argument('--index', default=None, help='Also write the addresses as IDs of this address index.')
+    wallets_parser.add_argument('--include-ids', default=None,
+                                help='Also merge the addresses of this .ids.npy array, e.g. all_holders.merged.ids.npy.')
+    wallets_parser.add_argument('--store', default=None, help='Read the columnar holder store instead of the CSV files.')
+    wallets_parser.set_defaults(func=merge_wallets)
+    src20_parser = merge_targets.add_parser('src20', help='SRC20 staging files into all_holders.merged.csv.')
+    src20_parser.add_argument('--pattern', default='./data/src20_holders/staging-*.csv', help='Glob of staging files.')
+    src20_parser.add_argument('--output', default='./data/src20_holders/all_holders.merged.csv', help='Merged holder CSV.')
+    src20_parser.add_argument('--store', default=None, help='Read the columnar holder store instead of the staging files.')
+    src20_parser.add_argument('--index', default=None, help='Intern addresses through this address index.')
+    src20_parser.set_defaults(func=merge_src20)
+    matrix_parser = merge_targets.add_parser('collections', help='Address x collection holdings matrix.')
+    matrix_parser.add_argument('--folder', default='./data/collections/', help='Folder with the col-*_holders.csv files.')
+    matrix_parser.add_argument('--output', default='./data/final/collections.csv', help='Output CSV.')
+    matrix_parser.add_argument('--invalid-log', default='./data/logs/collections.invalid.log', help='Invalid address log.')
+    matrix_parser.set_defaults(func=merge_collections)
+    clean_parser = merge_targets.add_parser('clean', help='Dedup and mark eligibility in the merged holder file.')
+    clean_parser.add_argument('file_path', nargs='?', default='./data/src20_holders/all_holders.merged.csv')
+    clean_parser.add_argument('--report', default='./data/logs/src20_holders.clean_report.json', help='JSON report file.')
+    clean_parser.add_argument('--eligibility', choices=['legacy', 'p2wsh'], default='legacy',
+                              help="'legacy': every bc1 address is ineligible; 'p2wsh': only P2WSH and invalid addresses.")
+    clean_parser.set_defaults(func=merge_clean)
+
+    allocate_parser = commands.add_parser('allocate', help='Airdrop allocations from the merged holdings.')
+    allocate_parser.add_argument('--input', default='./data/src20_holders/all_holders.merged.csv', help='Merged holdings CSV.')
+    allocate_parser.add_argument('--rules', default=airdrop_config.ALLOCATION_RULES_PATH, help='Allocation rule file.')
+    allocate_parser.add_argument('--output', default=None, help='Allocation CSV (default: <input>_allocations.csv).')
+    allocate_parser.add_argument('--store', default=None, help='Read SRC20 holdings from the columnar holder store instead.')
+    allocate_parser.set_defaults(func=allocate)
+
+    report_parser = commands.add_parser('report', help='Summarize the metrics files of earlier runs.')
+    report_parser.add_argument('files', nargs='*', help='Metrics files or globs (default: every file in the metrics folder).')
+    report_parser.add_argument('--last', type=int, default=None, help='Only the latest N runs.')
+    report_parser.add_argument('--details', action='store_true',
+                               help='Per-endpoint latency percentiles and the time spent per phase.')
+    report_parser.set_defaults(func=None)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, 'include_ids', None) and not args.index:
+        parser.error('merge wallets --include-ids needs --index')
+    logging.basicConfig(level=args.log_level.upper(), format='%(asctime)s [%(levelname)s] %(message)s')
+    if args.command == 'report':
+        report(args)
+        return
+
+    command = ' '.join(part for part in (args.command, getattr(args, 'target', None)) if part)
+    options = {name: value for name, value in vars(args).items() if name not in ('func', 'metrics')}
+    metrics_path = args.metrics or run_metrics.default_metrics_path(command)
+    with run_metrics.RunMetrics(command, metrics_path, options, sample_interval=args.sample_interval) as metrics:
+        try:
+            args.func(args, metrics)
+        finally:
+            metrics.set(cache=http_cache.cache_stats())
+    logging.info(f'Metrics written to {metrics_path}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import functools
+import hashlib
+import operator
+
+# Mainnet address types accepted for the airdrop
+P2PKH = 'p2pkh'
+P2SH = 'p2sh'
+P2WPKH = 'p2wpkh'
+P2WSH = 'p2wsh'
+P2TR = 'p2tr'
+ADDRESS_TYPES = (P2PKH, P2SH, P2WPKH, P2WSH, P2TR)
+
+BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+BASE58_VERSIONS = {0x00: P2PKH, 0x05: P2SH}
+
+BECH32_CHARSET = 'qpzry9x8gf2tvdw0s3jn54khce6mua7l'
+BECH32_HRP = 'bc'
+BECH32_CONST = 1
+BECH32M_CONST = 0x2bc830a3
+
+# Verdicts kept in memory before the cache is reset
+CACHE_SIZE = 4_000_000
+
+_BASE58_VALUES = {char: value for value, char in enumerate(BASE58_ALPHABET)}
+_BECH32_VALUES = {char: value for value, char in enumerate(BECH32_CHARSET)}
+_BECH32_GENERATOR = (0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3)
+# XOR of the generator terms selected by each possible top 5 bits of the checksum state,
+# so the polymod loop does one table lookup per character instead of five bit tests
+_BECH32_TABLE = tuple(
+    functools.reduce(operator.xor, (generator for bit, generator in enumerate(_BECH32_GENERATOR) if top >> bit & 1), 0)
+    for top in range(32)
+)
+_cache = {}
+
+
+def _polymod(values, state=1):
+    table = _BECH32_TABLE
+    for value in values:
+        state = ((state & 0x1ffffff) << 5) ^ value ^ table[state >> 25]
+    return state
+
+
+# Polymod state after the expanded 'bc' human-readable part, shared by every mainnet address
+_BECH32_HRP_STATE = _polymod([ord(char) >> 5 for char in BECH32_HRP] + [0] + [ord(char) & 31 for char in BECH32_HRP])
+
+
+def _convert_bits(data, from_bits, to_bits, pad):
+    accumulator = 0
+    bits = 0
+    result = []
+    max_value = (1 << to_bits) - 1
+    for value in data:
+        accumulator = (accumulator << from_bits) | value
+        bits += from_bits
+        while bits >= to_bits:
+            bits -= to_bits
+            result.append((accumulator >> bits) & max_value)
+    if pad:
+        if bits:
+            result.append((accumulator << (to_bits - bits)) & max_value)
+    elif bits >= from_bits or (accumulator << (to_bits - bits)) & max_value:
+        return None
+    return result
+
+
+def _classify_base58(address):
+    if not 26 <= len(address) <= 35:
+        return None
+    number = 0
+    values = _BASE58_VALUES
+    try:
+        for char in address:
+            number = number * 58 + values[char]
+    except KeyError:
+        return None
+    if number >> 200:
+        return None
+    raw = number.to_bytes(25, 'big')
+    # Each leading '1' encodes one leading zero byte
+    leading_ones = len(address) - len(address.lstrip('1'))
+    if leading_ones != len(raw) - len(raw.lstrip(b'\0')):
+        return None
+    if hashlib.sha256(hashlib.sha256(raw[:21]).digest()).digest()[:4] != raw[21:]:
+        return None
+    return BASE58_VERSIONS.get(raw[0])
+
+
+def _classify_bech32(address):
+    if not 14 <= len(address) <= 74:
+        return None
+    lowered = address.lower()
+    if address != lowered and address != address.upper():
+        return None
+    values = _BECH32_VALUES
+    try:
+        data = [values[char] for char in lowered[3:]]
+    except KeyError:
+        return None
+    if len(data) < 7:
+        return None
+    constant = _polymod(data, _BECH32_HRP_STATE)
+    version = data[0]
+    if version == 0:
+        if constant != BECH32_CONST:
+            return None
+    elif constant != BECH32M_CONST or version > 16:
+        return None
+    # The witness program is only needed for its length: 5-bit groups regrouped into bytes, with
+    # fewer than 5 padding bits that are all zero (what _convert_bits(..., pad=False) accepts)
+    program_bits = (len(data) - 7) * 5
+    padding = program_bits % 8
+    if padding >= 5 or data[-7] & ((1 << padding) - 1):
+        return None
+    program_length = program_bits // 8
+    if version == 0:
+        return {20: P2WPKH, 32: P2WSH}.get(program_length)
+    if version == 1 and program_length == 32:
+        return P2TR
+    # Future witness versions are well-formed but not an address type the airdrop pays
+    return None
+
+
+def _classify(address):
+    if not isinstance(address, str):
+        return None
+    if address[:3].lower() == 'bc1':
+        return _classify_bech32(address)
+    if address[:1] in ('1', '3'):
+        return _classify_base58(address)
+    return None
+
+
+def classify(address):
+    """
+    Validates a mainnet Bitcoin address with its Base58Check or Bech32/Bech32m checksum.
+
+    Parameters:
+    - address: Address string, without surrounding whitespace.
+
+    Returns:
+    One of ADDRESS_TYPES, or None when the address is invalid.
+    """
+    verdict = _cache.get(address, False)
+    if verdict is False:
+        verdict = _classify(address)
+        if len(_cache) >= CACHE_SIZE:
+            _cache.clear()
+        _cache[address] = verdict
+    return verdict
+
+
+def is_valid(address):
+    return classify(address) is not None
+
+
+def classify_many(addresses):
+    """
+    Classifies a batch of addresses, checking each distinct address only once.
+
+    Returns:
+    A list with one ADDRESS_TYPES entry or None per input address.
+    """
+    cache = _cache
+    verdicts = []
+    append = verdicts.append
+    for address in addresses:
+        verdict = cache.get(address, False)
+        if verdict is False:
+            verdict = classify(address)
+        append(verdict)
+    return verdicts
+
+
+def filter_valid(addresses, types=None):
+    """
+    Returns the valid addresses of a batch, in input order.
+
+    Parameters:
+    - addresses: Iterable of address strings.
+    - types: Optional collection of ADDRESS_TYPES to keep; all valid types by default.
+    """
+    return [address for address, verdict in zip(addresses, classify_many(addresses))
+            if verdict is not None and (types is None or verdict in types)]
+
+
+def clear_cache():
+    _cache.clear()
+
+
+def encode_base58check(version, payload):
+    """
+    Encodes a version byte and payload as a Base58Check address.
+    """
+    raw = bytes([version]) + payload
+    raw += hashlib.sha256(hashlib.sha256(raw).digest()).digest()[:4]
+    number = int.from_bytes(raw, 'big')
+    chars = []
+    while number:
+        number, remainder = divmod(number, 58)
+        chars.append(BASE58_ALPHABET[remainder])
+    leading_zeros = len(raw) - len(raw.lstrip(b'\0'))
+    return '1' * leading_zeros + ''.join(reversed(chars))
+
+
+def encode_segwit(version, program, hrp=BECH32_HRP):
+    """
+    Encodes a witness program as a Bech32 (version 0) or Bech32m (version 1+) address.
+    """
+    data = [version] + _convert_bits(program, 8, 5, True)
+    state = _polymod([ord(char) >> 5 for char in hrp] + [0] + [ord(char) & 31 for char in hrp])
+    constant = BECH32_CONST if version == 0 else BECH32M_CONST
+    checksum = _polymod(data + [0] * 6, state) ^ constant
+    data += [(checksum >> 5 * (5 - i)) & 31 for i in range(6)]
+    return hrp + '1' + ''.join(BECH32_CHARSET[value] for value in data)
@@ -1,41 +1,23 @@
-import csv
+import argparse
 
-def calculate_airdrop_allocations(file_path):
-    # Define the assets and their corresponding allocation amounts
-    assets = ['STAMP', 'KEVIN', 'UTXO', 'STMAP', 'VIVA', 'SATO']
-    asset_allocation = 3000  # Allocation amount per asset
-    bonus_asset = 'SPAD'
-    bonus_allocation = 9000  # Bonus allocation for holding SPAD
-    
-    # Prepare the output data structure
-    allocations = []
+import allocation_engine
 
-    with open(file_path, 'r', newline='') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            address = row['address']
-            # Initialize the allocation amount for the address
-            allocation_amount = 0
-            # Check for each asset and add to the allocation amount if present
-            for asset in assets:
-                if asset in row and float(row[asset]) > 0:
-                    allocation_amount += asset_allocation
-            # Check for the bonus asset
-            if bonus_asset in row and float(row[bonus_asset]) > 0:
-                allocation_amount += bonus_allocation
-            # Store the allocation amount for the address
-            allocations.append({'address': address, 'allocation': allocation_amount})
-    
-    # Write the allocation amounts to a new CSV file
+def calculate_airdrop_allocations(file_path, rules_path=allocation_engine.DEFAULT_RULES_PATH, store_dir=None):
+    # Asset lists and allocation amounts live in the rule file; the engine evaluates them on the whole
+    # holdings matrix at once instead of row by row
     output_file_path = file_path.replace('.csv', '_allocations.csv')
-    with open(output_file_path, 'w', newline='') as csvfile:
-        fieldnames = ['address', 'allocation']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(allocations)
-    
+    allocation_engine.allocate(file_path, output_file_path, rules_path, store_dir=store_dir)
+
     print(f"Allocation amounts written to {output_file_path}")
 
-# Path to the specific CSV file
-file_path = './data/src20_holders/all_holders.merged.csv'
-calculate_airdrop_allocations(file_path)
\ No newline at end of file
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Calculate airdrop allocations for the merged SRC20 holders.')
+    parser.add_argument('file_path', nargs='?', default='./data/src20_holders/all_holders.merged.csv')
+    parser.add_argument('--rules', default=allocation_engine.DEFAULT_RULES_PATH, help='Allocation rule file.')
+    parser.add_argument('--store', default=None, help='Read SRC20 holdings from the columnar holder store instead.')
+    args = parser.parse_args(argv)
+
+    calculate_airdrop_allocations(args.file_path, args.rules, store_dir=args.store)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import argparse
+import csv
+import os
+from glob import glob
+
+import numpy as np
+
+import btc_address
+
+COUNT_PREFIX = 'count_'
+TOTAL_COLUMN = 'count__total'
+UNIQUE_COLUMN = 'count_unique'
+
+
+def collection_name(file_path):
+    # col-bos_nft_holders.csv -> bos_nft
+    name = os.path.basename(file_path)
+    return name[len('col-'):-len('_holders.csv')]
+
+
+def collection_files(folder_path='./data/collections/'):
+    # col-*_holders.csv sources in a stable order
+    return sorted(glob(os.path.join(folder_path, 'col-*_holders.csv')))
+
+
+def read_holders(file_path):
+    # Stripped address column of one collection holder file, one row per stamp held
+    import pandas as pd
+    return pd.read_csv(file_path, usecols=[0], dtype=str, keep_default_na=False).iloc[:, 0].str.strip().to_numpy()
+
+
+def count_unique(counts):
+    # Collections each address holds at least one stamp of
+    return (counts > 0).sum(axis=1)
+
+
+def holdings_matrix(file_paths, invalid_log=None):
+    """
+    Builds the address x collection count matrix of a set of collection holder files.
+
+    All holder rows are factorized to address codes in one pass, each distinct address is
+    checksum-validated once, and the cells are counted with a single bincount over
+    (address, collection) codes, so the work stays vectorized at millions of rows.
+    Invalid addresses are printed, logged to invalid_log if given, and dropped.
+
+    Parameters:
+    - file_paths: col-*_holders.csv files; the column of each is count_<collection>.
+    - invalid_log: Optional open file receiving the addresses that fail validation.
+
+    Returns:
+    A DataFrame with address, the count_* columns sorted by name, count__total and
+    count_unique, in first-seen address order over file_paths.
+    """
+    import pandas as pd
+
+    names = [collection_name(file_path) for file_path in file_paths]
+    holders = [read_holders(file_path) for file_path in file_paths]
+    collection_ids = np.repeat(np.arange(len(names)), [len(addresses) for addresses in holders])
+    address_codes, addresses = pd.factorize(np.concatenate(holders) if holders else np.empty(0, dtype=object))
+    del holders
+
+    valid = np.array([verdict is not None for verdict in btc_address.classify_many(addresses.tolist())], dtype=bool)
+    if not valid.all():
+        for address in addresses[~valid]:
+            print(f"Invalid address: {address}")
+            if invalid_log is not None:
+                invalid_log.write(f"{address}\n")
+        # Renumber the valid addresses, keeping their first-seen order
+        keep = valid[address_codes]
+        address_codes = (np.cumsum(valid) - 1)[address_codes[keep]]
+        collection_ids = collection_ids[keep]
+        addresses = addresses[valid]
+
+    counts = np.bincount(address_codes * len(names) + collection_ids,
+                         minlength=len(addresses) * len(names)).reshape(len(addresses), len(names))
+
+    order = sorted(range(len(names)), key=lambda index: names[index])
+    counts = counts[:, order]
+    matrix = pd.DataFrame(counts, columns=[COUNT_PREFIX + names[index] for index in order])
+    matrix.insert(0, 'address', addresses)
+    matrix[TOTAL_COLUMN] = counts.sum(axis=1)
+    matrix[UNIQUE_COLUMN] = count_unique(counts)
+    return matrix
+
+
+def write_collection_counts(file_path, output_file_path, invalid_log=None):
+    # Holdings of a single collection as [address, count] rows in first-seen order
+    matrix = holdings_matrix([file_path], invalid_log)
+    with open(output_file_path, 'w', newline='') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(['address', 'count'])
+        writer.writerows(zip(matrix['address'], matrix[COUNT_PREFIX + collection_name(file_path)].tolist()))
+    return len(matrix)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the address x collection holdings matrix.')
+    parser.add_argument('--folder', default='./data/collections/', help='Folder with the col-*_holders.csv files.')
+    parser.add_argument('--output', default='./data/final/collections.csv', help='Output CSV.')
+    args = parser.parse_args(argv)
+
+    with open('./data/logs/collections.invalid.log', 'w') as invalid_log:
+        matrix = holdings_matrix(collection_files(args.folder), invalid_log)
+    matrix.to_csv(args.output, index=False)
+    print(f"Saved {len(matrix)} addresses x {len(matrix.columns) - 3} collections to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
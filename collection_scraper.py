@@ -0,0 +1,173 @@
+import argparse
+import csv
+import glob
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+import run_metrics
+from paginator import RateLimiter, fetch_json
+
+STAMP_URL = 'https://stampchain.io/api/v2/stamps/{stamp_id}'
+
+
+def load_collections(pattern='./data/collections/json/collection_*.json'):
+    """
+    Reads collection definitions from stampchain collection JSON files.
+
+    Parameters:
+    - pattern: Glob matching the collection files.
+
+    Returns:
+    A dict of collection name -> list of stamp IDs, in file order.
+    """
+    collections = {}
+    for file_path in sorted(glob.glob(pattern)):
+        with open(file_path) as file:
+            collection = json.load(file)
+        name = collection.get('collection_id') or os.path.basename(file_path)[len('collection_'):-len('.json')]
+        collections[name] = collection['stamp_ids']
+    return collections
+
+
+def percentile(values, q):
+    # Nearest-rank percentile of an already sorted list
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, round(q / 100 * len(values)) - 1))
+    return values[index]
+
+
+def scrape_collections(collections, output_dir='./data/collections', max_workers=8, url_template=STAMP_URL,
+                       store_dir=None, rate=None):
+    """
+    Fetches the holders of every stamp in every collection concurrently through one pooled
+    session and writes col-<collection>_holders.csv per collection, one row per holder entry.
+
+    Each output file is opened once with a large write buffer and written only from the
+    calling thread. Holders are written in the collection's stamp order, as the sequential
+    scraper did: a response is held back until every earlier stamp has completed, and each
+    completed prefix is flushed as soon as it is whole, so identical data gives identical files.
+
+    Parameters:
+    - collections: Dict of collection name -> list of stamp IDs.
+    - output_dir: Directory for the col-*_holders.csv files.
+    - max_workers: Stamps fetched in parallel across all collections.
+    - url_template: Stamp URL with a {stamp_id} placeholder.
+    - store_dir: Optional columnar holder store to write each collection's partition to as well.
+    - rate: Optional cap on requests per second across all workers.
+
+    Returns:
+    A dict of collection name -> stats (stamps, failed, holders, elapsed, latencies).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    limiter = RateLimiter(rate) if rate else None
+
+    def fetch_holders(stamp_id):
+        start = time.perf_counter()
+        data = fetch_json(url_template.format(stamp_id=stamp_id), session, limiter=limiter)
+        return data['data']['holders'], time.perf_counter() - start
+
+    files = {}
+    writers = {}
+    stats = {}
+    store_addresses = {name: [] for name in collections}
+    # Per collection, holders of stamps that completed ahead of an earlier one (None for failed
+    # stamps), keyed by position in the stamp list, and the next position to write
+    held = {name: {} for name in collections}
+    next_position = {name: 0 for name in collections}
+    started = time.perf_counter()
+
+    def flush(name):
+        pending = held[name]
+        while next_position[name] in pending:
+            addresses = pending.pop(next_position[name])
+            next_position[name] += 1
+            if not addresses:
+                continue
+            with run_metrics.timed('disk'):
+                writers[name].writerows([address] for address in addresses)
+            if store_dir is not None:
+                store_addresses[name].extend(addresses)
+
+    try:
+        for name in collections:
+            files[name] = open(os.path.join(output_dir, f'col-{name}_holders.csv'), 'w', newline='',
+                               buffering=1024 * 1024)
+            writers[name] = csv.writer(files[name])
+            writers[name].writerow(['address'])
+            stats[name] = {'stamps': 0, 'failed': 0, 'holders': 0, 'elapsed': 0.0, 'latencies': []}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(fetch_holders, stamp_id): (name, position, stamp_id)
+                       for name, stamp_ids in collections.items() for position, stamp_id in enumerate(stamp_ids)}
+            for future in as_completed(futures):
+                name, position, stamp_id = futures[future]
+                collection_stats = stats[name]
+                try:
+                    holders, latency = future.result()
+                except (requests.exceptions.RequestException, KeyError, TypeError) as err:
+                    logging.error(f'Something went wrong for STAMP NFT ID {stamp_id} in collection {name}: {err}')
+                    collection_stats['failed'] += 1
+                    held[name][position] = None
+                    flush(name)
+                    continue
+                collection_stats['stamps'] += 1
+                collection_stats['latencies'].append(latency)
+                collection_stats['elapsed'] = time.perf_counter() - started
+                if not holders:
+                    logging.warning(f'No holder data found for STAMP NFT ID {stamp_id}')
+                addresses = [holder['address'] for holder in holders]
+                held[name][position] = addresses
+                flush(name)
+                collection_stats['holders'] += len(addresses)
+    finally:
+        for file in files.values():
+            file.close()
+        session.close()
+
+    if store_dir is not None:
+        import holder_store
+        for name, addresses in store_addresses.items():
+            with holder_store.HolderStoreWriter('collection', name, store_dir) as writer:
+                writer.write(addresses)
+
+    log_scrape_report(stats)
+    return stats
+
+
+def log_scrape_report(stats):
+    for name, collection_stats in stats.items():
+        latencies = sorted(collection_stats['latencies'])
+        elapsed = collection_stats['elapsed'] or 1e-9
+        logging.info(
+            f"{name}: {collection_stats['stamps']} stamps ({collection_stats['failed']} failed), "
+            f"{collection_stats['holders']} holders, {collection_stats['stamps'] / elapsed:.1f} stamps/s, "
+            f"latency p50={percentile(latencies, 50) * 1000:.0f}ms p95={percentile(latencies, 95) * 1000:.0f}ms "
+            f"p99={percentile(latencies, 99) * 1000:.0f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Scrape stamp holders for every collection into col-*_holders.csv.')
+    parser.add_argument('--collections', default='./data/collections/json/collection_*.json',
+                        help='Glob of stampchain collection JSON files.')
+    parser.add_argument('--output-dir', default='./data/collections', help='Directory for the holder CSV files.')
+    parser.add_argument('--workers', type=int, default=8, help='Stamps fetched in parallel.')
+    parser.add_argument('--store', default=None, help='Also write the holders to this columnar holder store.')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    scrape_collections(load_collections(args.collections), output_dir=args.output_dir, max_workers=args.workers,
+                       store_dir=args.store)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,211 @@
+import argparse
+import heapq
 import os
 import csv
-import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import btc_address
+from json_stream import batched
+
+# Shard files per worker process in the parallel merge
+SHARDS_PER_WORKER = 4
+# Merged addresses resolved against the address index per lookup
+INDEX_BATCH_SIZE = 100_000
+
+def holder_files(folder_path):
+    # col-* and src-* holder files, in a stable order
+    return [os.path.join(folder_path, file_name) for file_name in sorted(os.listdir(folder_path))
+            if file_name.startswith("col-") or file_name.startswith("src-")]
+
+def write_address_shard(file_paths, shard_path):
+    """
+    Writes the sorted, deduplicated valid addresses of a batch of holder files to a shard file.
+
+    Parameters:
+    - file_paths: col-*/src-* CSV files; every cell is checked.
+    - shard_path: Output shard, one address per line.
+
+    Returns:
+    The number of addresses in the shard.
+    """
+    addresses = set()
+    for file_path in file_paths:
+        with open(file_path, 'r') as csvfile:
+            reader = csv.reader(csvfile)
+            for row in reader:
+                # Checksum-validated, with verdicts cached across the files this process handles
+                addresses.update(btc_address.filter_valid(row))
+    with open(shard_path, 'w') as shard:
+        shard.writelines(address + '\n' for address in sorted(addresses))
+    return len(addresses)
+
+def merge_shards(shard_paths):
+    """
+    k-way merges sorted shard files, yielding each address once in sorted order.
+    """
+    shards = [open(shard_path, 'r') for shard_path in shard_paths]
+    try:
+        previous = None
+        for line in heapq.merge(*shards):
+            address = line.rstrip('\n')
+            if address != previous:
+                yield address
+                previous = address
+    finally:
+        for shard in shards:
+            shard.close()
+
+def write_address_file(addresses, output_file_path, index=None):
+    """
+    Writes addresses one per line through a temporary file that atomically replaces the output.
+
+    Parameters:
+    - addresses: Iterable of addresses.
+    - output_file_path: Merged address file.
+    - index: Optional address_index.AddressIndex; the addresses' IDs are then also written as
+      an ID array next to the output (see address_index.ids_file_path).
+
+    Returns:
+    The number of addresses written.
+    """
+    written = 0
+    id_chunks = []
+    output_dir, output_name = os.path.split(output_file_path)
+    temp_path = os.path.join(output_dir, f'.{output_name}.tmp')
+    with open(temp_path, 'w') as output_file:
+        for batch in batched(addresses, INDEX_BATCH_SIZE):
+            output_file.writelines(address + '\n' for address in batch)
+            written += len(batch)
+            if index is not None:
+                id_chunks.append(index.add(batch))
+    os.replace(temp_path, output_file_path)
+    if index is not None:
+        from address_index import ids_file_path
+        np.save(ids_file_path(output_file_path), np.concatenate(id_chunks) if id_chunks else np.empty(0, dtype=np.int64))
+        index.save()
+    return written
+
+def union_with_ids(addresses, index, ids):
+    """
+    Joins a sorted address stream with the addresses behind an ID array, e.g. the
+    all_holders.merged.ids.npy the SRC20 merge writes.
+
+    The stream is resolved to IDs once and the union is taken on integer IDs; only the
+    result is turned back into addresses, in sorted order.
+
+    Returns:
+    The sorted addresses of the union, as a list.
+    """
+    from address_index import MISSING
+
+    stream_ids = [index.add(batch) for batch in batched(addresses, INDEX_BATCH_SIZE)]
+    ids = np.asarray(ids, dtype=np.int64)
+    union = np.union1d(np.concatenate(stream_ids) if stream_ids else np.empty(0, dtype=np.int64), ids[ids != MISSING])
+    keys = np.asarray(index.keys)[union]
+    return np.sort(keys).astype(np.str_).tolist()
+
+def merge_wallet_files(folder_path, output_file_path, workers=None, index=None, include_ids=None):
+    """
+    Merges the unique valid BTC addresses of every col-*/src-* file in a folder into one file.
+
+    Files are split into batches across a process pool; each worker writes a sorted,
+    deduplicated shard per batch and the shards are k-way merged, so the output is sorted and
+    identical between runs.
+
+    Parameters:
+    - folder_path: Folder with the col-*/src-* holder files.
+    - output_file_path: Merged address file, one address per line.
+    - workers: Worker processes; defaults to the CPU count. 1 scans the files in-process.
+    - index: Optional address_index.AddressIndex; the merged addresses' IDs are then also
+      written as an ID array next to the output (see address_index.ids_file_path).
+    - include_ids: Optional ID array of index addresses to merge in as well (requires index).
+
+    Returns:
+    The number of addresses written.
+    """
+    if include_ids is not None and index is None:
+        raise ValueError('include_ids needs the address index the IDs belong to')
+    file_paths = holder_files(folder_path)
+    workers = workers or os.cpu_count() or 1
+    # A few batches per worker balances uneven file sizes while keeping the merge fan-in small
+    batch_count = min(len(file_paths), workers * SHARDS_PER_WORKER)
+    batches = [file_paths[index::batch_count] for index in range(batch_count)]
+    with tempfile.TemporaryDirectory() as shard_dir:
+        shard_paths = [os.path.join(shard_dir, f'shard-{index:04d}.txt') for index in range(batch_count)]
+        if workers == 1:
+            for batch, shard_path in zip(batches, shard_paths):
+                write_address_shard(batch, shard_path)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # Consume the results so worker errors are raised here
+                list(executor.map(write_address_shard, batches, shard_paths))
+        # Every shard is complete before the output (which may itself be a col-* file) is replaced
+        addresses = merge_shards(shard_paths)
+        if include_ids is not None:
+            addresses = union_with_ids(addresses, index, include_ids)
+        return write_address_file(addresses, output_file_path, index)
 
 def extract_valid_btc_addresses(folder_path):
     btc_addresses = set()
 
-    for file_name in os.listdir(folder_path):
-        if file_name.startswith("col-") or file_name.startswith("src-"):
-            file_path = os.path.join(folder_path, file_name)
-            with open(file_path, 'r') as csvfile:
-                reader = csv.reader(csvfile)
-                for row in reader:
-                    for address in row:
-                        if re.match(r'^(bc1|[13])[a-zA-HJ-NP-Z0-9]{25,39}$', address):
-                            btc_addresses.add(address)
+    for file_path in holder_files(folder_path):
+        with open(file_path, 'r') as csvfile:
+            reader = csv.reader(csvfile)
+            for row in reader:
+                btc_addresses.update(btc_address.filter_valid(row))
+
+    return sorted(btc_addresses)
+
+def extract_valid_btc_addresses_from_store(store_dir):
+    # Read only the memory-mapped address column and validate each distinct address once
+    import pyarrow.compute as pc
+    import holder_store
+
+    # Same sources as the CSV scan: col-* and src-* files, not the staging-* balances
+    table = holder_store.read_holders(store_dir, kind=['collection', 'src20_addresses'], columns=['address'])
+    addresses = pc.unique(table.column('address'))
+    return sorted(btc_address.filter_valid(addresses.to_pylist()))
+
+def merge_store_addresses(store_dir, output_file_path, index=None, include_ids=None):
+    # The store counterpart of merge_wallet_files, with the same atomic output and ID handling
+    if include_ids is not None and index is None:
+        raise ValueError('include_ids needs the address index the IDs belong to')
+    addresses = extract_valid_btc_addresses_from_store(store_dir)
+    if include_ids is not None:
+        addresses = union_with_ids(addresses, index, include_ids)
+    return write_address_file(addresses, output_file_path, index)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Merge the unique BTC addresses of all col-*/src-* holder files.')
+    parser.add_argument('--store', default=None, help='Read the columnar holder store instead of the CSV files.')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for the CSV merge (default: CPU count).')
+    parser.add_argument('--index', default=None, help='Also write the merged addresses as IDs of this address index.')
+    parser.add_argument('--include-ids', default=None,
+                        help='Also merge the addresses of this .ids.npy array, e.g. all_holders.merged.ids.npy (needs --index).')
+    parser.add_argument('--folder', default='./collections/', help='Folder to scan for col-*/src-* holder files.')
+    parser.add_argument('--output', default=None, help='Merged address file (default: <folder>/col-MERGED.txt).')
+    args = parser.parse_args(argv)
 
-    return list(btc_addresses)
+    # Folder path to scan for CSV files
+    folder_path = args.folder
+    output_file_path = args.output or os.path.join(folder_path, 'col-MERGED.txt')
 
-# Folder path to scan for CSV files
-folder_path = './collections/'
+    if args.include_ids and not args.index:
+        parser.error('--include-ids needs --index')
+    index = None
+    if args.index:
+        from address_index import AddressIndex
+        index = AddressIndex(args.index)
+    include_ids = np.load(args.include_ids) if args.include_ids else None
 
-# Extract valid BTC addresses from CSV files in the specified folder
-btc_addresses = extract_valid_btc_addresses(folder_path)
+    # Extract valid BTC addresses from the holder store, or merge the CSV files in the specified folder
+    if args.store:
+        merge_store_addresses(args.store, output_file_path, index=index, include_ids=include_ids)
+    else:
+        merge_wallet_files(folder_path, output_file_path, workers=args.workers, index=index, include_ids=include_ids)
 
-# Write the unique BTC addresses to a new file
-with open('./collections/col-MERGED.txt', 'w') as output_file:
-    for address in btc_addresses:
-        output_file.write(address + '\n')
\ No newline at end of file
+if __name__ == "__main__":
+    main()
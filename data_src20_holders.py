@@ -1,74 +1,227 @@
 import csv
-import re
 import os
-from collections import defaultdict
 from glob import glob
 import argparse
 
-# Parse command-line arguments
-parser = argparse.ArgumentParser(description='Process SRC20 holder addresses.')
-parser.add_argument('--dry-run', action='store_true', help='Run the script in dry-run mode to process only a sample of the data.')
-args = parser.parse_args()
-
-# Create a nested defaultdict to store data about each address
-# Now also storing balance along with low_block and high_block
-address_data = defaultdict(lambda: defaultdict(lambda: {'balance': 0, 'low_block': float('inf'), 'high_block': 0}))
-
-# Directory containing the CSV files
-data_dir = './data/src20_holders/'
-
-# Pattern to match files starting with "staging-"
-file_pattern = os.path.join(data_dir, 'staging-*.csv')
-
-# Set to collect all unique collection names
-all_src20s = set()
-
-# Open a file to log invalid addresses
-with open('./data/logs/src20_holders.invalid.log', 'w') as invalid_log:
-    # Iterate over all files that match the pattern
-    for filename in glob(file_pattern):
-        # Extract collection name from filename
-        src20_name = os.path.basename(filename).split('_holders.csv')[0][8:]
-        all_src20s.add(src20_name)  # Add collection name to the set
-        with open(filename, 'r') as infile:
-            reader = csv.DictReader(infile)
+import numpy as np
+
+import btc_address
+
+# Rows parsed per chunk before the arrays are updated
+CHUNK_SIZE = 100_000
+
+class HolderMerge:
+    """
+    Compact per-address state for merging SRC20 holder files.
+
+    Addresses are interned to integer IDs in first-seen order, and balance, low_block and
+    high_block live in preallocated typed arrays indexed by address ID x tick ID instead of
+    nested dicts per address.
+
+    Parameters:
+    - ticks: SRC20 names, in the order their files are read.
+    - capacity: Initial number of address slots; the arrays double when full.
+    - index: Optional address_index.AddressIndex. Addresses are then resolved through the
+      shared index with vectorized lookups, and global_ids() gives the index IDs of the rows.
+    """
+
+    def __init__(self, ticks, capacity=1 << 16, index=None):
+        self.ticks = list(ticks)
+        self.tick_ids = {tick: tick_id for tick_id, tick in enumerate(self.ticks)}
+        self.address_ids = {}
+        self.addresses = []
+        self.index = index
+        # Index ID -> row, and row -> index ID, when interning through a shared index
+        self.rows_by_global_id = np.full(0, -1, dtype=np.int64)
+        self.global_id_chunks = []
+        shape = (capacity, len(self.ticks))
+        self.balance = np.zeros(shape, dtype=np.float64)
+        self.low_block = np.full(shape, np.iinfo(np.int64).max, dtype=np.int64)
+        self.high_block = np.zeros(shape, dtype=np.int64)
+        self.present = np.zeros(shape, dtype=bool)
+
+    def grow(self, needed):
+        capacity = self.balance.shape[0]
+        while capacity < needed:
+            capacity *= 2
+        for name, fill in (('balance', 0), ('low_block', np.iinfo(np.int64).max), ('high_block', 0), ('present', False)):
+            old = getattr(self, name)
+            new = np.full((capacity, len(self.ticks)), fill, dtype=old.dtype)
+            new[:old.shape[0]] = old
+            setattr(self, name, new)
+
+    def intern(self, addresses):
+        if self.index is not None:
+            return self.intern_indexed(addresses)
+        address_ids = self.address_ids
+        ids = np.empty(len(addresses), dtype=np.int64)
+        for position, address in enumerate(addresses):
+            address_id = address_ids.get(address)
+            if address_id is None:
+                address_id = address_ids[address] = len(self.addresses)
+                self.addresses.append(address)
+            ids[position] = address_id
+        if len(self.addresses) > self.balance.shape[0]:
+            self.grow(len(self.addresses))
+        return ids
+
+    def intern_indexed(self, addresses):
+        # Rows still follow first-seen order, so the output matches the dict-interned merge
+        global_ids = self.index.add(addresses)
+        if len(self.index) > len(self.rows_by_global_id):
+            grown = np.full(max(len(self.index), 2 * len(self.rows_by_global_id)), -1, dtype=np.int64)
+            grown[:len(self.rows_by_global_id)] = self.rows_by_global_id
+            self.rows_by_global_id = grown
+        new = self.rows_by_global_id[global_ids] < 0
+        if new.any():
+            new_ids, first = np.unique(global_ids[new], return_index=True)
+            first_seen = np.argsort(first, kind='stable')
+            new_ids = new_ids[first_seen]
+            self.rows_by_global_id[new_ids] = np.arange(len(self.addresses), len(self.addresses) + len(new_ids))
+            self.global_id_chunks.append(new_ids)
+            positions = np.flatnonzero(new)[first[first_seen]]
+            self.addresses.extend(addresses[position] for position in positions.tolist())
+            if len(self.addresses) > self.balance.shape[0]:
+                self.grow(len(self.addresses))
+        return self.rows_by_global_id[global_ids]
+
+    def global_ids(self):
+        # Address index IDs of the merged rows, in row order
+        return np.concatenate(self.global_id_chunks) if self.global_id_chunks else np.empty(0, dtype=np.int64)
+
+    def add(self, tick, addresses, balances, low_blocks, high_blocks=None):
+        # ufunc.at applies repeated indices in input order, so sums match a row-by-row loop exactly
+        tick_id = self.tick_ids[tick]
+        ids = self.intern(addresses)
+        np.add.at(self.balance[:, tick_id], ids, np.asarray(balances, dtype=np.float64))
+        np.minimum.at(self.low_block[:, tick_id], ids, np.asarray(low_blocks, dtype=np.int64))
+        np.maximum.at(self.high_block[:, tick_id], ids,
+                      np.asarray(low_blocks if high_blocks is None else high_blocks, dtype=np.int64))
+        self.present[ids, tick_id] = True
+
+    def add_file(self, tick, filename, invalid_log=None):
+        # Stream one staging file in chunks of parsed columns, skipping addresses that fail their checksum
+        with open(filename, 'r', newline='') as infile:
+            reader = csv.reader(infile)
+            header = next(reader)
+            address_col, balance_col, block_col = (header.index(name) for name in ('address', 'balance', 'blockHeight'))
+            addresses, balances, block_heights = [], [], []
             for row in reader:
-                address = row['address'].strip()
-                balance = float(row['balance'])  # Assuming balance is a numeric value
-                block_height = int(row['blockHeight'])
-                # if not re.match(r'^(bc1|[13])[a-zA-HJ-NP-Z0-9]{25,39}$', address):
-                #     print(f"Invalid address format in file {filename}: {address}")
-                #     invalid_log.write(f"{filename}: {address}\n")
-                #     continue
-                # Update balance, low_block, and high_block for each address
-                address_data[address][src20_name]['balance'] += balance
-                address_data[address][src20_name]['low_block'] = min(address_data[address][src20_name]['low_block'], block_height)
-                address_data[address][src20_name]['high_block'] = max(address_data[address][src20_name]['high_block'], block_height)
-
-if args.dry_run:
-    # Print results to the terminal in dry-run mode
-    for address, data in address_data.items():
-        print(f"Address: {address}")
-        for token, details in data.items():
-            print(f"  {token}: {details}")
-else:
-    # Write the output CSV file
-    with open('./data/src20_holders/all_holders.merged.csv', 'w', newline='') as outfile:
-        # Ensure all collection names are included in fieldnames
-        fieldnames = ['address'] + sorted(all_src20s) + ['lowest_blockHeight', 'highest_blockHeight']
-        writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for address, data in address_data.items():
-            row = {'address': address}
-            # Initialize lowest and highest blockHeight across all tokens for the address
-            lowest_block = float('inf')
-            highest_block = 0
-            for name, details in data.items():
-                if name != '_total':
-                    row[name] = details['balance']  # Insert balance instead of count
-                    lowest_block = min(lowest_block, details['low_block'])
-                    highest_block = max(highest_block, details['high_block'])
-            # Update row with lowest and highest blockHeight if they were updated
-            row['lowest_blockHeight'] = lowest_block if lowest_block != float('inf') else 0
-            row['highest_blockHeight'] = highest_block
-            writer.writerow(row)
\ No newline at end of file
+                address = row[address_col].strip()
+                if not btc_address.is_valid(address):
+                    print(f"Invalid address in file {filename}: {address}")
+                    if invalid_log is not None:
+                        invalid_log.write(f"{filename}: {address}\n")
+                    continue
+                addresses.append(address)
+                balances.append(float(row[balance_col]))
+                block_heights.append(int(row[block_col]))
+                if len(addresses) >= CHUNK_SIZE:
+                    self.add(tick, addresses, balances, block_heights)
+                    addresses, balances, block_heights = [], [], []
+            if addresses:
+                self.add(tick, addresses, balances, block_heights)
+
+    def details(self, address_id):
+        # Per-tick state of one address, in tick order, as {tick: {'balance', 'low_block', 'high_block'}}
+        return {
+            tick: {'balance': self.balance[address_id, tick_id].item(),
+                   'low_block': self.low_block[address_id, tick_id].item(),
+                   'high_block': self.high_block[address_id, tick_id].item()}
+            for tick_id, tick in enumerate(self.ticks) if self.present[address_id, tick_id]
+        }
+
+    def write_csv(self, output_file_path):
+        int_max = np.iinfo(np.int64).max
+        tick_order = sorted(range(len(self.ticks)), key=lambda tick_id: self.ticks[tick_id])
+        with open(output_file_path, 'w', newline='') as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(['address'] + [self.ticks[tick_id] for tick_id in tick_order] + ['lowest_blockHeight', 'highest_blockHeight'])
+            # Rows are converted to Python values one block at a time to keep the output side bounded
+            for start in range(0, len(self.addresses), CHUNK_SIZE):
+                stop = min(start + CHUNK_SIZE, len(self.addresses))
+                present = self.present[start:stop]
+                # Lowest and highest block across the ticks each address actually holds
+                lowest = np.where(present, self.low_block[start:stop], int_max).min(axis=1, initial=int_max)
+                lowest = np.where(present.any(axis=1), lowest, 0)
+                highest = np.where(present, self.high_block[start:stop], 0).max(axis=1, initial=0)
+                balances = self.balance[start:stop][:, tick_order].tolist()
+                held = present[:, tick_order].tolist()
+                writer.writerows(
+                    [address] + [balance if is_held else '' for balance, is_held in zip(row_balances, row_held)] + [low, high]
+                    for address, row_balances, row_held, low, high in zip(
+                        self.addresses[start:stop], balances, held, lowest.tolist(), highest.tolist()))
+
+def load_from_store(store_dir, index=None):
+    # Per (address, tick) sums and block ranges come from a vectorized group-by over the memory-mapped store
+    import holder_store
+
+    holdings = holder_store.src20_holdings(store_dir)
+    ticks = holdings.column('source').to_pylist()
+    merge = HolderMerge(dict.fromkeys(ticks), index=index)
+    by_tick = {}
+    for address, tick, balance, low_block, high_block in zip(
+            holdings.column('address').to_pylist(), ticks, holdings.column('balance_sum').to_pylist(),
+            holdings.column('block_height_min').to_pylist(), holdings.column('block_height_max').to_pylist()):
+        if not btc_address.is_valid(address):
+            print(f"Invalid address in store source {tick}: {address}")
+            continue
+        columns = by_tick.setdefault(tick, ([], [], [], []))
+        for values, value in zip(columns, (address, balance, low_block, high_block)):
+            values.append(value)
+    for tick, (addresses, balances, low_blocks, high_blocks) in by_tick.items():
+        merge.add(tick, addresses, balances, low_blocks, high_blocks)
+    return merge
+
+def load_from_staging(file_pattern, index=None):
+    filenames = glob(file_pattern)
+    # Extract collection names from filenames
+    ticks = [os.path.basename(filename).split('_holders.csv')[0][8:] for filename in filenames]
+    merge = HolderMerge(ticks, index=index)
+    # Open a file to log invalid addresses
+    with open('./data/logs/src20_holders.invalid.log', 'w') as invalid_log:
+        for tick, filename in zip(ticks, filenames):
+            merge.add_file(tick, filename, invalid_log)
+    return merge
+
+def main(argv=None):
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description='Process SRC20 holder addresses.')
+    parser.add_argument('--dry-run', action='store_true', help='Run the script in dry-run mode to process only a sample of the data.')
+    parser.add_argument('--store', default=None, help='Read SRC20 holders from the columnar holder store instead of staging-*.csv files.')
+    parser.add_argument('--index', default=None, help='Intern addresses through this address index and write the row IDs next to the output.')
+    args = parser.parse_args(argv)
+
+    # Directory containing the CSV files
+    data_dir = './data/src20_holders/'
+
+    # Pattern to match files starting with "staging-"
+    file_pattern = os.path.join(data_dir, 'staging-*.csv')
+
+    index = None
+    if args.index:
+        from address_index import AddressIndex
+        index = AddressIndex(args.index)
+
+    if args.store:
+        merge = load_from_store(args.store, index)
+    else:
+        merge = load_from_staging(file_pattern, index)
+
+    if args.dry_run:
+        # Print results to the terminal in dry-run mode
+        for address_id, address in enumerate(merge.addresses):
+            print(f"Address: {address}")
+            for token, details in merge.details(address_id).items():
+                print(f"  {token}: {details}")
+    else:
+        # Write the output CSV file
+        output_file_path = './data/src20_holders/all_holders.merged.csv'
+        merge.write_csv(output_file_path)
+        if index is not None:
+            from address_index import ids_file_path
+            np.save(ids_file_path(output_file_path), merge.global_ids())
+            index.save()
+
+if __name__ == "__main__":
+    main()
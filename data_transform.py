@@ -1,57 +1,71 @@
-import pandas as pd
-import json
+import argparse
 import time
 
+from json_stream import json_records_to_csv, json_records_to_parquet
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
 # Function to convert JSON data to a CSV file
 def json_to_csv(json_file, csv_file, chunksize=None, verbose=True):
     """
-    Convert JSON data to a CSV file using pandas.
+    Convert a JSON array or JSON Lines file to a CSV (or Parquet) file out of core.
+
+    The input format is detected from the file, records are streamed one chunk at a time
+    and every chunk is written straight to the output, so memory does not grow with the
+    file size.
 
     Parameters
     ----------
     json_file : str
-        Path to the JSON file.
+        Path to the JSON array or JSON Lines (NDJSON) file.
     csv_file : str
-        Path to the CSV file.
+        Path to the output file. A name ending in .parquet writes Parquet instead of CSV.
     chunksize : int, optional
-        Number of rows to read at a time. If None, the entire JSON file will be loaded into memory.
+        Number of rows to convert at a time. Defaults to 10000.
     verbose : bool, optional
-        Whether to print progress messages.
+        Whether to print the rows/s and peak memory report.
 
     Returns
     -------
-    None
+    dict
+        rows, seconds, rows_per_second and peak_rss_mib (None where unavailable).
 
     """
-    # Read the JSON data
-    if chunksize is None:
-        # If chunksize is None, read the entire JSON file into memory
-        with open(json_file) as f:
-            data = json.load(f)
-        df = pd.DataFrame(data)
+    start_time = time.perf_counter()
+    batch_size = chunksize or 10_000
+    if csv_file.endswith('.parquet'):
+        rows = json_records_to_parquet([json_file], csv_file, batch_size=batch_size)
     else:
-        # If chunksize is not None, read the JSON file in chunks
-        df_list = []
-        with open(json_file) as f:
-            for i, chunk in enumerate(pd.read_json(f, lines=True, chunksize=chunksize)):
-                df_list.append(chunk)
-                if verbose:
-                    print(f"Read chunk {i+1} of {chunksize}...")
-        df = pd.concat(df_list)
-
-    # Write the DataFrame to a CSV file
-    df.to_csv(csv_file, index=False)
+        rows = json_records_to_csv([json_file], csv_file, batch_size=batch_size)
+    elapsed = time.perf_counter() - start_time
+    # ru_maxrss is the process peak in KiB on Linux
+    peak_rss_mib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else None
+    report = {'rows': rows, 'seconds': elapsed, 'rows_per_second': rows / elapsed if elapsed else 0.0,
+              'peak_rss_mib': peak_rss_mib}
     if verbose:
-        print(f"Saved {len(df)} rows to {csv_file}")
-
-# Example usage
-json_file = 'fetchSRC20_BOS_4P.json'
-csv_file = 'fetchSRC20_BOS_4P.csv'
-chunksize = 10000
-verbose = True
-
-start_time = time.time()
-json_to_csv(json_file, csv_file, chunksize=chunksize, verbose=verbose)
-elapsed_time = time.time() - start_time
-if verbose:
-    print(f"Elapsed time: {elapsed_time:.2f} seconds")
\ No newline at end of file
+        peak = f"{peak_rss_mib:.0f} MiB" if peak_rss_mib is not None else "n/a"
+        print(f"Saved {rows} rows to {csv_file} in {elapsed:.2f}s "
+              f"({report['rows_per_second']:.0f} rows/s, peak memory {peak})")
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert a JSON array or NDJSON dump to CSV or Parquet.')
+    parser.add_argument('json_file', nargs='?', default='fetchSRC20_BOS_4P.json')
+    parser.add_argument('csv_file', nargs='?', default='fetchSRC20_BOS_4P.csv',
+                        help='Output file; a .parquet name writes Parquet.')
+    parser.add_argument('--chunksize', type=int, default=10000, help='Rows converted at a time.')
+    parser.add_argument('--quiet', action='store_true', help='Skip the timing report.')
+    args = parser.parse_args(argv)
+    verbose = not args.quiet
+
+    start_time = time.time()
+    json_to_csv(args.json_file, args.csv_file, chunksize=args.chunksize, verbose=verbose)
+    elapsed_time = time.time() - start_time
+    if verbose:
+        print(f"Elapsed time: {elapsed_time:.2f} seconds")
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,37 @@
-import pandas as pd
-import json
+import argparse
 import time
 import glob
 
-def jsons_to_csv(identifier, csv_file, verbose=True):
+from json_stream import json_records_to_csv
+
+def jsons_to_csv(identifier, csv_file, verbose=True, batch_size=10_000):
     # Use glob to find all files that match the identifier pattern
     json_files = glob.glob(f"{identifier}*.json")
-    
-    # Initialize an empty list to store dataframes
-    dfs = []
-    
-    # Loop through each file in the list
-    for json_file in json_files:
-        with open(json_file) as f:
-            data = json.load(f)
-            # Remove the 'stamp_base64' field from each item in data if it exists
-            for item in data:
-                item.pop('stamp_base64', None)
-            # Convert each file's data into a DataFrame and append to the list
-            dfs.append(pd.DataFrame(data))
 
-    # Concatenate all DataFrames in the list if not empty
-    if dfs:
-        df = pd.concat(dfs, ignore_index=True)
-        df.to_csv(csv_file, index=False, escapechar="\\")
+    # Stream every file's records into the CSV in batches; 'stamp_base64' blobs are dropped while parsing
+    rows = json_records_to_csv(json_files, csv_file, drop_fields=('stamp_base64',), batch_size=batch_size) if json_files else 0
+    if rows:
         if verbose:
-            print(f"Saved {len(df)} rows to {csv_file}")
+            print(f"Saved {rows} rows to {csv_file}")
     else:
         if verbose:
             print("No data to save.")
 
 
-# Example usage
-identifier = 'fetchAllStamps'  # This will match any file that starts with 'fetchSRC20_' in the current directory
-csv_file = 'allStampsData_2a.csv'
-verbose = True
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Merge every <identifier>*.json dump into one CSV.')
+    # This will match any file that starts with the identifier in the current directory
+    parser.add_argument('identifier', nargs='?', default='fetchAllStamps')
+    parser.add_argument('csv_file', nargs='?', default='allStampsData_2a.csv')
+    parser.add_argument('--quiet', action='store_true', help='Skip the timing report.')
+    args = parser.parse_args(argv)
+    verbose = not args.quiet
+
+    start_time = time.time()
+    jsons_to_csv(args.identifier, args.csv_file, verbose=verbose)
+    elapsed_time = time.time() - start_time
+    if verbose:
+        print(f"Elapsed time: {elapsed_time:.2f} seconds")
 
-start_time = time.time()
-jsons_to_csv(identifier, csv_file, verbose=verbose)
-elapsed_time = time.time() - start_time
-if verbose:
-    print(f"Elapsed time: {elapsed_time:.2f} seconds")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
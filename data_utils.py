@@ -1,5 +1,86 @@
-import pandas as pd
+import argparse
 import csv
+import os
+
+from collection_holdings import count_unique
+
+def drop_columns(columns):
+    # Column op: remove the listed columns (missing ones are ignored)
+    return {'op': 'drop', 'columns': list(columns)}
+
+def strip_time(column, separator='T'):
+    # Column op: keep only the part before the first separator, e.g. the date of an ISO timestamp
+    return {'op': 'strip_time', 'column': column, 'separator': separator}
+
+def to_int(column):
+    # Column op: parse the column as numbers and truncate them to int
+    return {'op': 'to_int', 'column': column}
+
+def apply_column_ops(df, ops):
+    """
+    Applies column ops to one DataFrame chunk with vectorized pandas string and number kernels.
+
+    Parameters:
+    - df: Chunk read with every column as a string.
+    - ops: List of ops built by drop_columns, strip_time and to_int.
+
+    Returns:
+    The transformed chunk.
+    """
+    import pandas as pd
+
+    for op in ops:
+        kind = op['op']
+        if kind == 'drop':
+            df = df.drop(columns=op['columns'], errors='ignore')
+        elif kind == 'strip_time':
+            df[op['column']] = df[op['column']].str.split(op['separator'], n=1).str[0]
+        elif kind == 'to_int':
+            df[op['column']] = pd.to_numeric(df[op['column']]).astype('int64')
+        else:
+            raise ValueError(f"Unknown column op: {kind}")
+    return df
+
+def transform_csv(csv_file, ops, output_csv_file=None, chunksize=100_000):
+    """
+    Runs a list of column ops over a CSV file in one streaming pass and writes the result once.
+
+    The file is read in chunks with every column kept as text, so columns the ops do not
+    touch are written back exactly as they were read.
+
+    Parameters:
+    - csv_file: Path to the input CSV file.
+    - ops: List of ops built by drop_columns, strip_time and to_int, applied in order.
+    - output_csv_file: Path to the output CSV file. If None, overwrites the input file.
+    - chunksize: Rows per chunk.
+
+    Returns:
+    The number of rows written.
+    """
+    import pandas as pd
+
+    # Determine the output file path
+    if output_csv_file is None:
+        output_csv_file = csv_file
+    temp_csv_file = f"{output_csv_file}.tmp"
+
+    rows = 0
+    header = True
+    try:
+        with open(temp_csv_file, 'w', newline='') as output:
+            for chunk in pd.read_csv(csv_file, dtype=str, keep_default_na=False, chunksize=chunksize):
+                chunk = apply_column_ops(chunk, ops)
+                chunk.to_csv(output, index=False, header=header)
+                header = False
+                rows += len(chunk)
+    except BaseException:
+        # A bad value mid-file (an empty cell under to_int), a full disk or Ctrl-C leaves no partial file
+        if os.path.exists(temp_csv_file):
+            os.remove(temp_csv_file)
+        raise
+    # Replace only after the whole input was read, so transforming a file in place is safe
+    os.replace(temp_csv_file, output_csv_file)
+    return rows
 
 def remove_columns_from_csv(csv_file, columns_to_remove, output_csv_file=None):
     """
@@ -13,19 +94,8 @@ def remove_columns_from_csv(csv_file, columns_to_remove, output_csv_file=None):
     Returns:
     None
     """
-    # Load the dataset
-    df = pd.read_csv(csv_file)
-    
-    # Remove the specified columns
-    df.drop(columns=columns_to_remove, errors='ignore', inplace=True)
-    
-    # Determine the output file path
-    if output_csv_file is None:
-        output_csv_file = csv_file
-    
-    # Save the modified DataFrame back to a CSV file
-    df.to_csv(output_csv_file, index=False)
-    print(f"File saved successfully to {output_csv_file} with specified columns removed.")
+    transform_csv(csv_file, [drop_columns(columns_to_remove)], output_csv_file)
+    print(f"File saved successfully to {output_csv_file or csv_file} with specified columns removed.")
 
 
 def remove_hourly_data_from_column(csv_file, column_name, output_csv_file=None):
@@ -40,19 +110,8 @@ def remove_hourly_data_from_column(csv_file, column_name, output_csv_file=None):
     Returns:
     None
     """
-    # Load the dataset
-    df = pd.read_csv(csv_file)
-    
-    # Modify the specified column to remove hourly data
-    df[column_name] = df[column_name].apply(lambda x: x.split('T')[0])
-    
-    # Determine the output file path
-    if output_csv_file is None:
-        output_csv_file = csv_file
-    
-    # Save the modified DataFrame back to a CSV file
-    df.to_csv(output_csv_file, index=False)
-    print(f"File saved successfully to {output_csv_file} with hourly data removed from {column_name}.")
+    transform_csv(csv_file, [strip_time(column_name)], output_csv_file)
+    print(f"File saved successfully to {output_csv_file or csv_file} with hourly data removed from {column_name}.")
 
 def convert_amount_to_int(csv_file, column_name='Amount', output_csv_file=None):
     """
@@ -66,19 +125,8 @@ def convert_amount_to_int(csv_file, column_name='Amount', output_csv_file=None):
     Returns:
     None
     """
-    # Load the dataset
-    df = pd.read_csv(csv_file)
-    
-    # Convert the specified column to int
-    df[column_name] = df[column_name].astype(int)
-    
-    # Determine the output file path
-    if output_csv_file is None:
-        output_csv_file = csv_file
-    
-    # Save the modified DataFrame back to a CSV file
-    df.to_csv(output_csv_file, index=False)
-    print(f"File saved successfully to {output_csv_file} with {column_name} converted to int.")
+    transform_csv(csv_file, [to_int(column_name)], output_csv_file)
+    print(f"File saved successfully to {output_csv_file or csv_file} with {column_name} converted to int.")
 
 # Example usage (uncomment the following lines to test)
 # csv_file = 'merged_SRC20_data.csv'
@@ -93,25 +141,20 @@ def add_count_unique_column(input_file_path, output_file_path):
     - input_file_path: Path to the existing CSV file.
     - output_file_path: Path to the new (or the same) CSV file with the added 'count_unique' column.
     """
+    import pandas as pd
 
-    # Read the existing data
-    with open(input_file_path, mode='r', newline='') as file:
-        reader = csv.DictReader(file)
-        data = list(reader)
-        # Assuming the first column is 'address' and the last is 'count__total'
-        fieldnames = reader.fieldnames + ['count_unique']  # Add 'count_unique' to the list of fieldnames
+    # Read every column as text so the existing values are written back unchanged
+    data = pd.read_csv(input_file_path, dtype=str, keep_default_na=False)
 
-    # Calculate count_unique for each row
-    for row in data:
-        # Count how many collections each address is in, excluding 'address' and 'count__total' columns
-        unique_collections = sum(1 for key, value in row.items() if key.startswith('count_') and key != 'count__total' and int(value) > 0)
-        row['count_unique'] = unique_collections
+    # Count how many collections each address is in, excluding 'address' and 'count__total' columns
+    count_columns = [column for column in data.columns if column.startswith('count_') and column != 'count__total']
+    data['count_unique'] = count_unique(data[count_columns].astype(int).to_numpy())
 
     # Write the updated data to a new CSV file
     with open(output_file_path, mode='w', newline='') as file:
-        writer = csv.DictWriter(file, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(data)
+        writer = csv.writer(file)
+        writer.writerow(data.columns)
+        writer.writerows(data.itertuples(index=False, name=None))
 
 
 #input_file_path = './data/collections/col-all_nft_holders.collection_count.csv'
@@ -148,11 +191,20 @@ def count_unique_addresses(csv_file_path, column_name='destination'):
         print(f"Column '{column_name}' does not exist in the CSV file.")
         return None
 
-csv_file_path = './data/merged_SRC20_data_prepped.csv'
-column_name = 'destination'  # Adjust the column name as needed
-count_unique_addresses(csv_file_path, column_name)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Count the unique addresses in a column of a CSV file.')
+    parser.add_argument('csv_file', nargs='?', default='./data/merged_SRC20_data_prepped.csv')
+    parser.add_argument('--column', default='destination', help='Address column name.')
+    args = parser.parse_args(argv)
+
+    count_unique_addresses(args.csv_file, args.column)
+
+    #csv_file = 'final_balances_snapshot_src20.csv'
+    # column_name = 'Block Time'
+    # remove_hourly_data_from_column(csv_file, column_name)
+    #convert_amount_to_int(csv_file)
+    # or both in one pass:
+    # transform_csv(csv_file, [strip_time('Block Time'), to_int('Amount')])
 
-#csv_file = 'final_balances_snapshot_src20.csv'
-# column_name = 'Block Time'
-# remove_hourly_data_from_column(csv_file, column_name)
-#convert_amount_to_int(csv_file)
+if __name__ == "__main__":
+    main()
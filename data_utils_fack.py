@@ -1,49 +1,151 @@
+import argparse
 import csv
+import json
+import os
 import re
+import time
 
-def is_p2wsh_address(address):
-    # P2WSH addresses start with bc1 and can be up to 90 characters long.
-    pattern = r'^bc1[a-zA-HJ-NP-Z0-9]{25,90}$'
-    return re.match(pattern, address) is not None
+import numpy as np
 
-def clean_csv_file(file_path):
+import btc_address
+
+# Rows per chunk in the cleaning passes
+CHUNK_SIZE = 200_000
+
+# Columns that are neither balances nor part of the dedup key
+NON_BALANCE_COLUMNS = ['address', 'blockHeight', 'eligible']
+
+# Eligibility rules. 'legacy' is the original check: every address matching LEGACY_P2WSH_PATTERN is
+# ineligible, which covers all bc1 addresses (P2WPKH and P2TR included), and anything else is eligible,
+# invalid addresses included. 'p2wsh' decodes the address and marks only real P2WSH and invalid
+# addresses ineligible. 'legacy' stays the default until the airdrop owner signs off on the change.
+ELIGIBILITY_RULES = ['legacy', 'p2wsh']
+DEFAULT_ELIGIBILITY = 'legacy'
+LEGACY_P2WSH_PATTERN = r'^bc1[a-zA-HJ-NP-Z0-9]{25,90}$'
+
+def is_p2wsh_address(address, rule=DEFAULT_ELIGIBILITY):
+    if rule == 'legacy':
+        return re.match(LEGACY_P2WSH_PATTERN, address) is not None
+    # Decodes the witness program: P2WSH is a version 0 program of 32 bytes
+    return btc_address.classify(address) == btc_address.P2WSH
+
+def read_chunks(file_path, chunksize=CHUNK_SIZE):
+    # Every cell as text; cells missing from short rows come back empty like csv.DictReader's None
+    import pandas as pd
+    return pd.read_csv(file_path, dtype=str, na_filter=False, chunksize=chunksize)
+
+def fill_balances(chunk, balance_columns):
+    # Asset balances that are empty are set to '0'
+    for column in balance_columns:
+        values = chunk[column]
+        chunk[column] = values.mask(values == '', '0')
+    return chunk
+
+def row_hashes(chunk, key_columns):
+    # Stable 64-bit hash of each row's dedup key (address plus every balance column)
+    import pandas as pd
+    return pd.util.hash_pandas_object(chunk[key_columns], index=False).to_numpy()
+
+def eligibility(addresses, rule=DEFAULT_ELIGIBILITY):
+    """
+    Classifies a batch of addresses in bulk, checking each distinct address once.
+
+    Parameters:
+    - addresses: Series of addresses.
+    - rule: One of ELIGIBILITY_RULES.
+
+    Returns:
+    (eligible, invalid, p2wsh, changed) boolean arrays. invalid and p2wsh come from decoding the
+    address; changed marks the rows the other rule would give the opposite verdict.
+    """
+    import pandas as pd
+
+    codes, unique = pd.factorize(addresses)
+    verdicts = btc_address.classify_many(unique.tolist())
+    invalid = np.array([verdict is None for verdict in verdicts], dtype=bool)
+    p2wsh = np.array([verdict == btc_address.P2WSH for verdict in verdicts], dtype=bool)
+    decoded_eligible = ~(invalid | p2wsh)
+    legacy_eligible = ~pd.Series(unique).str.match(LEGACY_P2WSH_PATTERN).to_numpy(dtype=bool)
+    eligible = legacy_eligible if rule == 'legacy' else decoded_eligible
+    return eligible[codes], invalid[codes], p2wsh[codes], (legacy_eligible != decoded_eligible)[codes]
+
+def clean_csv_file(file_path, report_path=None, chunksize=CHUNK_SIZE, rule=DEFAULT_ELIGIBILITY):
+    """
+    Fills empty balances with '0', drops duplicate rows and marks each row's eligibility.
+
+    The file is streamed in chunks. Duplicates share the address and every balance column;
+    each row's key is hashed to a stable 64-bit value and only the first row of every hash
+    is kept. Addresses are classified in bulk, once per distinct address in a chunk, and judged
+    by the given eligibility rule; the report counts the rows the other rule would flip. The
+    kept rows go to a temporary file that atomically replaces the input, so an interrupted
+    run leaves the original file untouched.
+
+    Parameters:
+    - file_path: CSV with an address column, e.g. all_holders.merged.csv. Cleaned in place.
+    - report_path: Optional JSON file receiving the report.
+    - chunksize: Rows per chunk.
+    - rule: Eligibility rule, one of ELIGIBILITY_RULES.
+
+    Returns:
+    A report dict with the rows read and written, duplicates removed, rows marked
+    ineligible, the invalid and P2WSH counts, and the rows whose verdict the other rule flips.
+    """
     print(f"Processing {file_path}...")
-    cleaned_data = []
-    seen = set()
-    
+    start = time.perf_counter()
+
     with open(file_path, 'r', newline='') as csvfile:
-        reader = csv.DictReader(csvfile)
-        original_fieldnames = reader.fieldnames
-        # Ensure 'eligible' is included in the fieldnames
-        fieldnames = original_fieldnames + ['eligible'] if 'eligible' not in original_fieldnames else original_fieldnames
-        
-        for row in reader:
-            address = row['address']
-            # Check if the address is a P2WSH address
-            if is_p2wsh_address(address):
-                row['eligible'] = 'No'  # Mark as ineligible
-            else:
-                row['eligible'] = 'Yes'  # Mark as eligible
-            
-            # Iterate over each column in the row
-            for key in row.keys():
-                # Assuming asset balance columns follow a specific naming pattern or are all columns except 'address', 'blockHeight', and 'eligible'
-                if key not in ['address', 'blockHeight', 'eligible']:
-                    # Ensure asset balance is set to '0' if it's empty or null
-                    row[key] = row[key] or '0'
-            
-            # Create a unique key based on address and all asset balances
-            unique_key = tuple([row['address']] + [row[key] for key in row.keys() if key not in ['address', 'blockHeight', 'eligible']])
-            if unique_key not in seen:
-                seen.add(unique_key)
-                cleaned_data.append(row)
-    
-    # Write the cleaned data back to the file, including the eligibility column
-    with open(file_path, 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(cleaned_data)
-
-# Path to the specific CSV file
-file_path = './data/src20_holders/all_holders.merged.csv'
-clean_csv_file(file_path)
\ No newline at end of file
+        original_fieldnames = next(csv.reader(csvfile))
+    # Ensure 'eligible' is included in the fieldnames
+    fieldnames = original_fieldnames + ['eligible'] if 'eligible' not in original_fieldnames else original_fieldnames
+    balance_columns = [column for column in original_fieldnames if column not in NON_BALANCE_COLUMNS]
+    key_columns = ['address'] + balance_columns
+
+    report = {'rule': rule, 'rows': 0, 'duplicates': 0, 'written': 0, 'ineligible': 0, 'invalid': 0, 'p2wsh': 0,
+              'verdict_changes': 0}
+    seen = set()
+    temp_path = f"{file_path}.tmp"
+    with open(temp_path, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(fieldnames)
+        for chunk in read_chunks(file_path, chunksize):
+            report['rows'] += len(chunk)
+            chunk = fill_balances(chunk, balance_columns)
+            # Keep the first row of every key, within the chunk and across earlier chunks
+            kept = []
+            for key_hash in row_hashes(chunk, key_columns).tolist():
+                kept.append(key_hash not in seen)
+                seen.add(key_hash)
+            chunk = chunk[np.array(kept, dtype=bool)]
+            report['duplicates'] += len(kept) - len(chunk)
+
+            eligible, invalid, p2wsh, changed = eligibility(chunk['address'], rule)
+            chunk['eligible'] = np.where(eligible, 'Yes', 'No')
+            writer.writerows(zip(*(chunk[column].tolist() for column in fieldnames)))
+            report['written'] += len(chunk)
+            report['ineligible'] += int((~eligible).sum())
+            report['invalid'] += int(invalid.sum())
+            report['p2wsh'] += int(p2wsh.sum())
+            report['verdict_changes'] += int(changed.sum())
+    os.replace(temp_path, file_path)
+
+    report['seconds'] = round(time.perf_counter() - start, 3)
+    print(f"Removed {report['duplicates']} duplicate rows; {report['ineligible']} of {report['written']} rows "
+          f"marked ineligible by the {rule} rule ({report['invalid']} invalid, {report['p2wsh']} P2WSH); "
+          f"the other rule would flip {report['verdict_changes']}")
+    if report_path:
+        with open(report_path, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Clean the merged SRC20 holder file in place.')
+    parser.add_argument('file_path', nargs='?', default='./data/src20_holders/all_holders.merged.csv')
+    parser.add_argument('--report', default='./data/logs/src20_holders.clean_report.json', help='JSON report file.')
+    parser.add_argument('--eligibility', choices=ELIGIBILITY_RULES, default=DEFAULT_ELIGIBILITY,
+                        help="'legacy': every bc1 address is ineligible; 'p2wsh': only P2WSH and invalid addresses.")
+    args = parser.parse_args(argv)
+
+    clean_csv_file(args.file_path, report_path=args.report, rule=args.eligibility)
+
+if __name__ == "__main__":
+    main()
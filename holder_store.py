@@ -0,0 +1,304 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import re
+import shutil
+import uuid
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+DEFAULT_STORE_DIR = './data/holders'
+
+# Per partition, the part files readers see; swapped in one rename when a writer closes
+MANIFEST_NAME = '.parts.json'
+
+# kind=collection: stamp collection holders (col-*); kind=src20: SRC20 balances per holder (staging-*);
+# kind=src20_addresses: addresses seen in SRC20 event dumps, without balances (src-*)
+KINDS = ('collection', 'src20', 'src20_addresses')
+CSV_PREFIXES = {'collection': 'col', 'src20': 'staging', 'src20_addresses': 'src'}
+
+HOLDER_SCHEMA = pa.schema([
+    ('address', pa.string()),
+    ('balance', pa.float64()),
+    ('block_height', pa.int64()),
+])
+
+# Existing CSV layouts and the kind/source they map to
+CSV_LAYOUTS = [
+    (re.compile(r'^col-(?P<source>.+)_holders\.csv$'), 'collection'),
+    (re.compile(r'^src-(?P<source>.+)_holders\.csv$'), 'src20_addresses'),
+    (re.compile(r'^staging-(?P<source>.+)_holders\.csv$'), 'src20'),
+]
+
+
+def partition_dir(store_dir, kind, source):
+    if kind not in KINDS:
+        raise ValueError(f'Unknown holder kind {kind!r}, expected one of {KINDS}')
+    return os.path.join(store_dir, f'kind={kind}', f'source={source}')
+
+
+def live_parts(directory):
+    """
+    Returns the part file names of a partition that readers see: those listed in its manifest,
+    or every part-*.parquet file for a partition written before manifests existed.
+    """
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME)) as manifest:
+            return json.load(manifest)['parts']
+    except FileNotFoundError:
+        return sorted(os.path.basename(path) for path in glob.glob(os.path.join(directory, 'part-*.parquet')))
+
+
+def write_manifest(directory, parts):
+    # Written aside and renamed over the old manifest, so a partition switches generations in one step
+    temp_path = os.path.join(directory, f'{MANIFEST_NAME}.{uuid.uuid4().hex}.tmp')
+    with open(temp_path, 'w') as manifest:
+        json.dump({'parts': parts}, manifest)
+        manifest.flush()
+        os.fsync(manifest.fileno())
+    os.replace(temp_path, os.path.join(directory, MANIFEST_NAME))
+
+
+class HolderStoreWriter:
+    """
+    Writes one source partition of the columnar holder store as a Parquet file.
+
+    Batches are appended as row groups while the fetch is running. On close the new file is
+    published by swapping the partition manifest, so readers see either the old parts or the
+    new ones, never a half-written source or both generations at once.
+
+    Parameters:
+    - kind: One of KINDS.
+    - source: Collection name or SRC20 tick.
+    - store_dir: Root directory of the store.
+    - append: Keep the partition's existing files instead of replacing them.
+    """
+
+    def __init__(self, kind, source, store_dir=DEFAULT_STORE_DIR, append=False):
+        self.directory = partition_dir(store_dir, kind, source)
+        self.append = append
+        self.rows = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self.file_name = f'part-{uuid.uuid4().hex}.parquet'
+        self.temp_path = os.path.join(self.directory, f'.{self.file_name}.tmp')
+        self.writer = pq.ParquetWriter(self.temp_path, HOLDER_SCHEMA, compression='zstd')
+
+    def write(self, addresses, balances=None, block_heights=None):
+        """
+        Appends a batch. Collection holders have no balance or block height; those columns
+        are left null.
+        """
+        if not addresses:
+            return
+        batch = pa.record_batch([
+            pa.array(addresses, pa.string()),
+            pa.array(balances if balances is not None else [None] * len(addresses), pa.float64()),
+            pa.array(block_heights if block_heights is not None else [None] * len(addresses), pa.int64()),
+        ], schema=HOLDER_SCHEMA)
+        self.writer.write_batch(batch)
+        self.rows += len(addresses)
+
+    def close(self):
+        # Until the manifest swap the new part is an orphan readers skip; after it the old parts
+        # are, so a crash at any point leaves exactly one generation visible. Leftovers of
+        # earlier crashes are removed here too.
+        self.writer.close()
+        os.replace(self.temp_path, os.path.join(self.directory, self.file_name))
+        parts = (live_parts(self.directory) if self.append else []) + [self.file_name]
+        write_manifest(self.directory, parts)
+        for old_file in glob.glob(os.path.join(self.directory, 'part-*.parquet')):
+            if os.path.basename(old_file) not in parts:
+                os.remove(old_file)
+
+    def abort(self):
+        self.writer.close()
+        os.remove(self.temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def read_holders(store_dir=DEFAULT_STORE_DIR, kind=None, sources=None, columns=None):
+    """
+    Reads holder rows from the store as a pyarrow Table, memory-mapping the Parquet files.
+
+    Parameters:
+    - store_dir: Root directory of the store.
+    - kind: Optional kind, or list of kinds, to read.
+    - sources: Optional list of sources to read.
+    - columns: Columns to read; defaults to all, including the kind and source partition columns.
+
+    Returns:
+    A pyarrow Table.
+    """
+    # pyarrow.dataset pulls in pandas; only readers pay for it
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    kinds = None if kind is None else {kind} if isinstance(kind, str) else set(kind)
+    sources = None if sources is None else {str(source) for source in sources}
+    # Only the parts each partition's manifest lists, never orphans of an interrupted write
+    paths = [os.path.join(partition_dir(store_dir, kind_name, source), part)
+             for kind_name, source in list_sources(store_dir)
+             if (kinds is None or kind_name in kinds) and (sources is None or source in sources)
+             for part in live_parts(partition_dir(store_dir, kind_name, source))]
+    partitioning = ds.HivePartitioning.discover(infer_dictionary=True)
+    if not paths:
+        schema = pa.schema(list(HOLDER_SCHEMA) + [(name, pa.dictionary(pa.int32(), pa.string()))
+                                                  for name in ('kind', 'source')])
+        return schema.empty_table().select(columns) if columns is not None else schema.empty_table()
+    dataset = ds.dataset(paths, format='parquet', partitioning=partitioning, partition_base_dir=store_dir,
+                         filesystem=fs.LocalFileSystem(use_mmap=True))
+    return dataset.to_table(columns=columns)
+
+
+def list_sources(store_dir=DEFAULT_STORE_DIR, kind=None):
+    sources = []
+    for kind_dir in sorted(glob.glob(os.path.join(store_dir, 'kind=*'))):
+        kind_name = os.path.basename(kind_dir)[len('kind='):]
+        if kind is not None and kind_name != kind:
+            continue
+        for source_dir in sorted(glob.glob(os.path.join(kind_dir, 'source=*'))):
+            sources.append((kind_name, os.path.basename(source_dir)[len('source='):]))
+    return sources
+
+
+def remove_source(kind, source, store_dir=DEFAULT_STORE_DIR):
+    shutil.rmtree(partition_dir(store_dir, kind, source), ignore_errors=True)
+
+
+def import_csv(csv_file_path, kind=None, source=None, store_dir=DEFAULT_STORE_DIR, batch_size=100_000):
+    """
+    Imports one col-*/src-*/staging-* holder CSV into the store, replacing its partition.
+
+    Parameters:
+    - csv_file_path: CSV with an address column and optionally balance and blockHeight.
+    - kind, source: Partition to write. Derived from the file name when omitted.
+    - store_dir: Root directory of the store.
+    - batch_size: Rows per Parquet row group.
+
+    Returns:
+    The number of rows imported.
+    """
+    if kind is None or source is None:
+        kind, source = layout_of(csv_file_path)
+    with open(csv_file_path, newline='') as csvfile, HolderStoreWriter(kind, source, store_dir) as writer:
+        reader = csv.reader(csvfile)
+        header = next(reader, None) or []
+        columns = {name: index for index, name in enumerate(header)}
+        has_balance = 'balance' in columns and 'blockHeight' in columns
+        addresses, balances, block_heights = [], [], []
+        for row in reader:
+            if not row:
+                continue
+            addresses.append(row[columns.get('address', 0)].strip())
+            if has_balance:
+                balances.append(float(row[columns['balance']]))
+                block_heights.append(int(row[columns['blockHeight']]))
+            if len(addresses) >= batch_size:
+                writer.write(addresses, balances if has_balance else None, block_heights if has_balance else None)
+                addresses, balances, block_heights = [], [], []
+        writer.write(addresses, balances if has_balance else None, block_heights if has_balance else None)
+    return writer.rows
+
+
+def layout_of(csv_file_path):
+    file_name = os.path.basename(csv_file_path)
+    for pattern, kind in CSV_LAYOUTS:
+        match = pattern.match(file_name)
+        if match:
+            return kind, match.group('source')
+    raise ValueError(f'{file_name} does not match the col-*/src-*/staging-* holder layouts')
+
+
+def import_csv_dir(folder_path, store_dir=DEFAULT_STORE_DIR):
+    """
+    Imports every col-*/src-*/staging-* holder CSV in a folder. Returns {file name: rows}.
+    """
+    imported = {}
+    for file_name in sorted(os.listdir(folder_path)):
+        try:
+            kind, source = layout_of(file_name)
+        except ValueError:
+            continue
+        imported[file_name] = import_csv(os.path.join(folder_path, file_name), kind, source, store_dir)
+    return imported
+
+
+def format_balance(balance):
+    # Whole balances without a trailing .0 and others in their shortest round-trip form, as the API sends them
+    if balance is None:
+        return ''
+    return str(int(balance)) if balance.is_integer() else repr(balance)
+
+
+def export_csv(kind, source, csv_file_path, store_dir=DEFAULT_STORE_DIR):
+    """
+    Writes one partition back in its original CSV layout: address,balance,blockHeight for
+    SRC20 holders, address only otherwise.
+    """
+    table = read_holders(store_dir, kind=kind, sources=[source], columns=['address', 'balance', 'block_height'])
+    with open(csv_file_path, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile, lineterminator='\n')
+        if kind == 'src20':
+            writer.writerow(['address', 'balance', 'blockHeight'])
+            writer.writerows(zip(table.column('address').to_pylist(),
+                                 map(format_balance, table.column('balance').to_pylist()),
+                                 table.column('block_height').to_pylist()))
+        else:
+            writer.writerow(['address'])
+            writer.writerows([address] for address in table.column('address').to_pylist())
+    return table.num_rows
+
+
+def src20_holdings(store_dir=DEFAULT_STORE_DIR):
+    """
+    Aggregates SRC20 holder rows per (address, tick) with vectorized group-by.
+
+    Returns:
+    A pyarrow Table with address, source, balance_sum, block_height_min and block_height_max.
+    """
+    table = read_holders(store_dir, kind='src20', columns=['address', 'source', 'balance', 'block_height'])
+    table = table.set_column(table.schema.get_field_index('source'), 'source',
+                             pc.cast(table.column('source'), pa.string()))
+    return table.group_by(['address', 'source']).aggregate([
+        ('balance', 'sum'), ('block_height', 'min'), ('block_height', 'max'),
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Import/export the columnar holder store.')
+    parser.add_argument('--store', default=DEFAULT_STORE_DIR, help='Root directory of the holder store.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    import_parser = subparsers.add_parser('import', help='Import col-*/src-*/staging-* CSV files.')
+    import_parser.add_argument('paths', nargs='+', help='CSV files or folders containing them.')
+    export_parser = subparsers.add_parser('export', help='Export partitions back to their CSV layouts.')
+    export_parser.add_argument('output_dir', help='Folder for the exported CSV files.')
+    args = parser.parse_args(argv)
+
+    if args.command == 'import':
+        for path in args.paths:
+            if os.path.isdir(path):
+                for file_name, rows in import_csv_dir(path, args.store).items():
+                    print(f"Imported {rows} rows from {file_name}")
+            else:
+                print(f"Imported {import_csv(path, store_dir=args.store)} rows from {path}")
+    else:
+        os.makedirs(args.output_dir, exist_ok=True)
+        for kind, source in list_sources(args.store):
+            csv_file_path = os.path.join(args.output_dir, f'{CSV_PREFIXES[kind]}-{source}_holders.csv')
+            print(f"Exported {export_csv(kind, source, csv_file_path, args.store)} rows to {csv_file_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+import atexit
+import fnmatch
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import run_metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = './data/cache/http_cache.sqlite'
+
+# Freshness per endpoint, matched in order against the URL with fnmatch; the first match wins
+DEFAULT_TTLS = [
+    ('*/api/v2/src20/balance/*', 6 * 3600),
+    ('*/api/v2/src20/tick/*', 3600),
+    ('*/holdersByTick*', 3600),
+    ('*/api/v2/stamps/*', 24 * 3600),
+    ('*', 3600),
+]
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+class CacheMiss(requests.exceptions.RequestException):
+    """Raised in cache-only mode when a URL has no cached response."""
+
+
+class ResponseCache:
+    """
+    On-disk HTTP response cache keyed by URL, shared by every stampchain/openstamp fetcher.
+
+    Entries are fresh for the TTL of the first matching endpoint pattern. Stale entries are
+    revalidated with If-None-Match/If-Modified-Since when the server sent an ETag or
+    Last-Modified header, and the least recently used entries are evicted once the cache
+    grows beyond max_bytes.
+
+    Parameters:
+    - path: SQLite file holding the cache.
+    - ttls: List of (fnmatch pattern, seconds) pairs. Defaults to DEFAULT_TTLS.
+    - max_bytes: Size bound for the stored bodies.
+    - cache_only: Serve only from the cache (stale entries included) and never touch the network.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttls=None, max_bytes=DEFAULT_MAX_BYTES, cache_only=False):
+        self.path = path
+        self.ttls = ttls if ttls is not None else DEFAULT_TTLS
+        self.max_bytes = max_bytes
+        self.cache_only = cache_only
+        self.stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'stored': 0, 'evicted': 0}
+        self.lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                body BLOB NOT NULL,
+                content_type TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        ''')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)')
+        self.connection.commit()
+        self.total_bytes = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def ttl_for(self, url):
+        for pattern, ttl in self.ttls:
+            if fnmatch.fnmatchcase(url, pattern):
+                return ttl
+        return 0
+
+    def lookup(self, url):
+        """
+        Returns (entry, fresh) for a URL, or (None, False) when it is not cached.
+        The entry is a dict with status, body, content_type, etag and last_modified.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT status, body, content_type, etag, last_modified, fetched_at FROM responses WHERE url = ?',
+                (url,)).fetchone()
+            if row is None:
+                return None, False
+            self.connection.execute('UPDATE responses SET accessed_at = ? WHERE url = ?', (time.time(), url))
+            self.connection.commit()
+        status, body, content_type, etag, last_modified, fetched_at = row
+        entry = {'status': status, 'body': body, 'content_type': content_type,
+                 'etag': etag, 'last_modified': last_modified}
+        return entry, time.time() - fetched_at < self.ttl_for(url)
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def count(self, counter):
+        with self.lock:
+            self.stats[counter] += 1
+
+    def touch(self, url):
+        # A 304 answer makes the stored body fresh again
+        with self.lock:
+            self.stats['revalidated'] += 1
+            self.connection.execute('UPDATE responses SET fetched_at = ? WHERE url = ?', (time.time(), url))
+            self.connection.commit()
+
+    def store(self, url, status, body, headers):
+        now = time.time()
+        with self.lock:
+            previous = self.connection.execute('SELECT size FROM responses WHERE url = ?', (url,)).fetchone()
+            self.connection.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (url, status, body, headers.get('Content-Type'), headers.get('ETag'),
+                 headers.get('Last-Modified'), now, now, len(body)))
+            self.total_bytes += len(body) - (previous[0] if previous else 0)
+            self.stats['stored'] += 1
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+            self.connection.commit()
+
+    def evict(self):
+        # Drop least recently used entries until the cache is back under 90% of its bound
+        target = self.max_bytes * 0.9
+        rows = self.connection.execute('SELECT url, size FROM responses ORDER BY accessed_at')
+        victims = []
+        for url, size in rows:
+            if self.total_bytes <= target:
+                break
+            victims.append((url,))
+            self.total_bytes -= size
+        self.connection.executemany('DELETE FROM responses WHERE url = ?', victims)
+        self.stats['evicted'] += len(victims)
+
+    def log_stats(self):
+        stats = self.stats
+        logger.info(f"HTTP cache: {stats['hits']} hits, {stats['misses']} misses, "
+                    f"{stats['revalidated']} revalidated, {stats['stored']} stored, {stats['evicted']} evicted "
+                    f"({self.total_bytes / 1024 ** 2:.1f} MiB in {self.path})")
+
+    def get(self, url, session=None, revalidate=False, **kwargs):
+        """
+        Cached replacement for requests.get. Returns a requests.Response.
+
+        Parameters:
+        - url: URL to fetch.
+        - session: Optional requests.Session used for network requests.
+        - revalidate: Ask the server even when the cached entry is fresh (conditionally, when it
+          has an ETag or Last-Modified), for URLs known to have changed.
+        - kwargs: Extra keyword arguments for the network request.
+        """
+        entry, fresh = self.lookup(url)
+        if entry is not None and ((fresh and not revalidate) or self.cache_only):
+            self.count('hits')
+            return cached_response(url, entry)
+        if self.cache_only:
+            self.count('misses')
+            raise CacheMiss(f'{url} is not cached and cache-only mode is on')
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        headers.update(self.conditional_headers(entry))
+        response = network_get(url, session, headers=headers, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            self.touch(url)
+            self.count('hits')
+            return cached_response(url, entry)
+        self.count('misses')
+        if response.status_code == 200:
+            self.store(url, response.status_code, response.content, response.headers)
+        return response
+
+
+def network_get(url, session=None, **kwargs):
+    # requests.get counted in the run metrics, with its latency and status recorded against the endpoint
+    start = time.perf_counter()
+    run_metrics.count('requests')
+    try:
+        response = (session or requests).get(url, **kwargs)
+    except requests.exceptions.RequestException as exc:
+        run_metrics.observe(url, time.perf_counter() - start, type(exc).__name__)
+        raise
+    run_metrics.count('bytes', len(response.content))
+    run_metrics.observe(url, time.perf_counter() - start, response.status_code, len(response.content))
+    return response
+
+
+def cached_response(url, entry):
+    response = requests.Response()
+    response.url = url
+    response.status_code = entry['status']
+    response._content = entry['body']
+    response.headers = CaseInsensitiveDict({'Content-Type': entry['content_type'] or 'application/json'})
+    response.encoding = 'utf-8'
+    return response
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def configure(**options):
+    """
+    Replaces the shared cache used by get(). Accepts the ResponseCache keyword arguments,
+    plus enabled=False to bypass caching entirely.
+    """
+    global _default_cache
+    with _default_lock:
+        if options.pop('enabled', True):
+            _default_cache = ResponseCache(**options)
+            atexit.register(_default_cache.log_stats)
+        else:
+            _default_cache = False
+    return _default_cache
+
+
+def cache_stats():
+    """
+    Returns the counters of the shared cache, or an empty dict when it was never used or is disabled.
+    """
+    return dict(_default_cache.stats) if _default_cache else {}
+
+
+def default_cache():
+    """
+    Returns the shared cache, creating it on first use. HTTP_CACHE_PATH, HTTP_CACHE_ONLY=1
+    and HTTP_CACHE_DISABLE=1 in the environment adjust the default.
+    """
+    if _default_cache is None:
+        configure(enabled=os.environ.get('HTTP_CACHE_DISABLE') != '1',
+                  path=os.environ.get('HTTP_CACHE_PATH', DEFAULT_CACHE_PATH),
+                  cache_only=os.environ.get('HTTP_CACHE_ONLY') == '1')
+    return _default_cache or None
+
+
+def get(url, session=None, revalidate=False, **kwargs):
+    """
+    requests.get through the shared cache (or straight to the network when caching is disabled).
+    """
+    cache = default_cache()
+    if cache is None:
+        return network_get(url, session, **kwargs)
+    return cache.get(url, session=session, revalidate=revalidate, **kwargs)
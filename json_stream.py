@@ -0,0 +1,259 @@
+import csv
+import json
+from itertools import islice
+
+# Characters read per refill of the parse buffer
+CHUNK_SIZE = 1 << 20
+
+_WHITESPACE = ' \t\n\r'
+# Characters that may follow an array element
+_ELEMENT_END = _WHITESPACE + ',]'
+
+
+def _dropper(drop_fields):
+    def drop(obj):
+        for field in drop_fields & obj.keys():
+            del obj[field]
+        return obj
+    return drop
+
+
+def iter_json_array(file_path, drop_fields=(), chunk_size=CHUNK_SIZE):
+    """
+    Yields the elements of a top-level JSON array one at a time without loading the file.
+
+    Elements are decoded incrementally from a bounded text buffer, so memory stays at one
+    chunk plus the element being decoded regardless of the file size.
+
+    Parameters:
+    - file_path: JSON file containing one array, e.g. a fetchSRC20_*/fetchAllStamps dump.
+    - drop_fields: Keys removed from every decoded object (at any depth) as it is built,
+      e.g. ('stamp_base64',), so heavy values are released before the record is yielded.
+    - chunk_size: Characters read per refill.
+
+    Yields:
+    The array elements in file order.
+    """
+    drop_fields = frozenset(drop_fields)
+    decoder = json.JSONDecoder(object_hook=_dropper(drop_fields)) if drop_fields else json.JSONDecoder()
+
+    with open(file_path, 'r') as file:
+        buffer = file.read(chunk_size)
+        position = 0
+        eof = not buffer
+
+        def skip(chars):
+            # Advance past whitespace and the given separator characters, refilling as needed
+            nonlocal buffer, position, eof
+            while True:
+                while position < len(buffer) and buffer[position] in chars:
+                    position += 1
+                if position < len(buffer) or eof:
+                    return
+                buffer, position = file.read(chunk_size), 0
+                eof = not buffer
+
+        skip(_WHITESPACE)
+        if position >= len(buffer) or buffer[position] != '[':
+            raise ValueError(f'{file_path} does not contain a JSON array')
+        position += 1
+        while True:
+            skip(_WHITESPACE + ',')
+            if position >= len(buffer):
+                raise ValueError(f'{file_path}: unexpected end of JSON array')
+            if buffer[position] == ']':
+                return
+            while True:
+                try:
+                    element, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    element = end = None
+                # An element is only complete once the separator after it is in the buffer:
+                # a number cut at a chunk boundary ('1.' of '1.5') decodes on its own
+                if end is not None and (eof or (end < len(buffer) and buffer[end] in _ELEMENT_END)):
+                    break
+                more = file.read(chunk_size)
+                eof = not more
+                buffer, position = buffer[position:] + more, 0
+            position = end
+            yield element
+
+
+def iter_ndjson(file_path, drop_fields=()):
+    """
+    Yields the records of a JSON Lines (NDJSON) file one line at a time, skipping blank lines.
+    """
+    drop_fields = frozenset(drop_fields)
+    decoder = json.JSONDecoder(object_hook=_dropper(drop_fields)) if drop_fields else json.JSONDecoder()
+    with open(file_path, 'r') as file:
+        for line in file:
+            if line.strip():
+                yield decoder.decode(line)
+
+
+def detect_format(file_path):
+    """
+    Returns 'array' for a file holding one JSON array, 'ndjson' for JSON Lines.
+    """
+    with open(file_path, 'r') as file:
+        while True:
+            chunk = file.read(4096)
+            if not chunk:
+                return 'ndjson'
+            stripped = chunk.lstrip(_WHITESPACE)
+            if stripped:
+                return 'array' if stripped[0] == '[' else 'ndjson'
+
+
+def iter_json_records(file_path, drop_fields=()):
+    # Records of a JSON array or NDJSON file, whichever it holds
+    if detect_format(file_path) == 'array':
+        return iter_json_array(file_path, drop_fields)
+    return iter_ndjson(file_path, drop_fields)
+
+
+def write_ndjson(records, file):
+    # One compact JSON document per line; returns the number of records written
+    count = 0
+    for record in records:
+        file.write(json.dumps(record))
+        file.write('\n')
+        count += 1
+    return count
+
+
+def batched(iterable, size):
+    # Lists of up to size items
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def json_columns(json_files, drop_fields=()):
+    # Keys of every record across the files, in first-seen order, as pandas would union them
+    columns = {}
+    for json_file in json_files:
+        for record in iter_json_records(json_file, drop_fields):
+            for key in record:
+                columns.setdefault(key, None)
+    return list(columns)
+
+
+class SchemaChanged(Exception):
+    """Raised when a record has keys that are not in the CSV columns being written."""
+
+
+def json_records_to_csv(json_files, csv_file, drop_fields=(), columns=None, batch_size=10_000):
+    """
+    Converts JSON array or NDJSON dumps into one CSV in constant memory.
+
+    Records are streamed with iter_json_records and written in batches of batch_size rows.
+    Without an explicit column list the columns are taken from the first record; if a
+    later record brings new keys, the union of keys is collected in a separate streaming
+    pass and the CSV is rewritten.
+
+    Parameters:
+    - json_files: JSON array or NDJSON files, written in order.
+    - csv_file: Output CSV.
+    - drop_fields: Keys dropped from every record before it is materialized.
+    - columns: Optional column order; missing keys are written empty, extra keys are ignored.
+    - batch_size: Rows written per batch.
+
+    Returns:
+    The number of rows written.
+    """
+    if columns is None:
+        try:
+            return _write_csv(json_files, csv_file, drop_fields, None, batch_size)
+        except SchemaChanged:
+            columns = json_columns(json_files, drop_fields)
+    return _write_csv(json_files, csv_file, drop_fields, columns, batch_size)
+
+
+def _write_csv(json_files, csv_file, drop_fields, columns, batch_size):
+    # columns=None: infer them from the first record and raise SchemaChanged on any new key
+    infer = columns is None
+    rows = 0
+    with open(csv_file, 'w', newline='') as csvfile:
+        writer = None
+        for json_file in json_files:
+            for batch in batched(iter_json_records(json_file, drop_fields), batch_size):
+                if writer is None:
+                    if infer:
+                        columns = list(batch[0])
+                    writer = csv.DictWriter(csvfile, fieldnames=columns, extrasaction='ignore', escapechar='\\',
+                                            lineterminator='\n')
+                    writer.writeheader()
+                    column_set = set(columns)
+                if infer and not all(column_set.issuperset(record) for record in batch):
+                    raise SchemaChanged(json_file)
+                writer.writerows(batch)
+                rows += len(batch)
+        if writer is None:
+            # No records: header only (or an empty file when there are no columns to write)
+            if columns:
+                csv.writer(csvfile, lineterminator='\n').writerow(columns)
+    return rows
+
+
+def json_records_to_parquet(json_files, parquet_file, drop_fields=(), batch_size=10_000):
+    """
+    Converts JSON array or NDJSON dumps into one Parquet file in constant memory.
+
+    Each batch of records becomes one row group. The schema is inferred from the first
+    batch (columns that are all null there are stored as strings); if a later record brings
+    new keys, the key union is collected first and the file is rewritten.
+
+    Returns:
+    The number of rows written.
+    """
+    try:
+        return _write_parquet(json_files, parquet_file, drop_fields, None, batch_size)
+    except SchemaChanged:
+        return _write_parquet(json_files, parquet_file, drop_fields, json_columns(json_files, drop_fields), batch_size)
+
+
+def _write_parquet(json_files, parquet_file, drop_fields, columns, batch_size):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    infer = columns is None
+    writer = None
+    rows = 0
+    try:
+        for json_file in json_files:
+            for batch in batched(iter_json_records(json_file, drop_fields), batch_size):
+                if writer is None:
+                    if infer:
+                        columns = list(batch[0])
+                    column_set = set(columns)
+                    schema = pa.schema([(column, _column_type(pa, column, [record.get(column) for record in batch]))
+                                        for column in columns])
+                    writer = pq.ParquetWriter(parquet_file, schema, compression='zstd')
+                if infer and not all(column_set.issuperset(record) for record in batch):
+                    raise SchemaChanged(json_file)
+                try:
+                    table = pa.Table.from_pylist(batch, schema=schema)
+                except (pa.ArrowInvalid, pa.ArrowTypeError) as exc:
+                    raise ValueError(f'{json_file}: records do not fit the schema inferred from the first '
+                                     f'{batch_size} rows ({exc}); use a larger batch or CSV output') from exc
+                writer.write_table(table)
+                rows += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def _column_type(pa, column, values):
+    # Arrow type of one column of the first batch; all-null columns are stored as strings
+    try:
+        column_type = pa.array(values).type
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as exc:
+        raise ValueError(f'Column {column!r} mixes value types ({exc}); use CSV output') from exc
+    return pa.string() if pa.types.is_null(column_type) else column_type
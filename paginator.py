@@ -0,0 +1,131 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import http_cache
+import run_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket capping the request rate of a group of fetcher threads.
+
+    Parameters:
+    - rate: Requests per second.
+    - burst: Maximum number of requests that can go out back to back. Defaults to the rate.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(rate, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                time.sleep((1 - self.tokens) / self.rate)
+
+
+def fetch_json(url, session, max_retries=3, backoff_base=0.5, limiter=None, revalidate=False):
+    """
+    GET a URL through the response cache and return the parsed JSON, retrying
+    connection errors, 429 and 5xx responses with exponential backoff.
+    A RateLimiter, if given, is acquired before every attempt; revalidate=True asks
+    the server even when the cached response is still fresh.
+    """
+    for attempt in range(max_retries + 1):
+        if limiter is not None:
+            with run_metrics.timed('rate_limit'):
+                limiter.acquire()
+        try:
+            response = http_cache.get(url, session=session, revalidate=revalidate)
+            if response.status_code != 429 and response.status_code < 500:
+                if response.status_code >= 400:
+                    # 4xx other than 429 will not improve on retry
+                    run_metrics.count('errors')
+                response.raise_for_status()
+                with run_metrics.timed('parse'):
+                    return response.json()
+            error = requests.exceptions.HTTPError(f'{response.status_code} for url: {url}', response=response)
+            run_metrics.count('throttled')
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as exc:
+            error = exc
+        if attempt == max_retries:
+            run_metrics.count('errors')
+            raise error
+        run_metrics.count('retries')
+        run_metrics.retried(url)
+        delay = backoff_base * (2 ** attempt) + random.uniform(0, backoff_base)
+        logger.warning(f'Retrying {url} in {delay:.1f}s ({error})')
+        with run_metrics.timed('backoff'):
+            time.sleep(delay)
+
+
+def paginate(page_url, total_pages, max_workers=4, max_pages=None, max_retries=3, session=None, rate=None,
+             revalidate=False):
+    """
+    Fetches every page of a paginated endpoint and yields the parsed pages in page order.
+
+    Page 1 is fetched first to learn the page count; the remaining pages are fetched
+    concurrently with at most max_workers requests in flight, and at most 2 * max_workers
+    pages are held in memory while waiting for an earlier page.
+
+    Parameters:
+    - page_url: Callable returning the URL of a 1-based page number.
+    - total_pages: Callable returning the page count from the parsed first page.
+    - max_workers: Pages fetched in parallel.
+    - max_pages: Optional cap on the number of pages.
+    - max_retries: Retries per page for connection errors, 429 and 5xx.
+    - session: Optional requests.Session; one is created otherwise.
+    - rate: Optional cap on requests per second across all workers.
+    - revalidate: Ask the server for every page even when the cached response is still fresh.
+
+    Yields:
+    (page_number, parsed JSON) tuples starting with page 1.
+    """
+    owns_session = session is None
+    if owns_session:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+    limiter = RateLimiter(rate) if rate else None
+    try:
+        first_page = fetch_json(page_url(1), session, max_retries, limiter=limiter, revalidate=revalidate)
+        page_count = total_pages(first_page)
+        if max_pages is not None:
+            page_count = min(page_count, max_pages)
+        logger.debug('Fetched page 1 of %d', page_count)
+        yield 1, first_page
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = deque()
+            next_page = 2
+            while next_page <= page_count or pending:
+                # Keep a bounded window of requests ahead of the page being written
+                while next_page <= page_count and len(pending) < 2 * max_workers:
+                    pending.append((next_page, executor.submit(fetch_json, page_url(next_page), session, max_retries,
+                                                                  limiter=limiter, revalidate=revalidate)))
+                    next_page += 1
+                page_number, future = pending.popleft()
+                page = future.result()
+                logger.debug('Fetched page %d of %d', page_number, page_count)
+                yield page_number, page
+    finally:
+        if owns_session:
+            session.close()
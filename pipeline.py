@@ -0,0 +1,368 @@
+import argparse
+import ast
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STATE_PATH = './data/pipeline_state.json'
+DEFAULT_LOG_DIR = './data/logs/pipeline'
+
+# Bytes read per block when hashing file contents
+HASH_BLOCK_SIZE = 1 << 20
+
+
+class Stage:
+    """
+    One step of the airdrop pipeline: a repo script run with fixed arguments.
+
+    Parameters:
+    - name: Stage name used on the command line and in the state file.
+    - script: Script in the repo directory, run with the current interpreter.
+    - args: Command-line arguments for the script.
+    - inputs: Files or glob patterns (relative to the working directory) the stage reads;
+      their contents make up the stage fingerprint.
+    - outputs: Files or glob patterns the stage writes. A stage is only skipped when every
+      output is present.
+    - requires: Names of the stages that must finish first.
+    - network: The stage fetches from the network. Its result can change without any input
+      changing, so it only reruns on --refresh (or --force).
+    """
+
+    def __init__(self, name, script, args=(), inputs=(), outputs=(), requires=(), network=False):
+        self.name = name
+        self.script = script
+        self.args = list(args)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.requires = list(requires)
+        self.network = network
+
+    def command(self):
+        return [sys.executable, os.path.join(REPO_DIR, self.script)] + self.args
+
+
+# The airdrop, fetch to allocation. Paths are the ones the scripts read and write by default.
+AIRDROP_STAGES = [
+    Stage('collections', 'collection_scraper.py',
+          inputs=['./data/collections/json/collection_*.json'],
+          outputs=['./data/collections/col-*_holders.csv'], network=True),
+    Stage('src20-holders', 'api_src20_holders_v2.py', args=['--all', '--output-dir', './data/src20_holders'],
+          outputs=['./data/src20_holders/staging-*_holders.csv'], network=True),
+    Stage('src20-events', 'api_src20_actions.py',
+          outputs=['./fetchSRC20_*.*json'], network=True),
+    Stage('snapshot', 'balance_snapshot.py',
+          inputs=['./combined_btc_addresses.txt'],
+          outputs=['./balances_snapshot_src20-v3.csv'], network=True),
+    Stage('src20-addresses', 'api_src20_holders.py', args=['--output-dir', './data/collections'],
+          inputs=['./fetchSRC20_*.*json'],
+          outputs=['./data/collections/src-*_holders.csv'],
+          requires=['src20-events']),
+    Stage('merge-wallets', 'data_merge_wallets.py',
+          args=['--folder', './data/collections/', '--output', './data/collections/col-MERGED.txt'],
+          inputs=['./data/collections/col-*', './data/collections/src-*'],
+          outputs=['./data/collections/col-MERGED.txt'],
+          # Every col-*/src-* file is scanned, including the counts bosnft-counts writes next to the holders
+          requires=['collections', 'bosnft-counts', 'src20-addresses']),
+    Stage('bosnft-counts', 'data_bosnft_holders.py',
+          inputs=['./data/collections/col-bos_nft_holders.csv'],
+          outputs=['./data/collections/col-bos_nft_holders.counted.csv'],
+          requires=['collections']),
+    Stage('collection-matrix', 'collection_holdings.py',
+          inputs=['./data/collections/col-*_holders.csv'],
+          outputs=['./data/final/collections.csv'],
+          requires=['collections']),
+    Stage('merge-src20', 'data_src20_holders.py',
+          inputs=['./data/src20_holders/staging-*.csv'],
+          outputs=['./data/src20_holders/all_holders.merged.csv'],
+          requires=['src20-holders']),
+    Stage('clean', 'data_utils_fack.py',
+          inputs=['./data/src20_holders/all_holders.merged.csv'],
+          outputs=['./data/src20_holders/all_holders.merged.csv'],
+          requires=['merge-src20']),
+    Stage('allocate', 'calculate_allocations_src20.py',
+          inputs=['./data/src20_holders/all_holders.merged.csv', './rules/allocation_rules.json'],
+          outputs=['./data/src20_holders/all_holders.merged_allocations.csv'],
+          requires=['clean']),
+]
+
+
+def local_imports(script, repo_dir=REPO_DIR):
+    """
+    Returns the repo modules a script depends on, following imports transitively.
+
+    Every import statement counts, including the ones inside functions, and an import
+    resolves to a module when repo_dir holds a file of that name.
+
+    Parameters:
+    - script: Script file name in repo_dir.
+    - repo_dir: Directory holding the repo modules.
+
+    Returns:
+    A sorted list of module file names, the script included.
+    """
+    found = set()
+    pending = [script]
+    while pending:
+        module = pending.pop()
+        if module in found:
+            continue
+        found.add(module)
+        with open(os.path.join(repo_dir, module)) as source:
+            tree = ast.parse(source.read(), filename=module)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and not node.level and node.module:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                file_name = name.split('.')[0] + '.py'
+                if os.path.isfile(os.path.join(repo_dir, file_name)):
+                    pending.append(file_name)
+    return sorted(found)
+
+
+def expand(patterns, workdir):
+    # Files matching any of the patterns, relative to workdir, sorted and without duplicates
+    files = set()
+    for pattern in patterns:
+        files.update(os.path.relpath(path, workdir) for path in glob.glob(os.path.join(workdir, pattern))
+                     if os.path.isfile(path))
+    return sorted(files)
+
+
+class Pipeline:
+    """
+    Runs stages in dependency order, skipping the ones whose inputs did not change.
+
+    Each stage is fingerprinted by its command, the source of its script and of every repo
+    module it imports (directly or not), and the content hash of every input file. A stage whose fingerprint matches the one
+    taken right after its last successful run, and whose outputs are present, is skipped.
+    Since downstream stages hash the files upstream stages produce, a rerun whose outputs
+    come out identical does not ripple further. Stages whose dependencies are done run in
+    parallel.
+
+    File hashes are cached in the state file by size and modification time, so unchanged
+    files are not read again.
+
+    Parameters:
+    - stages: List of Stage.
+    - workdir: Directory the stage paths are relative to and the scripts run in.
+    - state_path: JSON state file, relative to workdir.
+    - log_dir: Directory for one output log per stage, relative to workdir.
+    - jobs: Stages run at the same time.
+    """
+
+    def __init__(self, stages, workdir='.', state_path=DEFAULT_STATE_PATH, log_dir=DEFAULT_LOG_DIR, jobs=4):
+        self.stages = {stage.name: stage for stage in stages}
+        self.workdir = workdir
+        self.state_path = os.path.join(workdir, state_path)
+        self.log_dir = os.path.join(workdir, log_dir)
+        self.jobs = jobs
+        # Script -> repo modules it imports, resolved once per run
+        self.code = {}
+        for stage in stages:
+            for required in stage.requires:
+                if required not in self.stages:
+                    raise ValueError(f'Stage {stage.name} requires unknown stage {required}')
+        self.order = self.topological_order()
+        self.state = self.load_state()
+
+    def topological_order(self):
+        order, visiting, visited = [], set(), set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f'Stage dependency cycle through {name}')
+            visiting.add(name)
+            for required in self.stages[name].requires:
+                visit(required)
+            visiting.discard(name)
+            visited.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def select(self, targets=None):
+        # The targets and everything upstream of them, in dependency order
+        if not targets:
+            return list(self.order)
+        selected = set()
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name not in self.stages:
+                raise ValueError(f'Unknown stage {name}; stages: {", ".join(self.order)}')
+            if name not in selected:
+                selected.add(name)
+                pending.extend(self.stages[name].requires)
+        return [name for name in self.order if name in selected]
+
+    def load_state(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as state_file:
+                return json.load(state_file)
+        return {'stages': {}, 'files': {}}
+
+    def save_state(self):
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        temp_path = f'{self.state_path}.tmp'
+        with open(temp_path, 'w') as state_file:
+            json.dump(self.state, state_file, indent=2, sort_keys=True)
+        os.replace(temp_path, self.state_path)
+
+    def file_hash(self, path):
+        # Content hash of a file, reused while its size and modification time are unchanged
+        stat = os.stat(path)
+        cached = self.state['files'].get(path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+        self.state['files'][path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def fingerprint(self, stage):
+        digest = hashlib.sha256(json.dumps([stage.script, stage.args]).encode())
+        if stage.script not in self.code:
+            self.code[stage.script] = local_imports(stage.script)
+        for module in self.code[stage.script]:
+            digest.update(f'code:{module}:{self.file_hash(os.path.join(REPO_DIR, module))}\n'.encode())
+        for path in expand(stage.inputs, self.workdir):
+            digest.update(f'input:{path}:{self.file_hash(os.path.join(self.workdir, path))}\n'.encode())
+        return digest.hexdigest()
+
+    def outputs_present(self, stage):
+        return all(expand([pattern], self.workdir) for pattern in stage.outputs)
+
+    def up_to_date(self, stage, fingerprint):
+        recorded = self.state['stages'].get(stage.name, {})
+        return fingerprint == recorded.get('fingerprint') and self.outputs_present(stage)
+
+    def execute(self, stage):
+        os.makedirs(self.log_dir, exist_ok=True)
+        log_path = os.path.join(self.log_dir, f'{stage.name}.log')
+        start = time.perf_counter()
+        with open(log_path, 'w') as log_file:
+            returncode = subprocess.run(stage.command(), cwd=self.workdir, stdin=subprocess.DEVNULL,
+                                        stdout=log_file, stderr=subprocess.STDOUT).returncode
+        return returncode, time.perf_counter() - start, log_path
+
+    def run(self, targets=None, force=(), refresh=False, dry_run=False, offline=False):
+        """
+        Runs the selected stages and their upstream stages.
+
+        Parameters:
+        - targets: Stage names to bring up to date; all stages by default.
+        - force: Stage names to rerun even if they are up to date.
+        - refresh: Rerun the network stages.
+        - dry_run: Only report which stages would run.
+        - offline: Never run network stages; their existing outputs are used as they are.
+
+        Returns:
+        A dict of stage name -> {'status': ran|skipped|failed|blocked|would-run, 'seconds', ...}.
+        """
+        selected = self.select(targets)
+        force = set(force)
+        results = {}
+        pending = list(selected)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            while pending or running:
+                for name in list(pending):
+                    stage = self.stages[name]
+                    required = [results.get(dependency, {}).get('status') for dependency in stage.requires
+                                if dependency in selected]
+                    if any(status in ('failed', 'blocked') for status in required):
+                        results[name] = {'status': 'blocked'}
+                        pending.remove(name)
+                        continue
+                    if not all(status in ('ran', 'skipped', 'would-run') for status in required):
+                        continue
+                    pending.remove(name)
+                    if offline and stage.network:
+                        if self.outputs_present(stage):
+                            results[name] = {'status': 'skipped'}
+                        else:
+                            print(f'Stage {name} has no outputs and cannot be fetched offline')
+                            results[name] = {'status': 'failed'}
+                        continue
+                    fingerprint = self.fingerprint(stage)
+                    rerun = name in force or (refresh and stage.network) or 'would-run' in required
+                    if not rerun and self.up_to_date(stage, fingerprint):
+                        results[name] = {'status': 'skipped'}
+                    elif dry_run:
+                        results[name] = {'status': 'would-run'}
+                    else:
+                        print(f'Running {name}: {" ".join(stage.command()[1:])}')
+                        running[executor.submit(self.execute, stage)] = name
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    returncode, seconds, log_path = future.result()
+                    results[name] = {'status': 'ran' if returncode == 0 else 'failed', 'seconds': round(seconds, 3),
+                                     'returncode': returncode, 'log': log_path}
+                    if returncode == 0:
+                        # Fingerprinted after the run, so stages that rewrite their own inputs
+                        # (clean works in place, col-MERGED.txt matches col-*) are up to date next time
+                        self.state['stages'][name] = {'fingerprint': self.fingerprint(self.stages[name]),
+                                                      'finished_at': time.time(), 'seconds': round(seconds, 3)}
+                    else:
+                        self.state['stages'].pop(name, None)
+                        print(f'Stage {name} failed with exit code {returncode}; see {log_path}')
+                    self.save_state()
+        if not dry_run:
+            self.save_state()
+        return {name: results[name] for name in selected}
+
+
+def print_report(results):
+    for name, result in results.items():
+        seconds = f" {result['seconds']:.2f}s" if 'seconds' in result else ''
+        print(f"  {name:20s} {result['status']}{seconds}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the airdrop pipeline, skipping stages whose inputs did not change.')
+    parser.add_argument('stages', nargs='*', help='Stages to bring up to date, with their upstream stages (default: all).')
+    parser.add_argument('--force', nargs='+', default=[], metavar='STAGE', help='Rerun these stages regardless.')
+    parser.add_argument('--refresh', action='store_true', help='Rerun the network fetch stages.')
+    parser.add_argument('--jobs', type=int, default=4, help='Stages run in parallel.')
+    parser.add_argument('--dry-run', action='store_true', help='Only show which stages would run.')
+    parser.add_argument('--offline', action='store_true', help='Use the existing outputs of the network stages.')
+    parser.add_argument('--list', action='store_true', help='List the stages and their dependencies.')
+    parser.add_argument('--workdir', default='.', help='Directory the stage paths are relative to.')
+    parser.add_argument('--state', default=DEFAULT_STATE_PATH, help='State file, relative to --workdir.')
+    args = parser.parse_args(argv)
+
+    pipeline = Pipeline(AIRDROP_STAGES, workdir=args.workdir, state_path=args.state, jobs=args.jobs)
+    if args.list:
+        for name in pipeline.order:
+            stage = pipeline.stages[name]
+            print(f"{name:20s} {stage.script:32s} after: {', '.join(stage.requires) or '-'}"
+                  f"{' (network)' if stage.network else ''}")
+    else:
+        results = pipeline.run(args.stages, force=args.force, refresh=args.refresh, dry_run=args.dry_run,
+                               offline=args.offline)
+        print_report(results)
+        if any(result['status'] in ('failed', 'blocked') for result in results.values()):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+import bisect
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from fnmatch import fnmatchcase
+from urllib.parse import urlsplit
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_METRICS_DIR = './data/logs/metrics'
+
+# Counters every metrics file reports, zero when a run never touched them
+COUNTERS = ['requests', 'retries', 'throttled', 'errors', 'rows', 'bytes']
+
+# Where the time goes, summed over every worker: request round trips, JSON decoding, file writes,
+# waiting for a rate limiter token, sleeping before a retry, and waiting for a shared file lock
+PHASES = ['network', 'parse', 'disk', 'rate_limit', 'backoff', 'lock']
+
+# Endpoint names for the latency histograms, matched in order against the URL; other URLs are grouped by host
+ENDPOINTS = [
+    ('*/api/v2/src20/balance/*', 'src20/balance'),
+    ('*/api/v2/src20/tick/*', 'src20/tick'),
+    ('*/holdersByTick*', 'holdersByTick'),
+    ('*/api/v2/stamps/*', 'stamps'),
+]
+
+# Latency bucket upper bounds in seconds, growing by 10% from 1 ms to about 2 minutes
+LATENCY_BUCKETS = [0.001 * 1.1 ** index for index in range(124)]
+
+_counters = {}
+_endpoints = {}
+_timings = {}
+_lock = threading.Lock()
+
+
+def count(name, amount=1):
+    # Adds to a process-wide run counter; safe to call from fetcher threads and the snapshot event loop
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def counters():
+    with _lock:
+        return dict(_counters)
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _endpoints.clear()
+        _timings.clear()
+
+
+def endpoint_name(url):
+    # https://stampchain.io/api/v2/src20/balance/bc1q... -> src20/balance
+    for pattern, name in ENDPOINTS:
+        if fnmatchcase(url, pattern):
+            return name
+    return urlsplit(url).netloc
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram; percentiles are read back to within one 10% bucket.
+    """
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def observe(self, seconds):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+
+    def percentile(self, fraction):
+        # Upper bound of the bucket holding the requested rank, capped by the slowest observation
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return min(LATENCY_BUCKETS[index], self.maximum) if index < len(LATENCY_BUCKETS) else self.maximum
+        return 0.0
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count * 1000, 1) if self.count else 0.0,
+            'p50_ms': round(self.percentile(0.50) * 1000, 1),
+            'p95_ms': round(self.percentile(0.95) * 1000, 1),
+            'p99_ms': round(self.percentile(0.99) * 1000, 1),
+            'max_ms': round(self.maximum * 1000, 1),
+        }
+
+
+def _endpoint(url):
+    # Per-endpoint record; the caller holds _lock
+    name = endpoint_name(url)
+    record = _endpoints.get(name)
+    if record is None:
+        record = _endpoints[name] = {'latency': LatencyHistogram(), 'statuses': {}, 'bytes': 0, 'retries': 0}
+    return record
+
+
+def observe(url, seconds, status, size=0):
+    """
+    Records one network round trip against the endpoint of a URL.
+
+    Parameters:
+    - url: Requested URL.
+    - seconds: Time from sending the request to having read the response body.
+    - status: HTTP status code, or the exception class name when no response came back.
+    - size: Response body bytes.
+    """
+    with _lock:
+        record = _endpoint(url)
+        record['latency'].observe(seconds)
+        record['statuses'][status] = record['statuses'].get(status, 0) + 1
+        record['bytes'] += size
+        _timings['network'] = _timings.get('network', 0.0) + seconds
+
+
+def retried(url):
+    # A retry against the endpoint of a URL, on top of the run-wide 'retries' counter
+    with _lock:
+        _endpoint(url)['retries'] += 1
+
+
+def add_time(phase, seconds):
+    with _lock:
+        _timings[phase] = _timings.get(phase, 0.0) + seconds
+
+
+@contextmanager
+def timed(phase):
+    # with run_metrics.timed('disk'): writer.writerows(rows)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(phase, time.perf_counter() - start)
+
+
+def endpoints():
+    # Latency percentiles, status codes, bytes and retries per endpoint
+    with _lock:
+        return {name: {**record['latency'].summary(),
+                       'statuses': {str(status): count for status, count in sorted(record['statuses'].items(), key=str)},
+                       'bytes': record['bytes'], 'retries': record['retries']}
+                for name, record in sorted(_endpoints.items())}
+
+
+def timings():
+    with _lock:
+        return {phase: round(_timings.get(phase, 0.0), 3) for phase in PHASES}
+
+
+def peak_rss_mib():
+    # Peak resident set of this process or of the largest child it waited for; ru_maxrss is in KiB on Linux
+    if resource is None:
+        return None
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / 1024
+
+
+def default_metrics_path(command, metrics_dir=DEFAULT_METRICS_DIR):
+    # ./data/logs/metrics/merge-wallets-20240301-120000.json
+    return os.path.join(metrics_dir, f"{command.replace(' ', '-')}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+
+
+class Sampler(threading.Thread):
+    """
+    Background thread appending a live sample of the run-wide metrics to a JSON Lines file.
+
+    Each sample carries the elapsed seconds, the counters, the phase timings and the request
+    count and p95 latency per endpoint, and is summarized in one log line.
+
+    Parameters:
+    - path: JSON Lines file receiving one sample per interval.
+    - interval: Seconds between samples.
+    """
+
+    def __init__(self, path, interval):
+        super().__init__(daemon=True)
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.start_time = time.perf_counter()
+
+    def run(self):
+        with open(self.path, 'a') as samples_file:
+            while not self.stopped.wait(self.interval):
+                self.sample(samples_file)
+            self.sample(samples_file)
+
+    def sample(self, samples_file):
+        elapsed = time.perf_counter() - self.start_time
+        latency = {name: {'count': record['count'], 'p95_ms': record['p95_ms']}
+                   for name, record in endpoints().items()}
+        sample = {'elapsed_seconds': round(elapsed, 3), **counters(), 'timings': timings(), 'endpoints': latency}
+        samples_file.write(json.dumps(sample) + '\n')
+        samples_file.flush()
+        logger.info('%.0fs: %d requests (%.1f/s), %d retries, p95 %s', elapsed, sample.get('requests', 0),
+                    sample.get('requests', 0) / elapsed if elapsed else 0.0, sample.get('retries', 0),
+                    ', '.join(f"{name} {record['p95_ms']:.0f} ms" for name, record in latency.items()) or '-')
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class RunMetrics:
+    """
+    Collects the metrics of one run and writes them as a JSON file when the run ends.
+
+    The counters are process-wide: the fetchers, the HTTP cache and the snapshot engine add
+    requests, retries, throttled responses, errors and response bytes as they go, along with
+    per-endpoint latency histograms and the time spent per phase, and the run adds its own
+    rows. The file is written whether the run succeeds or fails.
+
+    Parameters:
+    - command: Name of the run, e.g. 'snapshot' or 'merge wallets'.
+    - path: JSON file to write.
+    - options: Dict of the settings the run used, recorded next to the metrics.
+    - sample_interval: Optional seconds between live samples, appended to <path>.samples.ndjson.
+    """
+
+    def __init__(self, command, path, options=None, sample_interval=None):
+        self.command = command
+        self.path = path
+        self.options = options or {}
+        self.sample_interval = sample_interval
+        self.sampler = None
+        self.values = {}
+        self.outputs = []
+
+    def __enter__(self):
+        reset()
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        if self.sample_interval:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.sampler = Sampler(f'{os.path.splitext(self.path)[0]}.samples.ndjson', self.sample_interval)
+            self.sampler.start()
+            self.outputs.append(self.sampler.path)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if self.sampler is not None:
+            self.sampler.stop()
+        self.write('failed' if exc_type is not None else 'ok', repr(exc) if exc is not None else None)
+
+    def set(self, **values):
+        # Extra run-specific values, e.g. rows=... or cache=...
+        self.values.update(values)
+
+    def add_output(self, *paths):
+        # Files the run wrote; their sizes go into the metrics file
+        self.outputs.extend(paths)
+
+    def report(self, status='ok', error=None):
+        wall_seconds = time.perf_counter() - self.start
+        metrics = {name: 0 for name in COUNTERS}
+        metrics.update(counters())
+        metrics.update(self.values)
+        report = {
+            'command': self.command,
+            'status': status,
+            'error': error,
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='milliseconds'),
+            'wall_seconds': round(wall_seconds, 3),
+            'cpu_seconds': round(time.process_time() - self.cpu_start, 3),
+            **metrics,
+            'rows_per_second': round(metrics['rows'] / wall_seconds, 1) if wall_seconds else 0.0,
+            'peak_rss_mib': round(peak_rss_mib(), 1) if resource else None,
+            'timings': timings(),
+            'endpoints': endpoints(),
+            'outputs': {path: os.path.getsize(path) for path in self.outputs if os.path.isfile(path)},
+            'options': self.options,
+        }
+        return report
+
+    def write(self, status='ok', error=None):
+        report = self.report(status, error)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w') as metrics_file:
+            json.dump(report, metrics_file, indent=2)
+        os.replace(temp_path, self.path)
+        return report
+
+
+def load_reports(patterns):
+    """
+    Reads metrics files, oldest run first.
+
+    Parameters:
+    - patterns: Metrics file paths or globs.
+
+    Returns:
+    A list of report dicts, each with its file path under 'path'.
+    """
+    reports = []
+    for path in sorted({path for pattern in patterns for path in glob.glob(pattern)}):
+        with open(path) as metrics_file:
+            report = json.load(metrics_file)
+        report['path'] = path
+        reports.append(report)
+    return sorted(reports, key=lambda report: report.get('started_at', ''))
+
+
+def print_reports(reports, details=False):
+    print(f"{'started':19s}  {'command':22s} {'status':6s} {'wall s':>8s} {'rows':>10s} {'rows/s':>10s} "
+          f"{'requests':>9s} {'retries':>8s} {'MiB in':>8s} {'peak MiB':>9s}")
+    for report in reports:
+        peak = f"{report['peak_rss_mib']:9.0f}" if report.get('peak_rss_mib') is not None else f"{'-':>9s}"
+        print(f"{report['started_at'][:19]:19s}  {report['command']:22s} {report['status']:6s} "
+              f"{report['wall_seconds']:8.2f} {report['rows']:10d} {report['rows_per_second']:10.0f} "
+              f"{report['requests']:9d} {report['retries']:8d} {report['bytes'] / 1024 ** 2:8.1f} {peak}")
+        if details:
+            print_details(report)
+
+
+def print_details(report):
+    # Per-endpoint latency and the phase timings of one run, printed under its table row
+    for name, record in report.get('endpoints', {}).items():
+        statuses = ' '.join(f'{status}:{count}' for status, count in record['statuses'].items())
+        print(f"    {name:20s} {record['count']:8d} req  p50 {record['p50_ms']:8.1f}  p95 {record['p95_ms']:8.1f}  "
+              f"p99 {record['p99_ms']:8.1f} ms  {record['bytes'] / 1024 ** 2:8.1f} MiB  "
+              f"{record['retries']} retries  [{statuses}]")
+    if report.get('timings'):
+        print('    seconds: ' + '  '.join(f'{phase} {seconds:.2f}' for phase, seconds in report['timings'].items())
+              + f"  (cpu {report.get('cpu_seconds', 0):.2f}, wall {report['wall_seconds']:.2f})")
+
@@ -0,0 +1,285 @@
+import asyncio
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import http_cache
+import run_metrics
+
+logger = logging.getLogger(__name__)
+
+BALANCE_URL = 'https://stampchain.io/api/v2/src20/balance/{address}'
+
+# Requests per second allowed against any host without an explicit entry in host_rates
+DEFAULT_RATE = 10.0
+
+
+class TokenBucket:
+    """
+    Async token bucket used to cap the request rate against a single host.
+
+    Parameters:
+    - rate: Tokens added per second.
+    - burst: Maximum number of tokens that can accumulate. Defaults to the rate.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(rate, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AdaptiveConcurrency:
+    """
+    Concurrency gate that grows additively on success and halves on throttling (AIMD).
+
+    Parameters:
+    - initial: Number of requests allowed in flight at start.
+    - maximum: Upper bound on requests in flight.
+    - minimum: Lower bound the limit never drops below.
+    - increase_every: Consecutive successes needed before the limit grows by one.
+    """
+
+    def __init__(self, initial, maximum, minimum=1, increase_every=20):
+        self.limit = max(minimum, min(initial, maximum))
+        self.maximum = maximum
+        self.minimum = minimum
+        self.increase_every = increase_every
+        self.in_flight = 0
+        self.successes = 0
+        self.condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def success(self):
+        self.successes += 1
+        if self.successes >= self.increase_every and self.limit < self.maximum:
+            self.limit += 1
+            self.successes = 0
+
+    def backoff(self):
+        new_limit = max(self.minimum, self.limit // 2)
+        if new_limit != self.limit:
+            logger.warning(f'Throttled, reducing concurrency from {self.limit} to {new_limit}')
+        self.limit = new_limit
+        self.successes = 0
+
+
+def _retry_delay(response, attempt, backoff_base):
+    # Honour Retry-After when the server sends it, otherwise back off exponentially with jitter
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return backoff_base * (2 ** attempt) + random.uniform(0, backoff_base)
+
+
+async def _fetch_one(session, url, bucket, limiter, stats, max_retries, backoff_base, cache=None, revalidate=False):
+    import aiohttp
+
+    headers = {}
+    if cache is not None:
+        entry, fresh = cache.lookup(url)
+        if entry is not None and ((fresh and not revalidate) or cache.cache_only):
+            cache.count('hits')
+            try:
+                return json.loads(entry['body']), None
+            except ValueError as exc:
+                return None, exc
+        if cache.cache_only:
+            cache.count('misses')
+            return None, http_cache.CacheMiss(f'{url} is not cached and cache-only mode is on')
+        headers = cache.conditional_headers(entry)
+
+    last_error = None
+    for attempt in range(max_retries + 1):
+        with run_metrics.timed('rate_limit'):
+            await bucket.acquire()
+        stats['requests'] += 1
+        run_metrics.count('requests')
+        start = time.perf_counter()
+        try:
+            async with session.get(url, headers=headers) as response:
+                if response.status == 304 and cache is not None and entry is not None:
+                    run_metrics.observe(url, time.perf_counter() - start, response.status)
+                    cache.touch(url)
+                    cache.count('hits')
+                    limiter.success()
+                    with run_metrics.timed('parse'):
+                        return json.loads(entry['body']), None
+                if response.status == 429 or response.status >= 500:
+                    run_metrics.observe(url, time.perf_counter() - start, response.status)
+                    stats['throttled'] += 1
+                    run_metrics.count('throttled')
+                    limiter.backoff()
+                    last_error = aiohttp.ClientResponseError(
+                        response.request_info, response.history, status=response.status, message=response.reason)
+                    if attempt < max_retries:
+                        stats['retries'] += 1
+                        run_metrics.count('retries')
+                        run_metrics.retried(url)
+                        with run_metrics.timed('backoff'):
+                            await asyncio.sleep(_retry_delay(response, attempt, backoff_base))
+                    continue
+                if response.status >= 400:
+                    run_metrics.observe(url, time.perf_counter() - start, response.status)
+                response.raise_for_status()
+                body = await response.read()
+                run_metrics.observe(url, time.perf_counter() - start, response.status, len(body))
+                run_metrics.count('bytes', len(body))
+                with run_metrics.timed('parse'):
+                    payload = json.loads(body)
+                if cache is not None:
+                    cache.count('misses')
+                    cache.store(url, response.status, body, response.headers)
+                limiter.success()
+                return payload, None
+        except aiohttp.ClientResponseError as exc:
+            # 4xx other than 429 will not improve on retry
+            return None, exc
+        except ValueError as exc:
+            # A body that is not JSON (an HTML error page, an empty 304) fails this address only
+            return None, exc
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            run_metrics.observe(url, time.perf_counter() - start, type(exc).__name__)
+            last_error = exc
+            limiter.backoff()
+            if attempt < max_retries:
+                stats['retries'] += 1
+                run_metrics.count('retries')
+                run_metrics.retried(url)
+                with run_metrics.timed('backoff'):
+                    await asyncio.sleep(_retry_delay(None, attempt, backoff_base))
+    return None, last_error
+
+
+async def fetch_snapshots(addresses, sink, url_template=BALANCE_URL, concurrency=8, max_concurrency=32,
+                          rate=DEFAULT_RATE, host_rates=None, max_retries=5, backoff_base=0.5, timeout=30,
+                          cache=None, revalidate=False):
+    """
+    Fetches the balance snapshot of every address through one pooled aiohttp session.
+
+    Parameters:
+    - addresses: Iterable of wallet addresses.
+    - sink: Callable invoked as sink(address, payload, error) as soon as each address completes.
+    - url_template: URL with an {address} placeholder.
+    - concurrency: Requests in flight at start; adapts between 1 and max_concurrency.
+    - max_concurrency: Upper bound for the adaptive concurrency and the connection pool.
+    - rate: Default requests per second per host.
+    - host_rates: Optional dict of host -> requests per second overriding the default rate.
+    - max_retries: Retries for 429/5xx responses and connection errors.
+    - backoff_base: Base delay in seconds for exponential backoff.
+    - timeout: Total timeout per request in seconds.
+    - cache: http_cache.ResponseCache to read through. None uses the shared cache, False disables it.
+    - revalidate: Ask the server even for fresh cache entries, e.g. for addresses known to have changed.
+
+    Returns:
+    A dict of counters (addresses, requests, retries, throttled, errors).
+    """
+    import aiohttp
+
+    host_rates = host_rates or {}
+    if cache is None:
+        cache = http_cache.default_cache()
+    cache = cache or None
+    buckets = {}
+    limiter = AdaptiveConcurrency(concurrency, max_concurrency)
+    stats = {'addresses': 0, 'requests': 0, 'retries': 0, 'throttled': 0, 'errors': 0}
+
+    work = asyncio.Queue()
+    for address in addresses:
+        work.put_nowait(address)
+
+    def bucket_for(url):
+        host = urlsplit(url).hostname
+        if host not in buckets:
+            buckets[host] = TokenBucket(host_rates.get(host, rate))
+        return buckets[host]
+
+    async def worker(session):
+        while True:
+            try:
+                address = work.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            url = url_template.format(address=address)
+            async with limiter:
+                payload, error = await _fetch_one(session, url, bucket_for(url), limiter, stats,
+                                                  max_retries, backoff_base, cache, revalidate)
+            stats['addresses'] += 1
+            if error is not None:
+                stats['errors'] += 1
+                run_metrics.count('errors')
+            sink(address, payload, error)
+
+    connector = aiohttp.TCPConnector(limit=max_concurrency, ttl_dns_cache=300)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        await asyncio.gather(*(worker(session) for _ in range(max_concurrency)))
+    return stats
+
+
+def stream_snapshots(addresses, **options):
+    """
+    Runs fetch_snapshots on a background event loop and yields (address, payload, error) tuples
+    as they complete, so callers can consume results with a plain for-loop.
+
+    Parameters:
+    - addresses: Iterable of wallet addresses.
+    - options: Keyword arguments forwarded to fetch_snapshots.
+
+    Returns:
+    A generator of (address, payload, error) tuples. The final stats dict is available as
+    the generator's return value.
+    """
+    results = queue.Queue()
+    done = object()
+    outcome = {}
+
+    def run():
+        try:
+            outcome['stats'] = asyncio.run(fetch_snapshots(addresses, lambda *item: results.put(item), **options))
+        except BaseException as exc:
+            outcome['error'] = exc
+        finally:
+            results.put(done)
+
+    thread = threading.Thread(target=run, name='snapshot-engine', daemon=True)
+    thread.start()
+    while True:
+        item = results.get()
+        if item is done:
+            break
+        yield item
+    thread.join()
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['stats']
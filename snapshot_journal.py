@@ -0,0 +1,191 @@
+import hashlib
+import json
+import sqlite3
+import time
+
+
+def payload_hash(payload):
+    # Hash of the canonical JSON encoding, so key order in the response does not matter
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+def default_run_id(addresses):
+    # The same address list resumes the same run unless an explicit run id is given
+    digest = hashlib.sha256()
+    for address in addresses:
+        digest.update(address.encode())
+        digest.update(b'\n')
+    return digest.hexdigest()[:16]
+
+
+class SnapshotJournal:
+    """
+    SQLite progress journal for snapshot runs, keyed by run id and address.
+
+    Every completed address is committed as soon as it arrives, together with its payload,
+    payload hash and error state, so an interrupted run can resume with only the missing
+    or failed addresses.
+
+    Parameters:
+    - path: SQLite database file. Created if it does not exist.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS snapshot_journal (
+                run_id TEXT NOT NULL,
+                address TEXT NOT NULL,
+                status TEXT NOT NULL,
+                payload TEXT,
+                payload_hash TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 1,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (run_id, address)
+            )
+        ''')
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def record(self, run_id, address, payload, error=None):
+        """
+        Stores the outcome for one address and commits immediately.
+        """
+        if error is None:
+            status, payload_text, digest = 'ok', json.dumps(payload, sort_keys=True), payload_hash(payload)
+        else:
+            status, payload_text, digest = 'error', None, None
+        self.connection.execute('''
+            INSERT INTO snapshot_journal (run_id, address, status, payload, payload_hash, error, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (run_id, address) DO UPDATE SET
+                status = excluded.status,
+                payload = excluded.payload,
+                payload_hash = excluded.payload_hash,
+                error = excluded.error,
+                attempts = attempts + 1,
+                updated_at = excluded.updated_at
+        ''', (run_id, address, status, payload_text, digest, None if error is None else str(error), time.time()))
+        self.connection.commit()
+
+    def completed(self, run_id):
+        """
+        Returns the set of addresses with a successful payload in the run.
+        """
+        rows = self.connection.execute(
+            "SELECT address FROM snapshot_journal WHERE run_id = ? AND status = 'ok'", (run_id,))
+        return {address for (address,) in rows}
+
+    def pending(self, run_id, addresses):
+        """
+        Returns the addresses, in input order, that are missing from the run or failed.
+        """
+        done = self.completed(run_id)
+        return [address for address in addresses if address not in done]
+
+    def payloads(self, run_id):
+        """
+        Returns a dict of address -> payload for every successful address in the run.
+        """
+        rows = self.connection.execute(
+            "SELECT address, payload FROM snapshot_journal WHERE run_id = ? AND status = 'ok'", (run_id,))
+        return {address: json.loads(payload) for address, payload in rows}
+
+    def summary(self, run_id):
+        rows = self.connection.execute(
+            'SELECT status, COUNT(*) FROM snapshot_journal WHERE run_id = ? GROUP BY status', (run_id,))
+        return dict(rows.fetchall())
+
+
+def payload_block_time(payload):
+    # Latest block_time among the balance rows of a payload; ISO timestamps sort as strings
+    times = [item.get('block_time') for item in (payload or {}).get('data') or [] if item.get('block_time')]
+    return max(times) if times else None
+
+
+class SnapshotBaseline:
+    """
+    The previous snapshot kept as a baseline for incremental runs, one row per address.
+
+    Each row holds the last balance payload together with its latest block_time and the
+    block height the balance API reported (last_block) when the address was fetched, so an
+    address only needs refetching once activity newer than that block shows up.
+
+    Parameters:
+    - path: SQLite database file. Created if it does not exist.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS snapshot_baseline (
+                address TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                payload_hash TEXT NOT NULL,
+                block_time TEXT,
+                last_block INTEGER,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def record(self, address, payload):
+        """
+        Replaces the baseline payload of one address and commits immediately.
+        """
+        self.connection.execute('''
+            INSERT INTO snapshot_baseline (address, payload, payload_hash, block_time, last_block, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (address) DO UPDATE SET
+                payload = excluded.payload,
+                payload_hash = excluded.payload_hash,
+                block_time = excluded.block_time,
+                last_block = excluded.last_block,
+                updated_at = excluded.updated_at
+        ''', (address, json.dumps(payload, sort_keys=True), payload_hash(payload), payload_block_time(payload),
+              payload.get('last_block'), time.time()))
+        self.connection.commit()
+
+    def last_blocks(self):
+        """
+        Returns a dict of address -> last_block for every address in the baseline.
+        """
+        rows = self.connection.execute('SELECT address, last_block FROM snapshot_baseline')
+        return dict(rows.fetchall())
+
+    def payloads(self, addresses=None):
+        """
+        Returns a dict of address -> payload, for all addresses or only the given ones.
+        """
+        rows = self.connection.execute('SELECT address, payload FROM snapshot_baseline')
+        wanted = None if addresses is None else set(addresses)
+        return {address: json.loads(payload) for address, payload in rows if wanted is None or address in wanted}
+
+    def block(self):
+        # Oldest block any baseline address was fetched at: activity after it may not be reflected yet
+        (block,) = self.connection.execute('SELECT MIN(last_block) FROM snapshot_baseline').fetchone()
+        return block
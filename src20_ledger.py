@@ -0,0 +1,168 @@
+import argparse
+import csv
+import glob
+import logging
+import os
+from decimal import Decimal, InvalidOperation
+
+import airdrop_config
+from json_stream import iter_json_records
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FIELDS = ['Address', 'Ticker', 'Amount', 'Block Time']
+
+
+def load_events(pattern='./fetchSRC20_*.*json'):
+    """
+    Reads SRC-20 events from the fetchSRC20_* JSON array or NDJSON dumps written by api_src20_actions.
+
+    The same tick is often dumped more than once (the file names get a random suffix), so
+    events are deduplicated by transaction hash.
+
+    Returns:
+    A list of events sorted in chain order by (block_index, tx_index).
+    """
+    events = {}
+    for file_path in sorted(glob.glob(pattern)):
+        for event in iter_json_records(file_path, drop_fields=('stamp_base64',)):
+            key = (event.get('tx_hash') or event.get('id'), str(event.get('tick')).lower())
+            events[key] = event
+    return sorted(events.values(), key=lambda event: (event['block_index'], event.get('tx_index') or 0))
+
+
+def parse_amount(value):
+    try:
+        amount = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        return None
+    return amount if amount.is_finite() and amount > 0 else None
+
+
+class Ledger:
+    """
+    Replays SRC-20 DEPLOY/MINT/TRANSFER events into per-tick holder balances.
+
+    Amounts are exact Decimals. A mint is capped at the remaining supply when the deploy
+    declared a max, and a transfer larger than the sender's balance is skipped, as an
+    SRC-20 indexer would.
+
+    Parameters:
+    - ticks: Ticks to track (case-insensitive). Defaults to airdrop_config.SRC20_WHITELIST.
+    """
+
+    def __init__(self, ticks=None):
+        self.ticks = {tick.lower() for tick in (ticks if ticks is not None else airdrop_config.SRC20_WHITELIST)}
+        self.balances = {tick: {} for tick in self.ticks}
+        self.block_times = {tick: {} for tick in self.ticks}
+        self.max_supply = {}
+        self.minted = {tick: Decimal(0) for tick in self.ticks}
+        self.skipped = 0
+
+    def apply(self, event):
+        """
+        Applies one event. Returns False when the event was skipped as invalid.
+        """
+        tick = str(event.get('tick')).lower()
+        if tick not in self.ticks:
+            return True
+        op = str(event.get('op')).upper()
+        if op == 'DEPLOY':
+            max_supply = parse_amount(event.get('max'))
+            if max_supply is not None:
+                self.max_supply.setdefault(tick, max_supply)
+            return True
+        amount = parse_amount(event.get('amt'))
+        balances = self.balances[tick]
+        if op == 'MINT' and amount is not None:
+            if tick in self.max_supply:
+                amount = min(amount, self.max_supply[tick] - self.minted[tick])
+            if amount > 0:
+                address = event.get('destination') or event.get('creator')
+                balances[address] = balances.get(address, Decimal(0)) + amount
+                self.minted[tick] += amount
+                self.block_times[tick][address] = event.get('block_time')
+                return True
+        elif op == 'TRANSFER' and amount is not None:
+            sender, receiver = event.get('creator'), event.get('destination')
+            if sender and receiver and balances.get(sender, Decimal(0)) >= amount:
+                balances[sender] -= amount
+                if not balances[sender]:
+                    del balances[sender]
+                balances[receiver] = balances.get(receiver, Decimal(0)) + amount
+                self.block_times[tick][sender] = self.block_times[tick][receiver] = event.get('block_time')
+                return True
+        self.skipped += 1
+        return False
+
+    def snapshot_rows(self):
+        """
+        Current balances as snapshot rows [Address, Ticker, Amount, Block Time], sorted by
+        address and tick, with amounts rounded to 2 decimals like the balance API snapshots.
+        """
+        rows = []
+        for tick in sorted(self.ticks):
+            block_times = self.block_times[tick]
+            for address, amount in self.balances[tick].items():
+                rows.append([address, tick, str(round(float(amount), 2)), block_times.get(address)])
+        rows.sort(key=lambda row: (row[0], row[1]))
+        return rows
+
+
+def replay(events, heights, ticks=None):
+    """
+    Computes holder balances at several block heights in one pass over the event history.
+
+    Parameters:
+    - events: Events in chain order (see load_events).
+    - heights: Block heights to cut at; each cut includes every event at or below it.
+    - ticks: Ticks to track; defaults to the airdrop whitelist.
+
+    Returns:
+    A dict of height -> snapshot rows.
+    """
+    ledger = Ledger(ticks)
+    pending = sorted(set(heights))
+    snapshots = {}
+    for event in events:
+        # Cut every requested height the history has moved past
+        while pending and event['block_index'] > pending[0]:
+            snapshots[pending.pop(0)] = ledger.snapshot_rows()
+        ledger.apply(event)
+    rows = ledger.snapshot_rows()
+    for height in pending:
+        snapshots[height] = rows
+    if ledger.skipped:
+        logger.warning(f'{ledger.skipped} events skipped as invalid (unknown op, bad amount, overdrawn transfer, minted out)')
+    return snapshots
+
+
+def write_snapshot_csv(rows, output_file_path):
+    # Same layout and quoting as balance_snapshot.write_snapshot_csv, atomically replaced
+    temp_file_path = f'{output_file_path}.tmp'
+    with open(temp_file_path, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile, quoting=csv.QUOTE_ALL)
+        writer.writerow(SNAPSHOT_FIELDS)
+        writer.writerows(rows)
+    os.replace(temp_file_path, output_file_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compute SRC-20 balance snapshots at block heights from event dumps.')
+    parser.add_argument('heights', type=int, nargs='+', help='Block heights to snapshot at.')
+    parser.add_argument('--events', default='./fetchSRC20_*.*json', help='Glob of fetchSRC20_* .json/.ndjson event dumps.')
+    parser.add_argument('--ticks', nargs='+', default=None, help='Ticks to track (default: the airdrop whitelist).')
+    parser.add_argument('--output-dir', default='.', help='Folder for balances_snapshot_src20-<height>.csv files.')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    events = load_events(args.events)
+    logger.info(f'Replaying {len(events)} events')
+    for height, rows in replay(events, args.heights, args.ticks).items():
+        output_file_path = os.path.join(args.output_dir, f'balances_snapshot_src20-{height}.csv')
+        write_snapshot_csv(rows, output_file_path)
+        logger.info(f'Block {height}: {len(rows)} balances written to {output_file_path}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+# Ticks the stub hands out, matching the balance_snapshot whitelist plus a few that get filtered
+STUB_TICKS = ['$viva', 'bos', 'kevin', 'spad', 'stamp', 'stmap', 'utxo', 'pepe', 'sato']
+
+BALANCE_PATH = re.compile(r'^/api/v2/src20/balance/(?P<address>[^/?]+)$')
+TICK_PATH = re.compile(r'^/api/v2/src20/tick/(?P<tick>[^/?]+)$')
+STAMP_PATH = re.compile(r'^/api/v2/stamps/(?P<stamp_id>[^/?]+)$')
+HOLDERS_PATH = re.compile(r'^/api/v1/explorer/src20/holdersByTick$')
+
+
+def _seed(value):
+    return int.from_bytes(hashlib.sha256(value.encode()).digest()[:8], 'big')
+
+
+def stub_balance(address, epoch=0, last_block=835000):
+    """
+    Deterministic stampchain-style /src20/balance payload for an address. A different epoch
+    gives every address new balances, as if the chain had moved on.
+    """
+    rng = random.Random(_seed(address if not epoch else f'{address}:{epoch}'))
+    ticks = rng.sample(STUB_TICKS, rng.randint(0, 3))
+    data = []
+    for tick in ticks:
+        data.append({
+            'address': address,
+            'p': 'SRC-20',
+            'tick': tick,
+            'amt': f'{rng.uniform(1, 1_000_000):.6f}',
+            'block_time': f'2024-03-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00.000Z',
+        })
+    return {'last_block': last_block, 'data': data}
+
+
+def stub_address(index):
+    return f'bc1qstub{hashlib.sha256(str(index).encode()).hexdigest()[:32]}'
+
+
+def stub_tick_event(tick, index):
+    """
+    Deterministic stampchain-style SRC-20 event (the records in fetchSRC20_*.json dumps).
+    """
+    rng = random.Random(_seed(f'{tick}:{index}'))
+    op = 'DEPLOY' if index == 0 else rng.choice(['MINT', 'MINT', 'TRANSFER'])
+    creator = stub_address(rng.randint(0, 999))
+    destination = creator if op != 'TRANSFER' else stub_address(rng.randint(0, 999))
+    return {
+        'id': f'{index}_{tick}',
+        'tx_hash': hashlib.sha256(f'{tick}:{index}'.encode()).hexdigest(),
+        'tx_index': index,
+        'block_index': 819000 + index // 10,
+        'p': 'SRC-20',
+        'op': op,
+        'tick': tick,
+        'creator': creator,
+        'amt': None if op == 'DEPLOY' else str(rng.randint(1, 10_000)),
+        'destination': destination,
+        'block_time': '2024-01-01T00:00:00.000Z',
+    }
+
+
+def stub_holder(tick, index):
+    rng = random.Random(_seed(f'holder:{tick}:{index}'))
+    return {'address': stub_address(index), 'balance': str(rng.randint(1, 1_000_000)),
+            'blockHeight': 819000 + rng.randint(0, 20000)}
+
+
+def stub_stamp(stamp_id):
+    """
+    Deterministic stampchain-style /stamps/{id} payload with a holder list.
+    """
+    rng = random.Random(_seed(stamp_id))
+    holders = [{'address': stub_address(rng.randint(0, 4999)), 'quantity': rng.randint(1, 5)}
+               for _ in range(rng.randint(1, 60))]
+    return {'data': {'stamp': {'cpid': stamp_id, 'stamp': rng.randint(1, 500000)}, 'holders': holders}}
+
+
+def page_params(query, page_key, size_key, default_size):
+    params = parse_qs(query)
+    page = int(params.get(page_key, ['1'])[0])
+    size = int(params.get(size_key, [str(default_size)])[0])
+    return page, size
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        # Keep benchmark output readable
+        pass
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_cacheable(self, payload):
+        # ETag support lets the response cache revalidate with If-None-Match
+        etag = '"' + hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:16] + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_json(200, payload, {'ETag': etag})
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+        if server.latency:
+            time.sleep(server.latency)
+        if server.throttle_rate is not None and not server.allow_request():
+            self.send_json(429, {'error': 'Too Many Requests'}, {'Retry-After': '0.1'})
+            return
+        if server.error_rate and server.rng.random() < server.error_rate:
+            self.send_json(503, {'error': 'Service Unavailable'})
+            return
+        if server.malformed_rate and server.rng.random() < server.malformed_rate:
+            # A proxy error page served with status 200
+            body = b'<html><body>Bad Gateway</body></html>'
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        path, _, query = self.path.partition('?')
+        match = BALANCE_PATH.match(path)
+        if match:
+            self.send_cacheable(stub_balance(match.group('address'), server.balance_epoch, server.last_block))
+            return
+        match = STAMP_PATH.match(path)
+        if match:
+            self.send_cacheable(stub_stamp(match.group('stamp_id')))
+            return
+        match = TICK_PATH.match(path)
+        if match:
+            tick = match.group('tick')
+            page, limit = page_params(query, 'page', 'limit', 1000)
+            total = server.tick_events
+            start = (page - 1) * limit
+            self.send_cacheable({
+                'page': page, 'limit': limit, 'totalPages': max(1, -(-total // limit)), 'total': total,
+                'data': [stub_tick_event(tick, i) for i in range(start, min(start + limit, total))],
+            })
+            return
+        if HOLDERS_PATH.match(path):
+            tick = parse_qs(query).get('tick', [''])[0]
+            page, size = page_params(query, 'page', 'pageSize', 500)
+            total = server.holders
+            start = (page - 1) * size
+            self.send_cacheable({'data': {
+                'total': total, 'list': [stub_holder(tick, i) for i in range(start, min(start + size, total))],
+            }})
+            return
+        self.send_json(404, {'error': 'Not Found'})
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, error_rate=0.0, throttle_rate=None, seed=0,
+                 tick_events=5000, holders=2000, malformed_rate=0.0):
+        super().__init__(address, StubHandler)
+        self.malformed_rate = malformed_rate
+        self.tick_events = tick_events
+        self.holders = holders
+        # Balance state; benchmarks change these between runs to simulate new blocks
+        self.balance_epoch = 0
+        self.last_block = 835000
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.window_start = time.monotonic()
+        self.window_count = 0
+
+    def handle_error(self, request, client_address):
+        # Clients that are killed mid-request are expected in the benchmarks
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def allow_request(self):
+        # Fixed one-second window, answering 429 once throttle_rate requests were served
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= 1:
+                self.window_start = now
+                self.window_count = 0
+            self.window_count += 1
+            return self.window_count <= self.throttle_rate
+
+
+@contextmanager
+def run_stub_server(latency=0.0, error_rate=0.0, throttle_rate=None, seed=0, tick_events=5000, holders=2000,
+                    malformed_rate=0.0):
+    """
+    Serves a local stand-in for the stampchain and openstamp APIs on an ephemeral port.
+
+    Parameters:
+    - latency: Seconds to sleep before answering each request.
+    - error_rate: Fraction of requests answered with 503.
+    - throttle_rate: Requests per second served before answering 429. None disables throttling.
+    - seed: Seed for the error injection.
+    - tick_events: Number of events served by /api/v2/src20/tick/{tick}.
+    - holders: Number of holders served by holdersByTick for any tick.
+    - malformed_rate: Fraction of requests answered 200 with an HTML body instead of JSON.
+
+    Yields:
+    The running StubServer; its base URL is server.base_url.
+    """
+    server = StubServer(('127.0.0.1', 0), latency=latency, error_rate=error_rate,
+                        throttle_rate=throttle_rate, seed=seed, tick_events=tick_events, holders=holders,
+                        malformed_rate=malformed_rate)
+    server.base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()